@@ -2,7 +2,7 @@ import { spawn } from "child_process";
 import path from "path";
 import { promises as fs } from "fs";
 import { NextRequest, NextResponse } from "next/server";
-import { buildNormalizedSkvPayload, type SkvSourceData } from "@/lib/skv/payload";
+import { buildNormalizedSkvPayload, type NormalizedSkvPayload, type SkvSourceData } from "@/lib/skv/payload";
 
 export const runtime = "nodejs";
 
@@ -10,8 +10,14 @@ const INLOGG_DIR = path.join(process.cwd(), "inlogg");
 const RUNTIME_DIR = path.join(INLOGG_DIR, "runtime");
 const PAYLOAD_FILE = path.join(RUNTIME_DIR, "skv_payload_latest.json");
 const PROCESS_FILE = path.join(RUNTIME_DIR, "skv_int7_process.json");
+const DAEMON_LOG_FILE = path.join(RUNTIME_DIR, "skv_int7_daemon.log");
 const PY_SCRIPT = path.join(INLOGG_DIR, "skv_int7.py");
 
+const DAEMON_URL = process.env.SKV_INT7_DAEMON_URL?.trim() || `http://127.0.0.1:${process.env.SKV_INT7_DAEMON_PORT?.trim() || "8768"}`;
+// How long to wait for a freshly spawned daemon to answer /health.
+const DAEMON_BOOT_TIMEOUT_MS = 20_000;
+const DAEMON_POLL_MS = 250;
+
 function isTruthy(value: string | undefined): boolean {
   const normalized = (value ?? "").trim().toLowerCase();
   return ["1", "y", "yes", "true"].includes(normalized);
@@ -40,62 +46,159 @@ function isProcessAlive(pid: number): boolean {
   }
 }
 
-export async function POST(req: NextRequest) {
-  try {
-    const body = (await req.json()) as { formData?: SkvSourceData } & SkvSourceData;
-    const source = body?.formData ?? body ?? {};
-    const payload = buildNormalizedSkvPayload(source);
-
-    await fs.mkdir(RUNTIME_DIR, { recursive: true });
-    await fs.writeFile(PAYLOAD_FILE, `${JSON.stringify(payload, null, 2)}\n`, "utf-8");
-
-    try {
-      const existingRaw = await fs.readFile(PROCESS_FILE, "utf-8");
-      const existing = JSON.parse(existingRaw) as { pid?: number; startedAt?: string };
-      if (existing?.pid && isProcessAlive(existing.pid)) {
-        return NextResponse.json({
-          ok: true,
-          started: false,
-          alreadyRunning: true,
-          pid: existing.pid,
-          startedAt: existing.startedAt ?? null,
-          payload,
-          script: "skv_int7.py",
-        });
-      }
-    } catch {
-      // No process file yet or invalid stale data; continue with new spawn.
-    }
+// Daemon mode is the default; SKV_INT7_DAEMON=n restores one process per start.
+function daemonEnabled(): boolean {
+  const configured = process.env.SKV_INT7_DAEMON;
+  return configured === undefined || configured.trim() === "" || isTruthy(configured);
+}
 
-    const { command, extraArgs } = resolvePythonCommand();
-    const args = [...extraArgs, PY_SCRIPT, "--payload-file", PAYLOAD_FILE];
-    if (isTruthy(process.env.SKV_INT7_ALLOW_MOCKUP_DATA)) {
-      args.push("--allow-mockup-data");
-    }
+async function daemonHealthy(): Promise<boolean> {
+  try {
+    const res = await fetch(`${DAEMON_URL}/health`, { cache: "no-store", signal: AbortSignal.timeout(1000) });
+    return res.ok;
+  } catch {
+    return false;
+  }
+}
 
-    const child = spawn(command, args, {
+async function spawnDaemon(): Promise<void> {
+  const { command, extraArgs } = resolvePythonCommand();
+  const port = new URL(DAEMON_URL).port || "8768";
+  await fs.mkdir(RUNTIME_DIR, { recursive: true });
+  const log = await fs.open(DAEMON_LOG_FILE, "a");
+  try {
+    const child = spawn(command, [...extraArgs, PY_SCRIPT, "--daemon", "--port", port], {
       cwd: INLOGG_DIR,
       detached: true,
-      stdio: "ignore",
-      env: {
-        ...process.env,
-        SKV_PAYLOAD_FILE: PAYLOAD_FILE,
-      },
+      stdio: ["ignore", log.fd, log.fd],
+      env: process.env,
     });
-
-    await fs.writeFile(
-      PROCESS_FILE,
-      `${JSON.stringify({ pid: child.pid, startedAt: new Date().toISOString() }, null, 2)}\n`,
-      "utf-8"
-    );
     child.unref();
+  } finally {
+    await log.close();
+  }
+}
 
-    return NextResponse.json({
-      ok: true,
-      started: true,
-      payload,
-      script: "skv_int7.py",
+// Boot in progress in this server process; concurrent /start requests share it.
+// A daemon spawned from another process cannot bind the port and exits before
+// launching a browser (skv_int7.run_daemon), so the port is the cross-process lock.
+let daemonBoot: Promise<boolean> | null = null;
+
+async function bootDaemon(): Promise<boolean> {
+  await spawnDaemon();
+  const deadline = Date.now() + DAEMON_BOOT_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    await new Promise((resolve) => setTimeout(resolve, DAEMON_POLL_MS));
+    if (await daemonHealthy()) return true;
+  }
+  return false;
+}
+
+// Reuse the running daemon, or start one (once) and wait until it answers.
+async function ensureDaemon(): Promise<boolean> {
+  if (await daemonHealthy()) return true;
+  if (!daemonBoot) {
+    daemonBoot = bootDaemon().finally(() => {
+      daemonBoot = null;
     });
+  }
+  return daemonBoot;
+}
+
+async function startViaDaemon(payload: NormalizedSkvPayload) {
+  if (!(await ensureDaemon())) {
+    throw new Error(`SKV int7 daemon did not come up at ${DAEMON_URL}`);
+  }
+  const res = await fetch(`${DAEMON_URL}/start`, {
+    method: "POST",
+    cache: "no-store",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      payload,
+      allow_mockup_data: isTruthy(process.env.SKV_INT7_ALLOW_MOCKUP_DATA),
+    }),
+  });
+  const body = (await res.json()) as { ok?: boolean; error?: string; retry_after?: number; job?: { job_id?: string } };
+  if (!res.ok || !body?.ok) {
+    return NextResponse.json(
+      { ok: false, error: body?.error ?? "Failed to start SKV int7 automation", retryAfter: body?.retry_after ?? null },
+      { status: res.status >= 400 ? res.status : 500 }
+    );
+  }
+  return NextResponse.json({
+    ok: true,
+    started: true,
+    jobId: body.job?.job_id ?? null,
+    job: body.job ?? null,
+    payload,
+    script: "skv_int7.py",
+    daemon: DAEMON_URL,
+  });
+}
+
+async function startViaSpawn(payload: NormalizedSkvPayload) {
+  await fs.mkdir(RUNTIME_DIR, { recursive: true });
+  await fs.writeFile(PAYLOAD_FILE, `${JSON.stringify(payload, null, 2)}\n`, "utf-8");
+
+  try {
+    const existingRaw = await fs.readFile(PROCESS_FILE, "utf-8");
+    const existing = JSON.parse(existingRaw) as { pid?: number; startedAt?: string };
+    if (existing?.pid && isProcessAlive(existing.pid)) {
+      return NextResponse.json({
+        ok: true,
+        started: false,
+        alreadyRunning: true,
+        pid: existing.pid,
+        startedAt: existing.startedAt ?? null,
+        payload,
+        script: "skv_int7.py",
+      });
+    }
+  } catch {
+    // No process file yet or invalid stale data; continue with new spawn.
+  }
+
+  const { command, extraArgs } = resolvePythonCommand();
+  const args = [...extraArgs, PY_SCRIPT, "--payload-file", PAYLOAD_FILE];
+  if (isTruthy(process.env.SKV_INT7_ALLOW_MOCKUP_DATA)) {
+    args.push("--allow-mockup-data");
+  }
+
+  const child = spawn(command, args, {
+    cwd: INLOGG_DIR,
+    detached: true,
+    stdio: "ignore",
+    env: {
+      ...process.env,
+      SKV_PAYLOAD_FILE: PAYLOAD_FILE,
+    },
+  });
+
+  await fs.writeFile(
+    PROCESS_FILE,
+    `${JSON.stringify({ pid: child.pid, startedAt: new Date().toISOString() }, null, 2)}\n`,
+    "utf-8"
+  );
+  child.unref();
+
+  return NextResponse.json({
+    ok: true,
+    started: true,
+    payload,
+    script: "skv_int7.py",
+  });
+}
+
+export async function POST(req: NextRequest) {
+  try {
+    const body = (await req.json()) as { formData?: SkvSourceData } & SkvSourceData;
+    const source = body?.formData ?? body ?? {};
+    const payload = buildNormalizedSkvPayload(source);
+
+    if (daemonEnabled()) {
+      return await startViaDaemon(payload);
+    }
+    return await startViaSpawn(payload);
   } catch (error) {
     console.error("[SKV int7] failed to start:", error);
     return NextResponse.json(
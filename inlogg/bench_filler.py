@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+bench_filler.py - Offline replay harness for the flytt form filler.
+
+Serves a page on 127.0.0.1 and runs formulär.flytt_form_filler end-to-end
+in headless Chromium, without BankID or network. Two pages:
+
+  standin   (default) scripted stand-in wizard with the same shape as the
+            real one: form#fbfFlyttanmalanForm, six flytt-skv-wizard-step
+            elements named as in info/FLYTTANMALAN_FORMULAR_ANALYS.txt,
+            inputs inside shadow roots, the skv-button-10-0-7 Nästa host
+            with a busy attribute, and the address confirmation checkbox.
+            Like Angular, the step model only takes values from input
+            events, and Nästa refuses to advance while a required field is
+            missing from the model.
+  snapshot  the saved "formulär/Flyttanmälan _ Skatteverket.html" and its
+            _files bundle. Static state (step 2 active, no backend), so
+            this only measures discovery and filling on that step.
+
+For every run it reports wall time, browser round-trips and sleep time, in
+total and per wizard step (one filler round = one row), and the values the
+stand-in model received. Recorded results: BENCH_README.md.
+
+Usage:
+  python bench_filler.py [--page standin|snapshot] [--runs 3] [--fast-fill]
+                         [--latency-ms 300] [--busy-ms 150] [--no-confirm]
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote
+
+from playwright.sync_api import sync_playwright
+
+from formulär.flytt_form_filler import CONFIRM_CHECKBOX, DEFAULT_MOCKUP_DATA, NEXT_BTN, run_flytt_form_filler
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FORM_DIR = os.path.join(SCRIPT_DIR, "formulär")
+SNAPSHOT_FILE = "Flyttanmälan _ Skatteverket.html"
+STANDIN_PATH = "/__standin__.html"
+
+
+def standin_html(latency_ms: int = 300, busy_ms: int = 150, confirm: bool = True) -> str:
+    """Stand-in wizard; latency_ms = step render delay after Nästa, busy_ms = busy time on the host."""
+    next_tag = NEXT_BTN.split("[", 1)[0]
+    confirm_tag = CONFIRM_CHECKBOX.split("[", 1)[0]
+    return """<!doctype html>
+<html><head><meta charset="utf-8"><title>Flyttanmälan (stand-in)</title>
+<style>
+  flytt-skv-wizard-step { display: block; }
+  flytt-skv-wizard-step:not(.flytt-skv-wizard-step--active) { display: none; }
+</style></head>
+<body>
+<form id="fbfFlyttanmalanForm"></form>
+<script>
+const LATENCY = %(latency)d, BUSY = %(busy)d, CONFIRM = %(confirm)s;
+const STEPS = [
+  ['nuvarandeuppgifter', []],
+  ['inflyttningsdatum', ['inflyttningsdatum']],
+  ['adress', ['gatuadress', 'postnummer', 'postort', 'lagenhetsnummer', 'fastighetsbeteckning', 'fastighetsagare']],
+  ['personer', []],
+  ['kontakt', ['telefonnummer', 'email']],
+  ['granska', []],
+];
+const REQUIRED = { inflyttningsdatum: ['inflyttningsdatum'], adress: ['gatuadress', 'postnummer', 'postort'] };
+const model = {};
+const stats = { nextClicks: 0, rejected: 0, inputEvents: 0, changeEvents: 0, blurEvents: 0 };
+window.__bench = { model, stats, step: () => current };
+let current = 0, confirmShown = false;
+
+customElements.define('skv-input-bench', class extends HTMLElement {
+  connectedCallback() {
+    if (this.shadowRoot) return;
+    const root = this.attachShadow({ mode: 'open' });
+    const input = document.createElement('input');
+    input.name = input.id = this.getAttribute('name');
+    input.addEventListener('input', () => { stats.inputEvents++; model[input.name] = input.value; });
+    input.addEventListener('change', () => { stats.changeEvents++; });
+    input.addEventListener('blur', () => { stats.blurEvents++; });
+    root.innerHTML = '<label></label>';
+    root.querySelector('label').textContent = input.name;
+    root.appendChild(input);
+  }
+});
+customElements.define('%(next_tag)s', class extends HTMLElement {
+  connectedCallback() {
+    if (this.shadowRoot) return;
+    this.attachShadow({ mode: 'open' }).innerHTML = '<button type="button"><slot></slot></button>';
+    this.addEventListener('click', () => onNext(this));
+  }
+});
+customElements.define('%(confirm_tag)s', class extends HTMLElement {
+  connectedCallback() {
+    if (this.shadowRoot) return;
+    this.attachShadow({ mode: 'open' }).innerHTML = '<input type="checkbox"><slot></slot>';
+    this.addEventListener('click', () => {
+      if (this.hasAttribute('checked')) this.removeAttribute('checked'); else this.setAttribute('checked', '');
+    });
+  }
+});
+
+const form = document.getElementById('fbfFlyttanmalanForm');
+const stepEls = STEPS.map(([name], i) => {
+  const el = document.createElement('flytt-skv-wizard-step');
+  el.setAttribute('name', name);
+  el.setAttribute('heading', name);
+  el.setAttribute('order', String((i + 1) * 10));
+  form.appendChild(el);
+  return el;
+});
+
+function render() {
+  stepEls.forEach((el, i) => {
+    el.className = i === current ? 'flytt-skv-wizard-step--active' : '';
+    el.innerHTML = '';
+  });
+  const [name, fields] = STEPS[current];
+  const el = stepEls[current];
+  const h = document.createElement('h3');
+  h.className = 'flytt-skv-wizard-step-title';
+  h.textContent = name;
+  el.appendChild(h);
+  for (const f of fields) {
+    const input = document.createElement('skv-input-bench');
+    input.setAttribute('name', f);
+    el.appendChild(input);
+  }
+  if (name !== 'granska') {
+    const next = document.createElement('%(next_tag)s');
+    next.setAttribute('button-type', 'primary');
+    next.className = 'flytt-skv-wizard-step-button';
+    next.textContent = 'Nästa';
+    el.appendChild(next);
+  }
+}
+
+function onNext(host) {
+  if (host.getAttribute('busy') === 'true') return;
+  stats.nextClicks++;
+  host.setAttribute('busy', 'true');
+  setTimeout(() => {
+    const [name] = STEPS[current];
+    const missing = (REQUIRED[name] || []).filter(f => !model[f]);
+    const step = stepEls[current];
+    if (missing.length) {
+      stats.rejected++;
+      host.setAttribute('busy', 'false');
+      return;
+    }
+    if (CONFIRM && name === 'adress') {
+      const box = step.querySelector('%(confirm_tag)s');
+      if (!confirmShown) {
+        confirmShown = true;
+        const c = document.createElement('%(confirm_tag)s');
+        c.setAttribute('type', 'checkbox');
+        c.textContent = 'Jag bekräftar att jag läst men vill ändå gå vidare med min anmälan';
+        step.insertBefore(c, host);
+        host.setAttribute('busy', 'false');
+        return;
+      }
+      if (box && !box.hasAttribute('checked')) {
+        stats.rejected++;
+        host.setAttribute('busy', 'false');
+        return;
+      }
+    }
+    setTimeout(() => { current = Math.min(current + 1, STEPS.length - 1); render(); }, LATENCY);
+  }, BUSY);
+}
+
+render();
+</script>
+</body></html>
+""" % {
+        "latency": latency_ms,
+        "busy": busy_ms,
+        "confirm": "true" if confirm else "false",
+        "next_tag": next_tag,
+        "confirm_tag": confirm_tag,
+    }
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    standin = ""
+
+    def do_GET(self) -> None:
+        if self.path.split("?", 1)[0] == STANDIN_PATH:
+            body = self.standin.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        super().do_GET()
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def serve(standin: str):
+    """Serve formulär/ plus the stand-in page on an ephemeral 127.0.0.1 port."""
+    handler = partial(type("Handler", (_Handler,), {"standin": standin}), directory=FORM_DIR)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, name="bench-filler-http", daemon=True).start()
+    return server
+
+
+def run_once(browser, url: str, fast_fill: bool) -> dict:
+    context = browser.new_context()
+    page = context.new_page()
+    page.goto(url, wait_until="load")
+    log_lines = []
+    started = time.perf_counter()
+    summary = run_flytt_form_filler(
+        page,
+        lambda: False,
+        log_callback=log_lines.append,
+        form_data=dict(DEFAULT_MOCKUP_DATA),
+        fast_fill=fast_fill,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    bench = page.evaluate("() => window.__bench ? { model: window.__bench.model, stats: window.__bench.stats, step: window.__bench.step() } : null")
+    context.close()
+    result = {"wall_ms": round(wall_ms, 1), "summary": summary, "log_lines": len(log_lines)}
+    if bench is not None:
+        result["standin"] = {
+            **bench,
+            "model_matches": all(bench["model"].get(k) == v for k, v in DEFAULT_MOCKUP_DATA.items()),
+        }
+    return result
+
+
+def _median(values):
+    return round(statistics.median(values), 1) if values else None
+
+
+def aggregate(runs: list) -> dict:
+    per_step: dict = {}
+    for run in runs:
+        for row in run["summary"].get("steps", []):
+            entry = per_step.setdefault(row["step"], {"ms": [], "round_trips": [], "sleep_ms": [], "rounds": 0})
+            entry["ms"].append(row["ms"])
+            entry["round_trips"].append(row["round_trips"])
+            entry["sleep_ms"].append(row["sleep_ms"])
+            entry["rounds"] += 1
+    return {
+        "wall_ms_median": _median([r["wall_ms"] for r in runs]),
+        "round_trips_median": _median([r["summary"]["round_trips"] for r in runs]),
+        "sleep_s_median": _median([r["summary"]["sleep_s"] for r in runs]),
+        "per_step_median": {
+            step: {
+                "rounds_per_run": round(v["rounds"] / len(runs), 2),
+                "ms": _median(v["ms"]),
+                "round_trips": _median(v["round_trips"]),
+                "sleep_ms": _median(v["sleep_ms"]),
+            }
+            for step, v in per_step.items()
+        },
+    }
+
+
+def run(page_kind: str, runs: int, fast_fill: bool, latency_ms: int, busy_ms: int, confirm: bool) -> dict:
+    server = serve(standin_html(latency_ms, busy_ms, confirm))
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    url = base + (STANDIN_PATH if page_kind == "standin" else "/" + quote(SNAPSHOT_FILE))
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            results = [run_once(browser, url, fast_fill) for _ in range(runs)]
+            browser.close()
+    finally:
+        server.shutdown()
+    return {
+        "page": page_kind,
+        "fast_fill": fast_fill,
+        "runs": runs,
+        "latency_ms": latency_ms,
+        "busy_ms": busy_ms,
+        "aggregate": aggregate(results),
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the flytt form filler")
+    parser.add_argument("--page", choices=("standin", "snapshot"), default="standin")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--fast-fill", action="store_true")
+    parser.add_argument("--latency-ms", type=int, default=300, help="stand-in: step render delay after Nästa")
+    parser.add_argument("--busy-ms", type=int, default=150, help="stand-in: busy time on the Nästa host")
+    parser.add_argument("--no-confirm", action="store_true", help="stand-in: no address confirmation checkbox")
+    args = parser.parse_args()
+    report = run(args.page, args.runs, args.fast_fill, args.latency_ms, args.busy_ms, not args.no_confirm)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
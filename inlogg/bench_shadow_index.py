@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+bench_shadow_index.py - Readiness probe: shadow-DOM index vs. full walker.
+
+Loads the synthetic deep-shadow page from skv_shadow_index.benchmark_page_html
+in headless Chromium with the index init script installed, checks that both
+probes agree, and times them two ways:
+
+  in-page   N probe calls inside one evaluate (pure JS cost)
+  round-trip  N page.evaluate(FORM_SIGNALS_JS) calls from Python (what the
+              wait loop actually pays per tab per check)
+
+Usage:
+  python bench_shadow_index.py [--depth 6] [--breadth 4] [--filler 20] [--runs 200]
+"""
+import argparse
+import json
+import time
+
+from playwright.sync_api import sync_playwright
+
+from skv_core import FORM_NEXT_HOST_SELECTOR, FORM_SIGNALS_JS, FORM_SIGNALS_WALK_JS
+from skv_shadow_index import SHADOW_INDEX_JS, benchmark_page_html
+
+
+IN_PAGE_JS = """([runs, nextSel, useIndex]) => {
+    const walk = %s;
+    const probe = useIndex ? () => window.__skvIndex.snapshot() : () => walk(nextSel);
+    const t0 = performance.now();
+    let last = null;
+    for (let i = 0; i < runs; i++) last = probe();
+    return { ms: performance.now() - t0, last };
+}""" % FORM_SIGNALS_WALK_JS
+
+COUNT_JS = """() => {
+    let elements = 0, roots = 0;
+    const stack = [document];
+    while (stack.length) {
+        const root = stack.pop();
+        for (const el of root.querySelectorAll('*')) {
+            elements++;
+            if (el.shadowRoot) { roots++; stack.push(el.shadowRoot); }
+        }
+    }
+    return { elements, roots };
+}"""
+
+
+def _strip(result: dict) -> dict:
+    return {k: v for k, v in result.items() if k not in ("title", "indexed")}
+
+
+def run(depth: int, breadth: int, filler: int, runs: int) -> dict:
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        context = browser.new_context()
+        context.add_init_script(SHADOW_INDEX_JS)
+        page = context.new_page()
+        page.set_content(benchmark_page_html(depth, breadth, filler), wait_until="load")
+        page.wait_for_function("() => window.__skvIndex && window.__skvIndex.snapshot().hasForm")
+
+        size = page.evaluate(COUNT_JS)
+        walk = page.evaluate(IN_PAGE_JS, [runs, FORM_NEXT_HOST_SELECTOR, False])
+        index = page.evaluate(IN_PAGE_JS, [runs, FORM_NEXT_HOST_SELECTOR, True])
+        if _strip(walk["last"]) != _strip(index["last"]):
+            raise SystemExit(f"Probe mismatch: walk={walk['last']} index={index['last']}")
+
+        t0 = time.perf_counter()
+        for _ in range(runs):
+            page.evaluate(FORM_SIGNALS_JS, FORM_NEXT_HOST_SELECTOR)
+        rt_index = (time.perf_counter() - t0) * 1000
+        page.evaluate("() => { window.__skvIndexSaved = window.__skvIndex; window.__skvIndex = undefined; }")
+        t0 = time.perf_counter()
+        for _ in range(runs):
+            page.evaluate(FORM_SIGNALS_JS, FORM_NEXT_HOST_SELECTOR)
+        rt_walk = (time.perf_counter() - t0) * 1000
+        index_stats = page.evaluate("() => window.__skvIndexSaved.stats")
+        browser.close()
+
+    return {
+        "page": {"depth": depth, "breadth": breadth, "filler": filler, **size},
+        "runs": runs,
+        "signals": index["last"],
+        "index_stats": index_stats,
+        "in_page_ms_per_probe": {
+            "walker": round(walk["ms"] / runs, 4),
+            "index": round(index["ms"] / runs, 4),
+        },
+        "round_trip_ms_per_probe": {
+            "walker": round(rt_walk / runs, 3),
+            "index": round(rt_index / runs, 3),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark shadow-DOM index vs. walker")
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--breadth", type=int, default=4)
+    parser.add_argument("--filler", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(run(args.depth, args.breadth, args.filler, args.runs), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
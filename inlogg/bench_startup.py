@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py - Import time and startup latency of the inlogg entrypoints.
+
+For each entrypoint (default: skv_int7, flytt_prefill, flytt_grazon; skv6
+for reference) and over --runs fresh interpreters:
+
+  import     `python -X importtime -c "import <module>"`: cumulative import
+             time of the module and the slowest imports below it
+  startup    wall time of `python <script> --help` (interpreter + imports +
+             argument parsing, i.e. time until the tool can start working)
+  first_nav  skv_int7 only, with --navigate: time from spawning
+             `skv_int7.py --url <local server>` until the browser's first
+             request reaches that server (engine warm-up + browser launch +
+             page.goto). Needs Chromium. flytt_prefill and flytt_grazon do
+             not drive a browser, so startup is their time-to-work.
+
+Usage:
+  python bench_startup.py [--runs 5] [--top 10] [--navigate] [--module skv_int7 ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODULES = ("skv_int7", "flytt_prefill", "flytt_grazon", "skv6")
+# Entrypoints with an argparse --help (skv6 would start its server instead).
+CLI_SCRIPTS = ("skv_int7", "flytt_prefill", "flytt_grazon")
+NAVIGATE_TIMEOUT_SECONDS = 60.0
+
+
+def _median(values: List[float]) -> Optional[float]:
+    return round(statistics.median(values), 1) if values else None
+
+
+def parse_importtime(stderr: str) -> Dict[str, Dict[str, int]]:
+    """{module: {"self_us", "cumulative_us"}} from -X importtime output."""
+    out: Dict[str, Dict[str, int]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            out[name.strip()] = {"self_us": int(self_us), "cumulative_us": int(cumulative_us)}
+        except ValueError:
+            continue
+    return out
+
+
+def measure_import(module: str) -> Dict[str, Dict[str, int]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SCRIPT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {proc.stderr.strip().splitlines()[-1:]}")
+    return parse_importtime(proc.stderr)
+
+
+def measure_startup(module: str) -> float:
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(SCRIPT_DIR, f"{module}.py"), "--help"],
+        cwd=SCRIPT_DIR,
+        capture_output=True,
+        check=True,
+    )
+    return (time.perf_counter() - started) * 1000
+
+
+def measure_first_navigation() -> float:
+    """ms from spawning skv_int7 until its browser requests the target URL."""
+    first_request = threading.Event()
+    seen_at: List[float] = []
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if not seen_at:
+                seen_at.append(time.perf_counter())
+                first_request.set()
+            body = b"<!doctype html><title>bench</title>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        payload_file = os.path.join(tmp, "payload.json")
+        with open(payload_file, "w", encoding="utf-8") as f:
+            json.dump({}, f)
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.join(SCRIPT_DIR, "skv_int7.py"),
+                "--url", f"http://127.0.0.1:{server.server_address[1]}/",
+                "--payload-file", payload_file,
+                "--timeout-seconds", "1",
+            ],
+            cwd=SCRIPT_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            deadline = started + NAVIGATE_TIMEOUT_SECONDS
+            while not first_request.wait(0.1):
+                if proc.poll() is not None:
+                    raise RuntimeError(f"skv_int7 exited with {proc.returncode} before navigating (Chromium missing?)")
+                if time.perf_counter() > deadline:
+                    raise RuntimeError("skv_int7 did not navigate in time")
+            return (seen_at[0] - started) * 1000
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            server.shutdown()
+
+
+def bench_module(module: str, runs: int, top: int) -> Dict:
+    imports = [measure_import(module) for _ in range(runs)]
+    totals = [it[module]["cumulative_us"] / 1000 for it in imports if module in it]
+    # Slowest imports of the median run, by own (self) time.
+    median_run = sorted(imports, key=lambda it: it.get(module, {}).get("cumulative_us", 0))[len(imports) // 2]
+    slowest = sorted(median_run.items(), key=lambda kv: kv[1]["self_us"], reverse=True)[:top]
+    heavy = [m for m in ("flask", "requests", "playwright", "werkzeug") if m in median_run]
+    result = {
+        "import_ms_median": _median(totals),
+        "modules_loaded": len(median_run),
+        "heavy_modules_loaded": heavy,
+        "slowest_self_ms": {name: round(v["self_us"] / 1000, 1) for name, v in slowest},
+    }
+    if module in CLI_SCRIPTS:
+        try:
+            result["startup_ms_median"] = _median([measure_startup(module) for _ in range(runs)])
+        except subprocess.CalledProcessError as e:
+            result["startup_error"] = f"--help exited with {e.returncode}"
+    return result
+
+
+def run(modules: List[str], runs: int, top: int, navigate: bool) -> Dict:
+    report: Dict = {"python": sys.version.split()[0], "runs": runs, "modules": {}}
+    for module in modules:
+        try:
+            report["modules"][module] = bench_module(module, runs, top)
+        except RuntimeError as e:
+            report["modules"][module] = {"error": str(e)}
+    if navigate:
+        try:
+            report["skv_int7_first_navigation_ms_median"] = _median([measure_first_navigation() for _ in range(runs)])
+        except RuntimeError as e:
+            report["skv_int7_first_navigation_error"] = str(e)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark import time and startup of the inlogg entrypoints")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list per module")
+    parser.add_argument("--navigate", action="store_true", help="also time skv_int7 spawn -> first navigation (needs Chromium)")
+    parser.add_argument("--module", action="append", dest="modules", help="module to measure (repeatable)")
+    args = parser.parse_args()
+    report = run(args.modules or list(DEFAULT_MODULES), args.runs, args.top, args.navigate)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
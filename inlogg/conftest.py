@@ -0,0 +1,14 @@
+"""
+conftest.py - pytest setup for the inlogg modules.
+
+The modules are flat (import skv_scheduler, from formulär import ...), so this
+directory goes on sys.path. The unit tests live in tests/. test_grazon_run.py
+and flytt_prefill_test.py are standalone scripts that call live APIs at
+import time; pytest must not collect them.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+collect_ignore = ["test_grazon_run.py", "flytt_prefill_test.py"]
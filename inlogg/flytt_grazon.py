@@ -29,18 +29,23 @@ Miljovariabler (satt i .env eller systemet):
 from __future__ import annotations
 import argparse
 import difflib
+import importlib.util
 import json
 import os
 import re
 import sys
 from typing import Any
 
-try:
-    import requests
-except ImportError:
+# requests laddas forst vid forsta API-anropet (snabbare start), men maste finnas.
+if importlib.util.find_spec("requests") is None:
     print("requests saknas. Kor: pip install requests")
     sys.exit(1)
 
+
+def _http_get(url: str, **kwargs: Any):
+    import requests
+    return requests.get(url, **kwargs)
+
 try:
     from dotenv import load_dotenv
     load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
@@ -69,7 +74,7 @@ def pap_lookup_postort(postnummer: str) -> dict[str, str]:
         return _pap_fallback(pnr)
     url = f"https://api.papapi.se/lite/?query={pnr}&format=json&apikey={PAP_KEY}"
     try:
-        r = requests.get(url, timeout=TIMEOUT)
+        r = _http_get(url, timeout=TIMEOUT)
         if r.status_code == 200:
             data = r.json()
             results = (data.get("results") or [])
@@ -131,7 +136,7 @@ def eniro_company_search(query: str, where: str = "sverige") -> list[dict]:
     url = "https://api.eniro.com/cs/v2/search/company"
     params = {"q": query, "where": where, "api_key": ENIRO_KEY, "country": "se"}
     try:
-        r = requests.get(url, params=params, timeout=TIMEOUT)
+        r = _http_get(url, params=params, timeout=TIMEOUT)
         if r.status_code == 200:
             data = r.json()
             results = []
@@ -169,7 +174,7 @@ def ratsit_person_lookup(personnummer: str, package: str = "personadress") -> di
     headers = {"apiKey": RATSIT_KEY}
     params  = {"package": package}
     try:
-        r = requests.get(url, headers=headers, params=params, timeout=TIMEOUT)
+        r = _http_get(url, headers=headers, params=params, timeout=TIMEOUT)
         if r.status_code == 200:
             data = r.json()
             person = data.get("person") or data
@@ -202,7 +207,7 @@ def ratsit_name_search(first_name: str, last_name: str, city: str = "") -> list[
     if city:
         params["city"] = city
     try:
-        r = requests.get(url, headers=headers, params=params, timeout=TIMEOUT)
+        r = _http_get(url, headers=headers, params=params, timeout=TIMEOUT)
         if r.status_code == 200:
             hits = r.json().get("persons") or r.json().get("results") or []
             results = []
@@ -237,7 +242,7 @@ def eniro_person_search(name: str, where: str = "stockholm") -> list[dict]:
     url = "https://api.eniro.com/cs/v2/search/person"
     params = {"q": name, "where": where, "api_key": ENIRO_KEY, "country": "se"}
     try:
-        r = requests.get(url, params=params, timeout=TIMEOUT)
+        r = _http_get(url, params=params, timeout=TIMEOUT)
         if r.status_code == 200:
             persons = r.json().get("persons") or []
             results = []
@@ -271,7 +276,7 @@ def eniro_number_lookup(phone: str) -> dict | None:
     url = "https://api.eniro.com/cs/v2/search/company"
     params = {"q": phone_clean, "api_key": ENIRO_KEY, "country": "se"}
     try:
-        r = requests.get(url, params=params, timeout=TIMEOUT)
+        r = _http_get(url, params=params, timeout=TIMEOUT)
         if r.status_code == 200:
             items = r.json().get("persons") or r.json().get("companies") or []
             if items:
@@ -306,7 +311,7 @@ def personkontakt_phone_lookup(phone: str) -> dict | None:
     headers = {"Authorization": f"Bearer {PKONTAKT_KEY}"}
     params  = {"phone": phone_clean}
     try:
-        r = requests.get(url, headers=headers, params=params, timeout=TIMEOUT)
+        r = _http_get(url, headers=headers, params=params, timeout=TIMEOUT)
         if r.status_code == 200:
             p = r.json()
             return {
@@ -35,10 +35,15 @@ import re
 import sys
 from typing import Any
 
-try:
-    import requests
-except ImportError:
-    requests = None  # type: ignore
+
+def _requests():
+    """requests, imported on the first API lookup (None when not installed)."""
+    try:
+        import requests
+    except ImportError:
+        return None
+    return requests
+
 
 # -----------------------------------------------------------------------------
 # Embedded fallback: postnummer -> postort (common Swedish postal codes)
@@ -197,19 +202,9 @@ FALLBACK_POSTNUMMER: dict[str, str] = {
 }
 
 # Build 5-digit lookup from 3-digit prefixes (Swedish postnummer: first 3 digits = area)
-def _build_fallback() -> dict[str, str]:
-    out: dict[str, str] = {}
-    for prefix, ort in FALLBACK_POSTNUMMER.items():
-        if len(prefix) == 3:
-            for i in range(100):
-                out[f"{prefix}{i:02d}"] = ort
-    return out
-
-_FALLBACK_5DIGIT: dict[str, str] = _build_fallback()
-
-
 def _lookup_postort_pap(postnummer: str, api_key: str) -> str | None:
     """Look up postort from PAP/API Lite. Returns None on failure."""
+    requests = _requests()
     if not requests:
         return None
     postnummer = re.sub(r"\s+", "", postnummer)
@@ -232,9 +227,11 @@ def _lookup_postort_pap(postnummer: str, api_key: str) -> str | None:
 def _lookup_postort_fallback(postnummer: str) -> str | None:
     """Look up postort from embedded fallback (no API)."""
     postnummer = re.sub(r"\s+", "", postnummer)
-    if len(postnummer) != 5:
+    # Every 3-digit prefix covers all of its 5-digit codes (prefix + 00..99).
+    suffix = postnummer[3:]
+    if len(postnummer) != 5 or not (suffix.isascii() and suffix.isdigit()):
         return None
-    return _FALLBACK_5DIGIT.get(postnummer)
+    return FALLBACK_POSTNUMMER.get(postnummer[:3])
 
 
 def _normalize_postnummer(v: str) -> str:
@@ -3,12 +3,46 @@ flytt_form_filler.py - Auto-fill Skatteverket flyttanmälan form.
 
 Approach: scan all known fields each round, fill whatever is visible,
 click Nästa to advance, repeat. Not sequential - handles any wizard step.
+
+Each round starts with one page.evaluate (FIELD_SNAPSHOT_JS) that reports
+presence, visibility, current value and disabled state of every field in
+FIELD_SELECTORS, plus the Nästa button and CONFIRM_CHECKBOX, across shadow
+roots. The round then only acts on that snapshot: fills, the confirmation
+click and Nästa are the only other browser calls. Round-trips per round are
+logged.
+
+There are no fixed sleeps between steps. After Nästa the filler polls the
+snapshot until the wizard has moved: the active flytt-skv-wizard-step
+changed, new fields became visible, or a confirmation checkbox appeared,
+with busy cleared on the Nästa host. Every wait is bounded (the old sleep
+lengths are now the upper bounds). The filler returns, and logs, how much
+of its run was spent sleeping versus doing work.
+
+The snapshot also fingerprints the active step (its name attribute and the
+input names inside it). Steps found in flytt_step_plan.STEP_PLANS are
+filled from the plan and advanced in the same round; on a step whose plan
+has confirm (adress), a confirmation checkbox that appears after Nästa is
+checked and Nästa pressed again within that round. The review step stops
+the filler. Unknown fingerprints fall back to scanning every field.
+
+Fast-fill (opt-in, fast_fill=True / settings.fast_fill / SKV_FAST_FILL): all fields of a round
+are written by one evaluate (FAST_FILL_JS) that finds them through shadow
+roots, sets the value through the native setter, dispatches input, change
+and one blur like a user edit, and reads the values back. Fields that do not
+verify go through page.fill. The log shows the fill time per mode.
+
+The loop is written once (flytt_form_filler_body, a skv_drive body):
+run_flytt_form_filler drives it on a playwright.sync_api page,
+run_flytt_form_filler_async on a playwright.async_api page.
 """
 import os
 import time
 import json
 import re
-from typing import Callable, Optional, Dict
+from typing import Callable, Optional, Dict, Tuple
+
+from formulär.flytt_step_plan import fingerprint, lookup_plan
+from skv_drive import Sleep, run_async, run_sync
 
 DEFAULT_MOCKUP_DATA = {
     "inflyttningsdatum": "2026-01-15",
@@ -39,12 +73,117 @@ NEXT_BTN = "skv-button-10-0-7[button-type='primary'].flytt-skv-wizard-step-butto
 # Confirmation checkbox that appears on address validation error
 CONFIRM_CHECKBOX = "skv-selection-control-10-0-12[type='checkbox']"
 
-POLL_INTERVAL = 1.0
-WAIT_BETWEEN_FILLS = 0.5
-WAIT_AFTER_NEXT = 2.0
+# Upper bounds of the transition waits (seconds)
+POLL_INTERVAL = 1.0       # idle round: wait this long at most for the page to change
+WAIT_AFTER_NEXT = 2.0     # after Nästa: wait this long at most for the next step
+WAIT_AFTER_CONFIRM = 0.5  # after checking the confirmation checkbox
+FIRST_NEXT_TIMEOUT = 4.0  # one-time gate before the first Nästa
+# Snapshot polling interval inside those waits
+TRANSITION_POLL = 0.1
 MAX_ROUNDS = 30
 MAX_IDLE_ROUNDS = 8
 
+# One-round-trip discovery. Visibility follows Playwright's rule (non-empty
+# box, not visibility:hidden; display:contents hosts defer to their children).
+FIELD_SNAPSHOT_JS = """([fields, nextSel, confirmSel]) => {
+    const roots = [document];
+    for (let i = 0; i < roots.length; i++) {
+        for (const el of roots[i].querySelectorAll('*')) {
+            if (el.shadowRoot) roots.push(el.shadowRoot);
+        }
+    }
+    const all = (sel) => {
+        const out = [];
+        for (const r of roots) {
+            try { out.push(...r.querySelectorAll(sel)); } catch (e) {}
+        }
+        return out;
+    };
+    const visible = (el) => {
+        const style = getComputedStyle(el);
+        if (style.display === 'contents') return Array.from(el.children).some(visible);
+        const box = el.getBoundingClientRect();
+        return style.visibility !== 'hidden' && box.width > 0 && box.height > 0;
+    };
+    const out = {
+        fields: {}, step: { index: -1, count: 0, name: '', inputs: [] },
+        next: { count: 0, visible: false, busy: null }, confirm: { count: 0, visible: 0, unchecked: 0 },
+    };
+    const steps = all('flytt-skv-wizard-step');
+    out.step.count = steps.length;
+    out.step.index = steps.findIndex(el => el.classList.contains('flytt-skv-wizard-step--active'));
+    const active = steps[out.step.index];
+    if (active) {
+        // Fingerprint: step name + input names inside the step, shadow roots included
+        out.step.name = active.getAttribute('name') || active.getAttribute('heading') || '';
+        const names = new Set();
+        const inner = [active];
+        for (let i = 0; i < inner.length; i++) {
+            for (const el of inner[i].querySelectorAll('*')) {
+                if (el.shadowRoot) inner.push(el.shadowRoot);
+                if (el.name && /^(INPUT|TEXTAREA|SELECT)$/.test(el.tagName)) names.add(el.name);
+            }
+        }
+        out.step.inputs = Array.from(names).sort();
+    }
+    for (const [name, sel] of Object.entries(fields)) {
+        const els = all(sel);
+        const el = els[0];
+        out.fields[name] = el ? {
+            count: els.length,
+            visible: visible(el),
+            value: el.value == null ? '' : String(el.value),
+            disabled: !!(el.disabled || el.readOnly || el.getAttribute('aria-disabled') === 'true'),
+        } : { count: 0, visible: false, value: '', disabled: false };
+    }
+    const next = all(nextSel);
+    if (next.length) out.next = { count: next.length, visible: visible(next[0]), busy: next[0].getAttribute('busy') };
+    for (const el of all(confirmSel)) {
+        out.confirm.count++;
+        if (visible(el)) {
+            out.confirm.visible++;
+            if (el.getAttribute('checked') === null) out.confirm.unchecked++;
+        }
+    }
+    return out;
+}"""
+
+# Fast-fill: {name: [selector, value]} -> {name: {ok, value}}. The native value
+# setter is used so Angular's value accessor sees the change.
+FAST_FILL_JS = """(fields) => {
+    const roots = [document];
+    for (let i = 0; i < roots.length; i++) {
+        for (const el of roots[i].querySelectorAll('*')) {
+            if (el.shadowRoot) roots.push(el.shadowRoot);
+        }
+    }
+    const find = (sel) => {
+        for (const r of roots) {
+            try { const el = r.querySelector(sel); if (el) return el; } catch (e) {}
+        }
+        return null;
+    };
+    const fire = (el, type, Ctor) => el.dispatchEvent(new Ctor(type, { bubbles: true, composed: true }));
+    const out = {};
+    for (const [name, [sel, value]] of Object.entries(fields)) {
+        const el = find(sel);
+        if (!el || el.disabled || el.readOnly) { out[name] = { ok: false, value: null }; continue; }
+        try {
+            el.focus();
+            const focused = el.getRootNode().activeElement === el;
+            const proto = Object.getPrototypeOf(el);
+            const setter = Object.getOwnPropertyDescriptor(proto, 'value');
+            if (setter && setter.set) setter.set.call(el, value); else el.value = value;
+            fire(el, 'input', InputEvent);
+            fire(el, 'change', Event);
+            // One blur/focusout pair: the browser's own when focus took, else synthetic.
+            if (focused) el.blur(); else { fire(el, 'blur', FocusEvent); fire(el, 'focusout', FocusEvent); }
+        } catch (e) {}
+        out[name] = { ok: el.value === value, value: el.value };
+    }
+    return out;
+}"""
+
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_FILE = os.path.join(SCRIPT_DIR, "flytt_filler_log.txt")
 
@@ -104,14 +243,26 @@ def _resolve_field_data(
     return {}
 
 
-def run_flytt_form_filler(
-    page,
-    cancel_check: Callable[[], bool],
-    log_callback: Optional[Callable[[str], None]] = None,
-    form_data: Optional[Dict[str, str]] = None,
-    payload_path: Optional[str] = None,
-    allow_mockup_data: bool = False,
-) -> None:
+def _run_options(
+    settings,
+    payload_path: Optional[str],
+    allow_mockup_data: Optional[bool],
+    fast_fill: Optional[bool],
+) -> Tuple[Optional[str], bool, bool]:
+    """(payload_path, allow_mockup_data, fast_fill): explicit argument, else settings, else off."""
+    def pick(value, attr, default):
+        if value is not None:
+            return value
+        return getattr(settings, attr, default) if settings is not None else default
+
+    return (
+        pick(payload_path, "payload_file", None) or None,
+        bool(pick(allow_mockup_data, "allow_mockup_data", False)),
+        bool(pick(fast_fill, "fast_fill", False)),
+    )
+
+
+def _make_logger(log_callback: Optional[Callable[[str], None]]) -> Callable[[str], None]:
     def _default_log(msg: str) -> None:
         try:
             with open(LOG_FILE, "a", encoding="utf-8") as f:
@@ -119,10 +270,6 @@ def run_flytt_form_filler(
         except Exception:
             pass
 
-    def log(msg: str) -> None:
-        fn = log_callback or _default_log
-        fn(msg)
-
     # Only clear own log file when using default (no callback); else output goes to session log
     if log_callback is None:
         try:
@@ -131,18 +278,357 @@ def run_flytt_form_filler(
         except Exception:
             pass
 
+    return log_callback or _default_log
+
+
+class _Trips:
+    """Browser round-trips issued during one filler round."""
+
+    __slots__ = ("n",)
+
+    def __init__(self) -> None:
+        self.n = 0
+
+
+class _Pacer:
+    """Sleep accounting: sleeping vs. everything else (useful time)."""
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.sleep_s = 0.0
+        self.transitions = 0
+        self.transition_timeouts = 0
+        self.round_trips = 0
+        self.rounds = 0
+        self.plan_rounds = 0
+        self.unknown_steps: list = []
+        self.fill = {"fast": {"fields": 0, "ms": 0.0, "fallbacks": 0}, "per_field": {"fields": 0, "ms": 0.0}}
+        self.steps: list = []  # one entry per round (see end_round)
+        self._round_started = self.started
+        self._round_sleep = 0.0
+
+    def begin_round(self) -> None:
+        self._round_started = time.monotonic()
+        self._round_sleep = self.sleep_s
+
+    def end_round(self, step: str, trips: int, mode: str) -> None:
+        self.steps.append({
+            "step": step,
+            "mode": mode,
+            "ms": round((time.monotonic() - self._round_started) * 1000, 1),
+            "round_trips": trips,
+            "sleep_ms": round((self.sleep_s - self._round_sleep) * 1000, 1),
+        })
+
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            yield Sleep(seconds)
+            self.sleep_s += seconds
+
+    def remaining(self, deadline: float) -> float:
+        return max(0.0, deadline - time.monotonic())
+
+    def summary(self) -> Dict:
+        total = time.monotonic() - self.started
+        return {
+            "total_s": round(total, 2),
+            "sleep_s": round(self.sleep_s, 2),
+            "useful_s": round(max(0.0, total - self.sleep_s), 2),
+            "rounds": self.rounds,
+            "round_trips": self.round_trips,
+            "transitions": self.transitions,
+            "transition_timeouts": self.transition_timeouts,
+            "plan_rounds": self.plan_rounds,
+            "scan_rounds": self.rounds - self.plan_rounds,
+            "unknown_steps": self.unknown_steps,
+            "fill": {mode: {**v, "ms": round(v["ms"], 1)} for mode, v in self.fill.items()},
+            "steps": self.steps,
+        }
+
+    def add_fill(self, mode: str, fields: int, ms: float) -> None:
+        self.fill[mode]["fields"] += fields
+        self.fill[mode]["ms"] += ms
+
+
+def _empty_snapshot(error: str = "") -> Dict:
+    return {
+        "fields": {},
+        "step": {"index": -1, "count": 0, "name": "", "inputs": []},
+        "next": {"count": 0, "visible": False, "busy": None},
+        "confirm": {"count": 0, "visible": 0, "unchecked": 0},
+        "error": error,
+    }
+
+
+def _snapshot_args() -> list:
+    return [FIELD_SELECTORS, NEXT_BTN, CONFIRM_CHECKBOX]
+
+
+def _not_busy(snap: Dict) -> bool:
+    busy = (snap.get("next") or {}).get("busy")
+    # busy attr is on host custom element; proceed when absent/false.
+    return not busy or str(busy).lower() in ("false", "0", "no")
+
+
+def _next_ready(snap: Dict) -> bool:
+    nxt = snap.get("next") or {}
+    return bool(nxt.get("count") and nxt.get("visible")) and _not_busy(snap)
+
+
+def _visible_fields(snap: Dict) -> set:
+    return {n for n, f in (snap.get("fields") or {}).items() if f.get("count") and f.get("visible")}
+
+
+def _step_index(snap: Dict) -> int:
+    return (snap.get("step") or {}).get("index", -1)
+
+
+def _transitioned(before: Dict, after: Dict) -> bool:
+    """Wizard moved on after Nästa: new step, new fields or a confirmation to answer."""
+    if after.get("error") or not _not_busy(after):
+        return False
+    if _step_index(after) != _step_index(before):
+        return True
+    if _visible_fields(after) - _visible_fields(before):
+        return True
+    return (after.get("confirm") or {}).get("unchecked", 0) > (before.get("confirm") or {}).get("unchecked", 0)
+
+
+def _confirm_pending(snap: Dict) -> bool:
+    return bool((snap.get("confirm") or {}).get("unchecked"))
+
+
+def _changed(before: Dict, after: Dict) -> bool:
+    """Anything the filler would act on differs (idle-round wait)."""
+    return _step_index(after) != _step_index(before) or _visible_fields(after) != _visible_fields(before) \
+        or (after.get("confirm") or {}).get("unchecked", 0) != (before.get("confirm") or {}).get("unchecked", 0) \
+        or _next_ready(after) != _next_ready(before)
+
+
+def _plan_fills(snap: Dict, data: Dict[str, str], fillable_fields: set, filled: set, log, only=None) -> list:
+    """Fields to fill this round, from the snapshot. Already-correct fields count as filled.
+
+    only restricts the candidates to a step plan's fields.
+    """
+    todo = []
+    for name in FIELD_SELECTORS:
+        if name not in fillable_fields or name in filled or (only is not None and name not in only):
+            continue
+        field = (snap.get("fields") or {}).get(name) or {}
+        if not (field.get("count") and field.get("visible")):
+            continue
+        value = data.get(name, "")
+        if not value:
+            continue
+        if field.get("value") == value:
+            todo.append((name, value, False))
+        elif field.get("disabled"):
+            log(f"SKIP: {name} is disabled")
+        else:
+            todo.append((name, value, True))
+    return todo
+
+
+def _round_summary(rnd: int, trips: _Trips, snap: Dict) -> str:
+    return f"Round {rnd + 1}: {trips.n} round-trip(s), {len(_visible_fields(snap))} field(s) visible, step {fingerprint(snap.get('step'))}"
+
+
+def _step_plan(snap: Dict, pacer: "_Pacer", log):
+    """Plan for the snapshot's active step; unknown fingerprints are logged once."""
+    plan = lookup_plan(snap.get("step"), FIELD_SELECTORS)
+    if plan is None and not snap.get("error"):
+        fp = fingerprint(snap.get("step"))
+        if fp not in pacer.unknown_steps:
+            pacer.unknown_steps.append(fp)
+            log(f"Unknown step {fp}: scan mode")
+    return plan
+
+
+def _is_terminal(snap: Dict) -> bool:
+    plan = lookup_plan(snap.get("step"), FIELD_SELECTORS)
+    return plan is not None and plan.terminal
+
+
+def _end_round(pacer: _Pacer, rnd: int, trips: _Trips, snap: Dict, log) -> None:
+    pacer.rounds += 1
+    pacer.round_trips += trips.n
+    plan = lookup_plan(snap.get("step"), FIELD_SELECTORS)
+    pacer.end_round(fingerprint(snap.get("step")), trips.n, "plan" if plan is not None else "scan")
+    log(_round_summary(rnd, trips, snap))
+
+
+def _finish(pacer: _Pacer, filled: set, log) -> Dict:
+    summary = pacer.summary()
+    log(
+        f"\nFlytt form filler finished. Filled: {sorted(filled)} "
+        f"({summary['round_trips']} round-trips; {summary['total_s']}s total, "
+        f"{summary['sleep_s']}s sleeping, {summary['useful_s']}s useful)"
+    )
+    return {**summary, "filled": sorted(filled)}
+
+
+def _discover(page, trips: _Trips):
+    trips.n += 1
+    try:
+        return (yield lambda: page.evaluate(FIELD_SNAPSHOT_JS, _snapshot_args()))
+    except Exception as e:
+        return _empty_snapshot(str(e))
+
+
+def _wait_until(page, trips: _Trips, pacer: _Pacer, cond: Callable[[Dict], bool], timeout: float):
+    """Poll the snapshot until cond(snapshot) or timeout. Returns (snapshot, met)."""
+    deadline = time.monotonic() + timeout
+    while True:
+        snap = yield from _discover(page, trips)
+        if cond(snap):
+            return snap, True
+        left = pacer.remaining(deadline)
+        if left <= 0:
+            return snap, False
+        yield from pacer.sleep(min(TRANSITION_POLL, left))
+
+
+def _fast_fill(page, todo: list, trips: _Trips, pacer: _Pacer, log):
+    """One evaluate for every field in todo. Returns the names that verified."""
+    fields = {name: [FIELD_SELECTORS[name], value] for name, value in todo}
+    started = time.perf_counter()
+    trips.n += 1
+    try:
+        result = (yield lambda: page.evaluate(FAST_FILL_JS, fields)) or {}
+    except Exception as e:
+        log(f"Fast-fill failed: {e}")
+        result = {}
+    ok = {name for name, r in result.items() if r and r.get("ok")}
+    ms = (time.perf_counter() - started) * 1000
+    pacer.add_fill("fast", len(ok), ms)
+    log(f"Fast-fill: {len(ok)}/{len(fields)} field(s) verified in {ms:.0f} ms")
+    return ok
+
+
+def _fill_round(page, todo: list, filled: set, trips: _Trips, pacer: _Pacer, log, fast: bool):
+    """Fill todo [(name, value, needs_fill)]; fast-fill first when enabled. Returns fields done."""
+    done = 0
+    for name, value, needs_fill in todo:
+        if not needs_fill:
+            filled.add(name)
+            done += 1
+            log(f"OK: {name} already '{value}'")
+    pending = [(name, value) for name, value, needs_fill in todo if needs_fill]
+    if fast and pending:
+        ok = yield from _fast_fill(page, pending, trips, pacer, log)
+        for name, value in pending:
+            if name in ok:
+                filled.add(name)
+                done += 1
+                log(f"OK: {name} = '{value}' (fast)")
+        pending = [(name, value) for name, value in pending if name not in ok]
+        pacer.fill["fast"]["fallbacks"] += len(pending)
+    if not pending:
+        return done
+    started = time.perf_counter()
+    count = 0
+    for name, value in pending:
+        try:
+            trips.n += 1
+            yield lambda: page.fill(FIELD_SELECTORS[name], value)
+            filled.add(name)
+            done += 1
+            count += 1
+            log(f"OK: {name} = '{value}'")
+        except Exception as e:
+            log(f"FAIL: {name} - {e}")
+    ms = (time.perf_counter() - started) * 1000
+    pacer.add_fill("per_field", count, ms)
+    log(f"Per-field fill: {count}/{len(pending)} field(s) in {ms:.0f} ms")
+    return done
+
+
+def _try_check_confirm(page, log, snap: Dict, trips: _Trips):
+    """Check a visible confirmation checkbox (address validation etc.) if the snapshot saw one."""
+    if not _confirm_pending(snap):
+        return False
+    try:
+        loc = page.locator(CONFIRM_CHECKBOX)
+        trips.n += 1
+        for i in range((yield loc.count)):
+            el = loc.nth(i)
+            trips.n += 1
+            if (yield el.is_visible):
+                trips.n += 1
+                checked = yield lambda: el.get_attribute("checked")
+                if checked is None:
+                    trips.n += 1
+                    yield lambda: el.click(timeout=3000)
+                    log("  -> Checked confirmation checkbox")
+                    return True
+    except Exception as e:
+        log(f"  -> Confirm checkbox failed: {e}")
+    return False
+
+
+def _check_plan_confirm(page, log, trips: _Trips):
+    """Check the first visible unchecked confirmation in one call (plan steps with confirm)."""
+    try:
+        trips.n += 1
+        yield lambda: page.locator(f"{CONFIRM_CHECKBOX}:not([checked]) >> visible=true").first.click(timeout=3000)
+        log("  -> Checked confirmation checkbox (plan)")
+        return True
+    except Exception as e:
+        log(f"  -> Confirm checkbox failed: {e}")
+    return False
+
+
+def _wait_for_first_next_ready(page, log, trips: _Trips, pacer: _Pacer, timeout_seconds: float = FIRST_NEXT_TIMEOUT):
+    """Short one-time gate before first Next click after readiness. Returns the ready snapshot."""
+    snap, ready = yield from _wait_until(page, trips, pacer, _next_ready, timeout_seconds)
+    if ready:
+        log("  -> First Nästa gate ready")
+        return snap
+    log("  -> First Nästa gate timeout, continue anyway")
+    return None
+
+
+def _try_click_next(page, log, snap: Dict, trips: _Trips):
+    nxt = snap.get("next") or {}
+    if not (nxt.get("count") and nxt.get("visible")):
+        return False
+    try:
+        # click() scrolls into view and waits for the button to be stable itself.
+        trips.n += 1
+        yield lambda: page.locator(NEXT_BTN).first.click(timeout=5000)
+        log("  -> Clicked Nästa")
+        return True
+    except Exception as e:
+        log(f"  -> Nästa failed: {e}")
+    return False
+
+
+def flytt_form_filler_body(
+    page,
+    cancel_check: Callable[[], bool],
+    log_callback: Optional[Callable[[str], None]] = None,
+    form_data: Optional[Dict[str, str]] = None,
+    payload_path: Optional[str] = None,
+    allow_mockup_data: Optional[bool] = None,
+    fast_fill: Optional[bool] = None,
+    settings=None,
+    mode: str = "sync",
+):
+    """The filler as a skv_drive body (see run_flytt_form_filler for the arguments)."""
+    log = _make_logger(log_callback)
+    pacer = _Pacer()
+    payload_path, allow_mockup_data, fast_fill = _run_options(settings, payload_path, allow_mockup_data, fast_fill)
     data = _resolve_field_data(form_data, payload_path, allow_mockup_data, log)
     fillable_fields = {k for k, v in data.items() if (v or "").strip()}
     if not fillable_fields:
         log("No fillable fields resolved. Exiting filler.")
-        return
+        return _finish(pacer, set(), log)
 
-    log("Flytt form filler started (scan-fill-advance mode)\n")
+    log(f"Flytt form filler started (scan-fill-advance mode, {mode}, fill: {'fast' if fast_fill else 'per-field'})\n")
 
     # Scroll down once at start - first Nästa is often below viewport on intro step
     try:
-        page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        time.sleep(0.5)
+        yield lambda: page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
     except Exception:
         pass
 
@@ -150,114 +636,125 @@ def run_flytt_form_filler(
     idle_rounds = 0
     first_next_gate_done = False
 
+    def _advance(snap: Dict, trips: _Trips, plan=None):
+        """Confirm + Nästa, then wait for the wizard to move. Returns (latest snapshot, moved).
+
+        On a plan step with confirm, a confirmation that appears after Nästa
+        is checked and Nästa pressed again in the same round.
+        """
+        nonlocal first_next_gate_done
+        if not first_next_gate_done:
+            snap = (yield from _wait_for_first_next_ready(page, log, trips, pacer)) or snap
+            first_next_gate_done = True
+        elif not _not_busy(snap):
+            snap, _ = yield from _wait_until(page, trips, pacer, _not_busy, WAIT_AFTER_NEXT)
+        if (yield from _try_check_confirm(page, log, snap, trips)):
+            snap, _ = yield from _wait_until(page, trips, pacer, lambda s: not _confirm_pending(s), WAIT_AFTER_CONFIRM)
+        moved = False
+        for attempt in range(2 if plan is not None and plan.confirm else 1):
+            if attempt:
+                if not (_confirm_pending(snap) and (yield from _check_plan_confirm(page, log, trips))):
+                    break
+                snap, _ = yield from _wait_until(page, trips, pacer, lambda s: not _confirm_pending(s) and _not_busy(s), WAIT_AFTER_CONFIRM)
+            if not (yield from _try_click_next(page, log, snap, trips)):
+                return snap, moved
+            before = snap
+            snap, moved = yield from _wait_until(page, trips, pacer, lambda s: _transitioned(before, s), WAIT_AFTER_NEXT)
+            if moved:
+                pacer.transitions += 1
+            else:
+                pacer.transition_timeouts += 1
+                log(f"  -> No transition within {WAIT_AFTER_NEXT}s")
+        return snap, moved
+
     for rnd in range(MAX_ROUNDS):
         if cancel_check():
             log("Cancelled.")
-            return
-
-        round_filled = 0
-
-        for name, selector in FIELD_SELECTORS.items():
-            if name not in fillable_fields:
-                continue
-            if name in filled:
-                continue
-            try:
-                loc = page.locator(selector)
-                if loc.count() > 0 and loc.first.is_visible():
-                    value = data.get(name, "")
-                    if not value:
-                        continue
-                    page.fill(selector, value)
-                    filled.add(name)
-                    round_filled += 1
-                    log(f"OK: {name} = '{value}'")
-                    time.sleep(WAIT_BETWEEN_FILLS)
-            except Exception as e:
-                log(f"FAIL: {name} - {e}")
-
-        if round_filled > 0:
-            idle_rounds = 0
-            log(f"Round {rnd + 1}: filled {round_filled} field(s). Clicking Nästa...")
-            time.sleep(WAIT_BETWEEN_FILLS)
-            if not first_next_gate_done:
-                _wait_for_first_next_ready(page, log)
-                first_next_gate_done = True
-            _try_check_confirm(page, log)
-            _try_click_next(page, log)
-            time.sleep(WAIT_AFTER_NEXT)
+            return _finish(pacer, filled, log)
+
+        trips = _Trips()
+        pacer.begin_round()
+        snap = yield from _discover(page, trips)
+        if snap.get("error"):
+            log(f"Snapshot failed: {snap['error']}")
+        plan = _step_plan(snap, pacer, log)
+        if plan is not None and plan.terminal:
+            _end_round(pacer, rnd, trips, snap, log)
+            log(f"Step '{plan.name}' reached: stopping before review/signing.")
+            break
+        todo = _plan_fills(snap, data, fillable_fields, filled, log, only=plan.fields if plan else None)
+        round_filled = yield from _fill_round(page, todo, filled, trips, pacer, log, fast_fill)
+
+        latest = snap
+        if plan is not None:
+            pacer.plan_rounds += 1
+        # Idle round: nothing filled and (on a known step) the wizard did not
+        # move. Known steps always press Nästa; unknown ones only for the
+        # first 3 idle rounds in a row, then wait for the page to change.
+        if round_filled > 0 or plan is not None or idle_rounds < 3:
+            if plan is not None:
+                log(f"Round {rnd + 1}: step '{plan.name}' (plan), filled {round_filled} field(s). Clicking Nästa...")
+            elif round_filled > 0:
+                log(f"Round {rnd + 1}: filled {round_filled} field(s). Clicking Nästa...")
+            latest, moved = yield from _advance(snap, trips, plan)
+            idle_rounds = 0 if round_filled > 0 or (plan is not None and moved) else idle_rounds + 1
         else:
             idle_rounds += 1
-            if idle_rounds <= 3:
-                if not first_next_gate_done:
-                    _wait_for_first_next_ready(page, log)
-                    first_next_gate_done = True
-                _try_check_confirm(page, log)
-                _try_click_next(page, log)
-                time.sleep(WAIT_AFTER_NEXT)
-            elif idle_rounds >= MAX_IDLE_ROUNDS:
-                log(f"No fields found for {MAX_IDLE_ROUNDS} rounds. Done.")
-                break
-            else:
-                time.sleep(POLL_INTERVAL)
+            if idle_rounds < MAX_IDLE_ROUNDS:
+                yield from _wait_until(page, trips, pacer, lambda s: _changed(snap, s), POLL_INTERVAL)
+        if idle_rounds >= MAX_IDLE_ROUNDS:
+            _end_round(pacer, rnd, trips, snap, log)
+            log(f"No progress for {MAX_IDLE_ROUNDS} rounds. Done.")
+            break
 
+        if len(filled) >= len(fillable_fields) and _is_terminal(latest):
+            _end_round(pacer, rnd, trips, snap, log)
+            log(f"\nAll {len(filled)} fields filled!")
+            break
         if len(filled) >= len(fillable_fields):
             if not first_next_gate_done:
-                _wait_for_first_next_ready(page, log)
+                latest = (yield from _wait_for_first_next_ready(page, log, trips, pacer)) or latest
                 first_next_gate_done = True
-            _try_click_next(page, log)
+            yield from _try_click_next(page, log, latest, trips)
+            _end_round(pacer, rnd, trips, snap, log)
             log(f"\nAll {len(filled)} fields filled!")
             break
+        _end_round(pacer, rnd, trips, snap, log)
 
-    log(f"\nFlytt form filler finished. Filled: {sorted(filled)}")
-
+    return _finish(pacer, filled, log)
 
-def _try_check_confirm(page, log) -> bool:
-    """Check any visible confirmation checkbox (address validation etc.)."""
-    try:
-        loc = page.locator(CONFIRM_CHECKBOX)
-        for i in range(loc.count()):
-            el = loc.nth(i)
-            if el.is_visible():
-                checked = el.get_attribute("checked")
-                if checked is None:
-                    el.click(timeout=3000)
-                    log("  -> Checked confirmation checkbox")
-                    time.sleep(0.5)
-                    return True
-    except Exception as e:
-        log(f"  -> Confirm checkbox failed: {e}")
-    return False
 
+def run_flytt_form_filler(
+    page,
+    cancel_check: Callable[[], bool],
+    log_callback: Optional[Callable[[str], None]] = None,
+    form_data: Optional[Dict[str, str]] = None,
+    payload_path: Optional[str] = None,
+    allow_mockup_data: Optional[bool] = None,
+    fast_fill: Optional[bool] = None,
+    settings=None,
+) -> Dict:
+    """Fill the wizard on page. Returns timing/round-trip stats (see _Pacer.summary).
 
-def _wait_for_first_next_ready(page, log, timeout_seconds: float = 4.0) -> bool:
-    """Short one-time gate before first Next click after readiness."""
-    start = time.time()
-    while (time.time() - start) < timeout_seconds:
-        try:
-            loc = page.locator(NEXT_BTN)
-            if loc.count() > 0 and loc.first.is_visible():
-                busy_attr = loc.first.get_attribute("busy")
-                # busy attr is on host custom element; proceed when absent/false.
-                if not busy_attr or str(busy_attr).lower() in ("false", "0", "no"):
-                    log("  -> First Nästa gate ready")
-                    return True
-        except Exception:
-            pass
-        time.sleep(0.2)
-    log("  -> First Nästa gate timeout, continue anyway")
-    return False
+    settings: the job's run options (skv_settings.SkvSettings: payload_file,
+    allow_mockup_data, fast_fill). Explicit arguments win over it.
+    """
+    return run_sync(flytt_form_filler_body(
+        page, cancel_check, log_callback, form_data, payload_path, allow_mockup_data, fast_fill, settings,
+    ))
 
 
-def _try_click_next(page, log) -> bool:
-    try:
-        loc = page.locator(NEXT_BTN)
-        if loc.count() > 0 and loc.first.is_visible():
-            loc.first.scroll_into_view_if_needed()
-            time.sleep(0.3)
-            loc.first.click(timeout=5000)
-            log("  -> Clicked Nästa")
-            return True
-    except Exception as e:
-        log(f"  -> Nästa failed: {e}")
-    return False
+async def run_flytt_form_filler_async(
+    page,
+    cancel_check: Callable[[], bool],
+    log_callback: Optional[Callable[[str], None]] = None,
+    form_data: Optional[Dict[str, str]] = None,
+    payload_path: Optional[str] = None,
+    allow_mockup_data: Optional[bool] = None,
+    fast_fill: Optional[bool] = None,
+    settings=None,
+) -> Dict:
+    """run_flytt_form_filler for playwright.async_api pages; waits yield to the event loop."""
+    return await run_async(flytt_form_filler_body(
+        page, cancel_check, log_callback, form_data, payload_path, allow_mockup_data, fast_fill, settings, mode="async",
+    ))
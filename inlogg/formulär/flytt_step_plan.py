@@ -0,0 +1,60 @@
+"""
+flytt_step_plan.py - Plan table for the flyttanmälan wizard steps.
+
+Derived from info/FLYTTANMALAN_FORMULAR_ANALYS.txt (sections 2, 3 and 5):
+six flytt-skv-wizard-step elements, identified by their name attribute,
+three of which have fillable fields.
+
+The filler fingerprints the active step from its DOM (step name + the input
+names inside it, see flytt_form_filler.FIELD_SNAPSHOT_JS). A fingerprint
+matches a plan when the step name is known, the inputs the plan requires are
+present, and no known form field outside the plan is showing. Matched steps
+are filled from the plan and advanced in one round; anything else falls
+back to scan mode.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class StepPlan:
+    name: str                       # flytt-skv-wizard-step name attribute
+    fields: Tuple[str, ...] = ()    # FIELD_SELECTORS keys filled on this step
+    requires: Tuple[str, ...] = ()  # input names that must be present to trust the match
+    confirm: bool = False           # address confirmation can appear after Nästa (answered in the same round)
+    terminal: bool = False          # stop here (review + BankID signing is the user's)
+
+
+STEP_PLANS: Dict[str, StepPlan] = {p.name: p for p in (
+    StepPlan("nuvarandeuppgifter"),
+    StepPlan("inflyttningsdatum", fields=("inflyttningsdatum",), requires=("inflyttningsdatum",)),
+    StepPlan(
+        "adress",
+        fields=("gatuadress", "postnummer", "postort", "lagenhetsnummer", "fastighetsbeteckning", "fastighetsagare"),
+        requires=("gatuadress", "postnummer", "postort"),
+        confirm=True,
+    ),
+    StepPlan("personer"),
+    StepPlan("kontakt", fields=("telefonnummer", "email"), requires=("telefonnummer", "email")),
+    StepPlan("granska", terminal=True),
+)}
+
+
+def fingerprint(step: Optional[Dict]) -> str:
+    """'name[input,input,...]' of the active step from a filler snapshot's "step" entry."""
+    step = step or {}
+    return f"{step.get('name') or '?'}[{','.join(sorted(step.get('inputs') or []))}]"
+
+
+def lookup_plan(step: Optional[Dict], known_fields: Iterable[str]) -> Optional[StepPlan]:
+    """Plan for the active step, or None (unknown step -> scan mode)."""
+    step = step or {}
+    plan = STEP_PLANS.get(step.get("name") or "")
+    if plan is None:
+        return None
+    inputs = set(step.get("inputs") or [])
+    if not set(plan.requires) <= inputs:
+        return None
+    if (inputs & set(known_fields)) - set(plan.fields):
+        return None
+    return plan
@@ -2,173 +2,71 @@
 skv6.py - Flyttanmälan Auto
 
 Click sequences → QR login → auto-fill form → save HTML snapshot.
-Single session log file (overwrites previous). POPUP_BROWSER_NORMAL_WINDOW
-opens form URL in default browser when form is found.
+One session log + artifact dir per job (see skv_session), so jobs can run
+concurrently. POPUP_BROWSER_NORMAL_WINDOW opens form URL in default browser
+when form is found.
+
+This module is the Flask UI/API; the jobs themselves run in skv_engine,
+which engine-only callers (skv_int7) import directly.
 """
+import gzip
 import json
 import os
 import re
-import time
 import uuid
 import threading
 import webbrowser
-from datetime import datetime
-from dataclasses import dataclass, asdict
-from typing import Optional, Dict, Any
+from dataclasses import asdict
 from urllib.parse import urljoin
 
-import requests
 from flask import Flask, request, jsonify, render_template_string, send_from_directory, Response
-
-# Playwright (sync)
-from playwright.sync_api import sync_playwright
-from skv_core import (
-    FORM_NEXT_HOST_SELECTOR,
-    USER_AGENT,
-    is_truthy,
-    load_config,
-    get_form_signals,
-    is_form_ready_from_signals,
-    get_all_pages_for_form,
-    pick_form_page,
+from werkzeug.utils import safe_join
+
+from skv_browser_pool import get_browser_pool
+from skv_scheduler import QueueFull
+from skv_events import parse_last_event_id
+from skv_joblog import get_job_log_writer
+from skv_capture import capture_totals
+from skv_artifacts import GZIP_SUFFIX, get_artifact_pipeline
+from skv_flow import flow_from_sequences, parse_flow
+from skv_gates import parse_gate
+from skv_selector_stats import get_selector_stats
+from skv_async_engine import engine_mode, get_async_engine
+from skv_core import USER_AGENT
+from skv_engine import (
+    RESULT_DIR,
+    SESSION_LOG_DIR,
+    JobStatus,
+    _drop_job,
+    _get_job,
+    _get_scheduler,
+    _job_events,
+    _get_job_store,
+    _last_housekeeping,
+    _set_job,
+    _settings_store,
+    _start_housekeeping,
+    _start_playwright_job,
+    cancel_job,
+    get_settings,
+    warm_engine,
 )
 
 
 APP_HOST = "127.0.0.1"
 APP_PORT = int(os.environ.get("PORT", "8767"))  # Different port to run alongside skv2
-SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-RESULT_DIR = os.path.join(SCRIPT_DIR, "results")
-os.makedirs(RESULT_DIR, exist_ok=True)
-RUNTIME_DIR = os.path.join(SCRIPT_DIR, "runtime")
-os.makedirs(RUNTIME_DIR, exist_ok=True)
-
-# Single session log - one file per run, overwrites previous session
-SESSION_LOG_FILE = os.path.join(SCRIPT_DIR, "skv6_session_log.txt")
-
-CONFIG_FILE = os.path.join(SCRIPT_DIR, "config.txt")
-DEFAULT_PAYLOAD_FILE = os.path.join(RUNTIME_DIR, "skv_payload_latest.json")
-
-
-def _load_config() -> Dict[str, str]:
-    """Load config from config.txt. Returns dict of KEY=value (lowercased values)."""
-    return load_config(CONFIG_FILE)
-
-
-def _get_form_signals(p) -> Dict[str, Any]:
-    return get_form_signals(p, FORM_NEXT_HOST_SELECTOR)
+# How long /results/ waits for an artifact that is still being written.
+ARTIFACT_WAIT_SECONDS = 10.0
 
+# Comment line sent on idle SSE streams so proxies keep the connection open.
+SSE_HEARTBEAT_SECONDS = 15.0
+# Sent after a job's final event; the page closes its EventSource on it.
+SSE_END = "event: end\ndata: {}\n\n"
 
-def _is_form_ready_from_signals(signals: Dict[str, Any], api_ready: bool) -> bool:
-    """Readiness decision after QR: require real form signals, with API fallback."""
-    return is_form_ready_from_signals(signals, api_ready)
-
-
-def _get_all_pages_for_form(page) -> list:
-    """Collect all pages in page's context - includes all tabs in same window."""
-    return get_all_pages_for_form(page)
-
-
-def _pick_form_page(page, popup_ref, api_ready: bool, all_pages: Optional[list] = None):
-    """Pick ready page among main, popup, and any other tabs (new tab often opens after BankID approval)."""
-    return pick_form_page(
-        page=page,
-        popup_ref=popup_ref,
-        api_ready=api_ready,
-        all_pages=all_pages,
-        next_selector=FORM_NEXT_HOST_SELECTOR,
-    )
 
 app = Flask(__name__)
 
 
-# ----------------------------
-# Job handling (simple in-memory)
-# ----------------------------
-
-@dataclass
-class JobStatus:
-    job_id: str
-    state: str            # queued | running | matched | timeout | error | cancelled
-    message: str = ""
-    started_at: Optional[float] = None
-    ended_at: Optional[float] = None
-    screenshot_path: Optional[str] = None
-    details: Optional[Dict[str, Any]] = None
-
-
-_jobs: Dict[str, JobStatus] = {}
-_cancel_flags: Dict[str, bool] = {}
-_jobs_lock = threading.Lock()
-
-
-def _set_job(job: JobStatus) -> None:
-    with _jobs_lock:
-        _jobs[job.job_id] = job
-
-
-def _get_job(job_id: str) -> Optional[JobStatus]:
-    with _jobs_lock:
-        return _jobs.get(job_id)
-
-
-def _cancel_job(job_id: str) -> bool:
-    with _jobs_lock:
-        if job_id in _jobs:
-            _cancel_flags[job_id] = True
-            return True
-    return False
-
-
-def _is_cancelled(job_id: str) -> bool:
-    with _jobs_lock:
-        return _cancel_flags.get(job_id, False)
-
-
-# ----------------------------
-# QR/BankID network logging
-# ----------------------------
-
-_log_lock = threading.Lock()
-
-# Store captured BankID tokens per job (aid, autostart_token) for opening in new tab
-_qr_captured: Dict[str, dict] = {}
-
-
-def _log_session(msg: str, section: str = "", data: Optional[dict] = None) -> None:
-    """Append to single session log file. Structured with timestamps and optional section."""
-    try:
-        with _log_lock:
-            ts = datetime.now().strftime("%H:%M:%S")
-            with open(SESSION_LOG_FILE, "a", encoding="utf-8") as f:
-                if section:
-                    f.write(f"\n[{ts}] [{section}] {msg}\n")
-                else:
-                    f.write(f"[{ts}] {msg}\n")
-                if data:
-                    f.write(json.dumps(data, indent=2, ensure_ascii=False) + "\n")
-    except Exception as e:
-        print(f"Session log error: {e}")
-
-
-def _clear_session_log(job_id: str = "") -> None:
-    """Clear and init log file at start of new session - overwrites previous."""
-    try:
-        with _log_lock:
-            ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            with open(SESSION_LOG_FILE, "w", encoding="utf-8") as f:
-                f.write("=" * 60 + "\n")
-                f.write(f"  FLYTTANMÄLAN SESSION  |  {ts}  |  job: {job_id}\n")
-                f.write("=" * 60 + "\n\n")
-    except Exception as e:
-        print(f"Session log clear error: {e}")
-
-
-def _log_qr_data(label: str, data: str | dict) -> None:
-    """Append QR/BankID-related data to session log."""
-    payload = data if isinstance(data, dict) else {"msg": str(data)}
-    _log_session(label, "QR/AUTH", payload)
-
-
 # ----------------------------
 # Proxy: strip X-Frame-Options for iframe embedding
 # ----------------------------
@@ -204,6 +102,8 @@ def proxy_route():
     if not target or not target.startswith(("http://", "https://")):
         return "Invalid or missing url parameter", 400
 
+    import requests
+
     try:
         resp = requests.get(
             target,
@@ -266,574 +166,15 @@ def proxy_route():
 # ----------------------------
 
 def _open_playwright_window(url: str) -> None:
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            page = browser.new_page()
-            page.goto(url, wait_until="domcontentloaded")
-    except Exception as e:
-        print(f"Playwright open error: {e}")
-
-
-# ----------------------------
-# Core: Fill Watch job
-# ----------------------------
-
-def _run_playwright_job(
-    job_id: str,
-    url: str,
-    timeout_seconds: float,
-    click_after_seconds_0: Optional[float] = None,
-    click_selectors_0: Optional[list[str]] = None,
-    click_after_seconds: Optional[float] = None,
-    click_selectors: Optional[list[str]] = None,
-    click_after_seconds_2: Optional[float] = None,
-    click_selectors_2: Optional[list[str]] = None,
-    click_after_seconds_3: Optional[float] = None,
-    click_selectors_3: Optional[list[str]] = None,
-) -> None:
-    job = _get_job(job_id)
-    if not job:
-        return
-
-    job.state = "running"
-    job.started_at = time.time()
-    job.message = "Startar webbläsare..."
-    _set_job(job)
-
-    # New session: clear previous logs and captured data
-    _clear_session_log(job_id)
-    with _log_lock:
-        _qr_captured.clear()
-
-    screenshot_file = os.path.join(RESULT_DIR, f"{job_id}.png")
+    from playwright.sync_api import sync_playwright
 
     try:
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=False)
             page = browser.new_page()
-
-            # Log QR/BankID-related network traffic; capture autostart token for "clone" tab
-            def on_response(response):
-                try:
-                    resp_url = response.url
-                    keywords = ("bankid", "auth", "status", "poll", "collect", "sign", "qr", "session")
-                    if any(k in resp_url.lower() for k in keywords) or "api" in resp_url.lower():
-                        ct = response.headers.get("content-type", "")
-                        if "json" in ct:
-                            try:
-                                body = response.json()
-                                _log_qr_data("RESPONSE", {"url": resp_url, "status": response.status, "body": body})
-                            except Exception:
-                                pass
-                        else:
-                            _log_qr_data("RESPONSE", {"url": resp_url, "status": response.status})
-
-                        # Logged-in API signal: secure flytt endpoints become available after QR auth.
-                        if "/secure/folkbokforing/flyttanmalan/" in resp_url.lower() and response.status == 200:
-                            first_seen = False
-                            with _log_lock:
-                                if job_id not in _qr_captured:
-                                    _qr_captured[job_id] = {}
-                                if not _qr_captured[job_id].get("flytt_api_ready"):
-                                    first_seen = True
-                                _qr_captured[job_id]["flytt_api_ready"] = True
-                                _qr_captured[job_id]["flytt_api_last_url"] = resp_url
-                            if first_seen:
-                                _log_qr_data("FORM_API_READY", {"url": resp_url, "status": response.status})
-
-                        # Capture aid and full auth page URL (not /qr - that gives EM_MISSING_AUTH_ATTEMPT when opened directly)
-                        if "aid=" in resp_url:
-                            m = re.search(r"aid=([^&]+)", resp_url)
-                            if m:
-                                aid = m.group(1)
-                                qr_page = f"https://auth.funktionstjanster.se/id/bankid/qr?aid={aid}"
-                                with _log_lock:
-                                    if job_id not in _qr_captured:
-                                        _qr_captured[job_id] = {}
-                                    _qr_captured[job_id]["aid"] = aid
-                                    _qr_captured[job_id]["qr_page_url"] = qr_page
-                                # Full auth SPA URL - capture from /web/app/ HTML page (has aid; exclude images)
-                                if "/web/app/" in resp_url and "aid=" in resp_url and not any(x in resp_url.lower() for x in [".svg", ".png", ".jpg", ".ico"]):
-                                    with _log_lock:
-                                        _qr_captured[job_id]["auth_spa_url"] = resp_url
-
-                        if "getautostarttoken" in resp_url.lower() and response.status == 200:
-                            try:
-                                body_text = response.text()
-                                if body_text and len(body_text) < 500:
-                                    aid = _qr_captured.get(job_id, {}).get("aid", "")
-                                    if "aid=" in resp_url:
-                                        m = re.search(r"aid=([^&]+)", resp_url)
-                                        if m:
-                                            aid = m.group(1)
-                                    token = body_text.strip().strip('"')
-                                    bankid_url = f"bankid:///?autostarttoken={token}&redirect=null"
-                                    with _log_lock:
-                                        if job_id not in _qr_captured:
-                                            _qr_captured[job_id] = {}
-                                        _qr_captured[job_id].update({
-                                            "autostart_token": token,
-                                            "bankid_url": bankid_url,
-                                        })
-                                    _log_qr_data("AUTOSTART_TOKEN_CAPTURED", {"aid": aid, "token": token[:20] + "...", "bankid_url": bankid_url})
-                            except Exception:
-                                pass
-                except Exception:
-                    pass
-
-            page.on("response", on_response)
-
-            job.message = f"Navigerar till: {url}"
-            _set_job(job)
-            _log_session(f"Navigate to {url}", "INIT")
             page.goto(url, wait_until="domcontentloaded")
-
-            # ---- Click sequences 0-3 ----
-
-            _log_session("Click sequences starting", "CLICKS")
-            # Click sequence 0 (cookie banner)
-            if click_after_seconds_0 and click_selectors_0:
-                job.message = f"Klicksekvens 0 (cookie): väntar {click_after_seconds_0}s..."
-                _set_job(job)
-                time.sleep(click_after_seconds_0)
-                if _is_cancelled(job_id):
-                    job.state = "cancelled"
-                    job.ended_at = time.time()
-                    job.message = "Avbruten av användaren."
-                    _set_job(job)
-                    browser.close()
-                    return
-                clicked0 = False
-                for sel in click_selectors_0:
-                    sel = (sel or "").strip()
-                    if not sel:
-                        continue
-                    try:
-                        page.click(sel, timeout=3000)
-                        if job.details and job.details.get("click_errors_0"):
-                            job.details["click_warnings_nonblocking_0"] = job.details.get("click_errors_0", [])
-                            job.details["click_errors_0"] = []
-                            job.message = "Klickade på cookie-banner (fortsatte efter fallback-selector)."
-                        else:
-                            job.message = "Klickade på cookie-banner."
-                        clicked0 = True
-                        _set_job(job)
-                        break
-                    except Exception as e:
-                        job.details = job.details or {}
-                        job.details["click_errors_0"] = job.details.get("click_errors_0", []) + [f"{sel}: {e}"]
-                        job.message = f"Cookie: misslyckades med {sel[:30]}..., provar nästa..."
-                        _set_job(job)
-                if not clicked0:
-                    job.message = "Cookie-banner: ingen selector fungerade (kanske ingen banner). Fortsätter..."
-
-            # Click sequence 1
-            if click_after_seconds and click_selectors:
-                job.message = f"Väntar {click_after_seconds}s, sedan klick på element..."
-                _set_job(job)
-                time.sleep(click_after_seconds)
-                if _is_cancelled(job_id):
-                    job.state = "cancelled"
-                    job.ended_at = time.time()
-                    job.message = "Avbruten av användaren."
-                    _set_job(job)
-                    browser.close()
-                    return
-                clicked = False
-                for sel in click_selectors:
-                    sel = (sel or "").strip()
-                    if not sel:
-                        continue
-                    try:
-                        page.click(sel, timeout=5000)
-                        if job.details and job.details.get("click_errors"):
-                            job.details["click_warnings_nonblocking_1"] = job.details.get("click_errors", [])
-                            job.details["click_errors"] = []
-                            job.message = f"Klickade på {sel}. Fortsatte efter fallback-selector i sekvens 1."
-                        else:
-                            job.message = f"Klickade på {sel}. Väntar på nästa steg..."
-                        clicked = True
-                        _set_job(job)
-                        break
-                    except Exception as e:
-                        job.details = job.details or {}
-                        job.details["click_errors"] = job.details.get("click_errors", []) + [f"{sel}: {e}"]
-                        job.message = f"Misslyckades med {sel}, provar nästa..."
-                        _set_job(job)
-                if not clicked:
-                    job.message = "Ingen klick-selector fungerade. Fortsätter bevaka fältet..."
-
-            # Click sequence 2
-            if click_after_seconds_2 and click_selectors_2:
-                job.message = f"Klicksekvens 2: väntar {click_after_seconds_2}s..."
-                _set_job(job)
-                time.sleep(click_after_seconds_2)
-                if _is_cancelled(job_id):
-                    job.state = "cancelled"
-                    job.ended_at = time.time()
-                    job.message = "Avbruten av användaren."
-                    _set_job(job)
-                    browser.close()
-                    return
-                clicked2 = False
-                for sel in click_selectors_2:
-                    sel = (sel or "").strip()
-                    if not sel:
-                        continue
-                    try:
-                        page.click(sel, timeout=5000)
-                        if job.details and job.details.get("click_errors_2"):
-                            job.details["click_warnings_nonblocking_2"] = job.details.get("click_errors_2", [])
-                            job.details["click_errors_2"] = []
-                            job.message = f"Klickade på {sel} (sekvens 2). Fortsatte efter fallback-selector."
-                        else:
-                            job.message = f"Klickade på {sel} (sekvens 2). Väntar på nästa steg..."
-                        clicked2 = True
-                        _set_job(job)
-                        break
-                    except Exception as e:
-                        job.details = job.details or {}
-                        job.details["click_errors_2"] = job.details.get("click_errors_2", []) + [f"{sel}: {e}"]
-                        job.message = f"Sekvens 2: misslyckades med {sel}, provar nästa..."
-                        _set_job(job)
-                if not clicked2:
-                    job.message = "Klicksekvens 2: ingen selector fungerade. Fortsätter bevaka fältet..."
-
-            # Click sequence 3 (QR code - opens in new tab)
-            popup_page_ref = None
-            if click_after_seconds_3 and click_selectors_3:
-                job.message = f"Klicksekvens 3: väntar {click_after_seconds_3}s (QR-kod)..."
-                _set_job(job)
-                time.sleep(click_after_seconds_3)
-                if _is_cancelled(job_id):
-                    job.state = "cancelled"
-                    job.ended_at = time.time()
-                    job.message = "Avbruten av användaren."
-                    _set_job(job)
-                    browser.close()
-                    return
-                clicked3 = False
-                for sel in click_selectors_3:
-                    sel = (sel or "").strip()
-                    if not sel:
-                        continue
-                    try:
-                        try:
-                            qr_info = page.evaluate("""() => {
-                                const links = Array.from(document.querySelectorAll('a[href*="bankid"], a[href*="redirect"], [data-qr-url], [data-autostart]'));
-                                return links.map(el => ({
-                                    href: el.href || el.getAttribute('href'),
-                                    'data-qr-url': el.getAttribute('data-qr-url'),
-                                    'data-autostart': el.getAttribute('data-autostart'),
-                                    text: (el.textContent || '').slice(0, 100)
-                                })).filter(x => x.href || x['data-qr-url'] || x['data-autostart']);
-                            }""")
-                            if qr_info:
-                                _log_qr_data("QR_URL_FROM_PAGE", qr_info)
-                        except Exception:
-                            pass
-
-                        got_popup = False
-                        try:
-                            with page.context.expect_page(timeout=3000) as popup_info:
-                                page.click(sel, timeout=5000)
-                            popup_page = popup_info.value
-                            got_popup = True
-                            popup_page_ref = popup_page
-                            _log_qr_data("QR_NEW_TAB_URL", {"url": popup_page.url})
-                        except Exception:
-                            pass
-
-                        if job.details and job.details.get("click_errors_3"):
-                            job.details["click_warnings_nonblocking_3"] = job.details.get("click_errors_3", [])
-                            job.details["click_errors_3"] = []
-                            job.message = f"Klickade på {sel} (sekvens 3, QR). Fortsatte efter fallback-selector."
-                        else:
-                            job.message = f"Klickade på {sel} (sekvens 3, QR)."
-                        clicked3 = True
-                        _log_qr_data("QR_CLICK", {"selector": sel, "job_id": job_id})
-                        _set_job(job)
-
-                        bankid_url = None
-                        with _log_lock:
-                            cap = _qr_captured.get(job_id, {})
-                        bankid_url = cap.get("bankid_url")
-
-                        # Clone tab fallback: when QR click doesn't open a popup,
-                        # we open a clone to the auth URL so the user can see and scan the QR code.
-                        # Without this, there's no visible QR if the browser doesn't create a popup.
-                        # Controlled by CLONE_TAB_FALLBACK in config.txt (default: off).
-                        if not got_popup:
-                            cfg = _load_config()
-                            clone_enabled = is_truthy(os.environ.get("SKV_FORCE_CLONE_TAB_FALLBACK", "")) or is_truthy(
-                                cfg.get("CLONE_TAB_FALLBACK", "")
-                            )
-                            if clone_enabled:
-                                clone_url = cap.get("auth_spa_url")
-                                if not clone_url and cap.get("aid"):
-                                    clone_url = f"https://auth.funktionstjanster.se/web/app/v2/68a6db1b897fa1039c3b3d40/67dace697e15efe89cf3d575/?lang=sv&aid={cap['aid']}"
-                                if clone_url:
-                                    try:
-                                        clone_page = browser.new_page()
-                                        clone_page.goto(clone_url, wait_until="domcontentloaded", timeout=30000)
-                                        _log_qr_data("QR_CLONE_OPENED", {"url": clone_url})
-                                    except Exception as e:
-                                        _log_qr_data("QR_CLONE_ERROR", str(e))
-                            else:
-                                _log_qr_data("QR_NO_POPUP_NO_CLONE", {"reason": "CLONE_TAB_FALLBACK not enabled"})
-
-                        if bankid_url:
-                            _log_qr_data("BANKID_URL_AVAILABLE", {"url": bankid_url})
-
-                        # Dev signal: keep focus on BankID QR window when requested.
-                        if is_truthy(os.environ.get("SKV_SYNLIGT_SKV", "")) and popup_page_ref and not popup_page_ref.is_closed():
-                            try:
-                                popup_page_ref.bring_to_front()
-                                _log_qr_data("QR_FOCUSED_FOR_DEV", {"enabled": True})
-                            except Exception:
-                                pass
-                        break
-                    except Exception as e:
-                        job.details = job.details or {}
-                        job.details["click_errors_3"] = job.details.get("click_errors_3", []) + [f"{sel}: {e}"]
-                        job.message = f"Sekvens 3: misslyckades med {sel}, provar nästa..."
-                        _set_job(job)
-                if not clicked3:
-                    job.message = "Klicksekvens 3: ingen selector fungerade. Fortsätter bevaka fältet..."
-
-            # ---- END click sequences ----
-
-            # ---- Wait for login, detect form wizard, run form filler, save HTML ----
-            _normal_browser_opened = False
-            _form_filler_done = False
-
-            job.message = "Väntar på inloggning (QR)..."
-            _set_job(job)
-
-            start = time.time()
-            flytt_page = None
-            _debug_count = 0
-            ready_streak = 0
-            ready_source = ""
-
-            # Phase 1: Wait for stable readiness signal after QR login
-            while (time.time() - start) < timeout_seconds:
-                if _is_cancelled(job_id):
-                    job.state = "cancelled"
-                    job.ended_at = time.time()
-                    job.message = "Avbruten av användaren."
-                    _log_session("Session cancelled by user", "DONE")
-                    try:
-                        page.screenshot(path=screenshot_file, full_page=True)
-                        job.screenshot_path = f"{job_id}.png"
-                    except Exception:
-                        pass
-                    _set_job(job)
-                    browser.close()
-                    return
-
-                with _log_lock:
-                    api_ready = bool(_qr_captured.get(job_id, {}).get("flytt_api_ready"))
-
-                all_pages = _get_all_pages_for_form(page)
-                candidate_page, candidate_source, source_signals, other_signals = _pick_form_page(
-                    page, popup_page_ref, api_ready, all_pages
-                )
-
-                if candidate_source == "popup":
-                    popup_signals = source_signals
-                    main_signals = other_signals
-                elif candidate_source == "main":
-                    main_signals = source_signals
-                    popup_signals = other_signals
-                else:
-                    main_signals = source_signals
-                    popup_signals = other_signals
-
-                # Debug: log what we see every 5 seconds
-                _debug_count += 1
-                if _debug_count % 5 == 0:
-                    elapsed = int(time.time() - start)
-                    status_bits = (
-                        f"main(form={main_signals.get('has_form')},wiz={main_signals.get('has_wizard_step')},"
-                        f"active={main_signals.get('has_active_step')},next={main_signals.get('has_next_host')})"
-                    )
-                    if popup_signals:
-                        status_bits += (
-                            f", popup(form={popup_signals.get('has_form')},wiz={popup_signals.get('has_wizard_step')},"
-                            f"active={popup_signals.get('has_active_step')},next={popup_signals.get('has_next_host')})"
-                        )
-                    status_bits += f", api_ready={api_ready}, streak={ready_streak}/2"
-                    job.message = f"Väntar på formulär ({elapsed}s)... {status_bits}"
-                    _set_job(job)
-                    _log_session(
-                        f"Waiting for form ({elapsed}s)",
-                        "FORM_WAIT",
-                        {
-                            "api_ready": api_ready,
-                            "candidate_source": candidate_source,
-                            "tabs_checked": len(all_pages) if all_pages else 0,
-                            "streak": f"{ready_streak}/2",
-                        },
-                    )
-
-                if candidate_page:
-                    if ready_source == candidate_source:
-                        ready_streak += 1
-                    else:
-                        ready_source = candidate_source
-                        ready_streak = 1
-
-                    if ready_streak == 1:
-                        _log_qr_data(
-                            "FORM_READY_CANDIDATE",
-                            {"source": candidate_source, "api_ready": api_ready, "signals": source_signals},
-                        )
-
-                    if ready_streak >= 2:
-                        flytt_page = candidate_page
-                        _log_session(
-                            f"Form detected on {candidate_source}",
-                            "FORM_DETECT",
-                            {"url": flytt_page.url, "signals": source_signals},
-                        )
-                        job.message = f"Formulär hittat på {candidate_source}, startar ifyllning..."
-                        _set_job(job)
-                        time.sleep(1.5)
-                        break
-                else:
-                    ready_streak = 0
-                    ready_source = ""
-
-                    # Fallback: on flytt URL but form not detected - scroll down (Nästa below fold),
-                    # then try clicking first Nästa. Check ALL tabs (form often opens in new tab after BankID).
-                    if _debug_count % 10 == 1:
-                        for try_page in all_pages or [page, popup_page_ref]:
-                            if try_page is None or try_page.is_closed():
-                                continue
-                            try:
-                                url = try_page.url or ""
-                                if "flytt" not in url.lower():
-                                    continue
-                                # Scroll down first - Nästa is often below viewport on intro page
-                                try_page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                                time.sleep(0.5)
-                                # Playwright pierces shadow DOM; try primary + text fallback
-                                loc = try_page.locator(FORM_NEXT_HOST_SELECTOR)
-                                if loc.count() > 0:
-                                    loc.first.scroll_into_view_if_needed()
-                                    time.sleep(0.3)
-                                    loc.first.click(timeout=3000)
-                                    _log_qr_data("NÄSTA_FALLBACK_CLICK", {"url": url[:60]})
-                                    job.message = "Klickade på Nästa (fallback), väntar på formulär..."
-                                    _set_job(job)
-                                    time.sleep(2.0)
-                                    break
-                                # Fallback: button with "Nästa" text (pierces shadow DOM)
-                                alt_loc = try_page.get_by_role("button", name="Nästa")
-                                if alt_loc.count() > 0:
-                                    alt_loc.first.scroll_into_view_if_needed()
-                                    time.sleep(0.3)
-                                    alt_loc.first.click(timeout=3000)
-                                    _log_qr_data("NÄSTA_FALLBACK_CLICK", {"url": url[:60], "selector": "role"})
-                                    job.message = "Klickade på Nästa (fallback), väntar på formulär..."
-                                    _set_job(job)
-                                    time.sleep(2.0)
-                                    break
-                            except Exception as e:
-                                _log_qr_data("NÄSTA_FALLBACK_FAIL", {"error": str(e)})
-
-                time.sleep(1.0)
-
-            if not flytt_page:
-                with _log_lock:
-                    api_ready = bool(_qr_captured.get(job_id, {}).get("flytt_api_ready"))
-                all_pages = _get_all_pages_for_form(page)
-                candidate_page, candidate_source, source_signals, _ = _pick_form_page(
-                    page, popup_page_ref, api_ready, all_pages
-                )
-                if candidate_page:
-                    flytt_page = candidate_page
-                    _log_session(
-                        f"Form detected late on {candidate_source}",
-                        "FORM_DETECT",
-                        {"url": flytt_page.url, "signals": source_signals},
-                    )
-
-            if flytt_page and not _normal_browser_opened:
-                cfg = _load_config()
-                disable_normal_browser = is_truthy(os.environ.get("SKV_DISABLE_NORMAL_BROWSER_WINDOW", ""))
-                if is_truthy(cfg.get("POPUP_BROWSER_NORMAL_WINDOW", "")) and not disable_normal_browser:
-                    try:
-                        webbrowser.open(flytt_page.url)
-                        _normal_browser_opened = True
-                        _log_session("Opened form URL in default browser (POPUP_BROWSER_NORMAL_WINDOW)", "FORM_DETECT")
-                    except Exception:
-                        pass
-
-            # Phase 2: Run form filler (output goes to session log)
-            if flytt_page:
-                try:
-                    from formulär.flytt_form_filler import run_flytt_form_filler
-
-                    def _form_log(msg: str) -> None:
-                        _log_session(msg.strip(), "FORM")
-
-                    job.message = "Fyller flyttformulär..."
-                    _set_job(job)
-                    _log_session("Starting form filler", "FORM")
-                    payload_file = os.environ.get("SKV_PAYLOAD_FILE", DEFAULT_PAYLOAD_FILE)
-                    allow_mockup = is_truthy(os.environ.get("SKV_ALLOW_MOCKUP_DATA", "y"))
-                    run_flytt_form_filler(
-                        flytt_page,
-                        lambda: _is_cancelled(job_id),
-                        log_callback=_form_log,
-                        payload_path=payload_file,
-                        allow_mockup_data=allow_mockup,
-                    )
-                    _form_filler_done = True
-                except Exception as e:
-                    job.details = job.details or {}
-                    job.details["flytt_filler_error"] = str(e)
-                    _log_session(f"Form filler error: {e}", "FORM")
-
-            # Phase 3: Save full page HTML snapshot
-            try:
-                save_page = flytt_page or page
-                html_content = save_page.content()
-                html_path = os.path.join(SCRIPT_DIR, "senaste_formulär.html")
-                with open(html_path, "w", encoding="utf-8") as f:
-                    f.write(html_content)
-            except Exception:
-                pass
-
-            try:
-                final_page = flytt_page or page
-                final_page.screenshot(path=screenshot_file, full_page=True)
-                job.screenshot_path = f"{job_id}.png"
-            except Exception:
-                job.screenshot_path = None
-
-            job.ended_at = time.time()
-
-            if _form_filler_done:
-                job.state = "matched"
-                job.message = "Formulär ifyllt! Se skv6_session_log.txt + senaste_formulär.html"
-                _log_session("Session completed successfully", "DONE")
-            elif job.state != "cancelled":
-                job.state = "timeout"
-                job.message = "Timeout: formuläret hittades inte inom vald tid (inloggning klar?)."
-                _log_session("Session ended: form not found within timeout", "DONE")
-
-            _set_job(job)
-
     except Exception as e:
-        job.state = "error"
-        job.ended_at = time.time()
-        job.message = f"Fel: {e}"
-        _log_session(f"Session error: {e}", "DONE")
-        _set_job(job)
+        print(f"Playwright open error: {e}")
 
 
 # ----------------------------
@@ -867,7 +208,7 @@ INDEX_HTML = """
   <h1>Flyttanmälan – Auto</h1>
   <p class="small">
     Klicksekvenser → QR-inloggning → formuläret fylls automatiskt.
-    Logg: <code>skv6_session_log.txt</code> (en fil per session, överskriver föregående)
+    Logg: <code>runtime/sessions/&lt;job_id&gt;_session_log.jsonl</code> (en JSON-rad per händelse, en fil per jobb, körningar kan gå parallellt)
   </p>
 
   <div class="card">
@@ -976,6 +317,7 @@ svg path</textarea>
 <script>
 let currentJobId = null;
 let pollTimer = null;
+let eventSource = null;
 
 function setStatus(obj) {
   const el = document.getElementById("status");
@@ -1028,11 +370,34 @@ async function startJob() {
   });
 
   const data = await res.json();
+  if (res.status === 429) {
+    setStatus({ state: "rejected", message: data.error, retry_after: data.retry_after });
+    return;
+  }
   currentJobId = data.job_id;
   setStatus(data);
+  watchJob(currentJobId);
+}
 
-  if (pollTimer) clearInterval(pollTimer);
-  pollTimer = setInterval(pollStatus, 800);
+function stopWatching() {
+  if (eventSource) { eventSource.close(); eventSource = null; }
+  if (pollTimer) { clearInterval(pollTimer); pollTimer = null; }
+}
+
+function watchJob(jobId) {
+  stopWatching();
+  if (!window.EventSource) {
+    pollTimer = setInterval(pollStatus, 800);
+    return;
+  }
+  // EventSource resends Last-Event-ID on reconnect, so no update is lost.
+  eventSource = new EventSource("/api/events/" + encodeURIComponent(jobId));
+  eventSource.addEventListener("status", function(ev) {
+    setStatus(JSON.parse(ev.data));
+  });
+  // A finished job still sends its screenshot and capture details; "end"
+  // follows its last event.
+  eventSource.addEventListener("end", stopWatching);
 }
 
 async function pollStatus() {
@@ -1040,10 +405,7 @@ async function pollStatus() {
   const res = await fetch("/api/status/" + encodeURIComponent(currentJobId));
   const data = await res.json();
   setStatus(data);
-  if (["matched","timeout","error","cancelled"].includes(data.state)) {
-    clearInterval(pollTimer);
-    pollTimer = null;
-  }
+  if (data.final) stopWatching();
 }
 
 async function cancelJob() {
@@ -1136,9 +498,35 @@ def iframe_window():
 
 @app.get("/results/<path:filename>")
 def results(filename: str):
+    full = safe_join(RESULT_DIR, filename)
+    if full is None:
+        return jsonify({"error": "not found"}), 404
+    pipeline = get_artifact_pipeline()
+    if os.path.exists(full + GZIP_SUFFIX) or pipeline.is_pending(full + GZIP_SUFFIX):
+        # HTML snapshots are stored gzip-compressed; let the browser inflate them,
+        # or inflate here for clients that do not accept gzip.
+        if pipeline.wait_for(full + GZIP_SUFFIX, ARTIFACT_WAIT_SECONDS):
+            if request.accept_encodings["gzip"]:
+                resp = send_from_directory(RESULT_DIR, filename + GZIP_SUFFIX, mimetype="text/html")
+                resp.headers["Content-Encoding"] = "gzip"
+            else:
+                with gzip.open(full + GZIP_SUFFIX, "rb") as f:
+                    resp = Response(f.read(), mimetype="text/html")
+            resp.vary.add("Accept-Encoding")
+            return resp
+    pipeline.wait_for(full, ARTIFACT_WAIT_SECONDS)
     return send_from_directory(RESULT_DIR, filename)
 
 
+# /api/run fields of click sequences 0-3: (seconds, selectors, gate (skv_gates.parse_gate)).
+CLICK_SEQUENCE_KEYS = (
+    ("click_after_seconds_0", "click_selectors_0", "click_wait_0"),
+    ("click_after_seconds", "click_selectors", "click_wait"),
+    ("click_after_seconds_2", "click_selectors_2", "click_wait_2"),
+    ("click_after_seconds_3", "click_selectors_3", "click_wait_3"),
+)
+
+
 @app.post("/api/run")
 def api_run():
     data = request.get_json(force=True) or {}
@@ -1159,50 +547,153 @@ def api_run():
             after = float(after) if float(after) > 0 else None
         return after, sels
 
-    click_after_0, click_selectors_0 = parse_click("click_after_seconds_0", "click_selectors_0")
-    click_after, click_selectors = parse_click("click_after_seconds", "click_selectors")
-    click_after_2, click_selectors_2 = parse_click("click_after_seconds_2", "click_selectors_2")
-    click_after_3, click_selectors_3 = parse_click("click_after_seconds_3", "click_selectors_3")
+    # A "flow" list (skv_flow.parse_flow) wins over the per-sequence fields.
+    try:
+        if data.get("flow") is not None:
+            flow = parse_flow(data.get("flow"))
+        else:
+            flow = flow_from_sequences([
+                (*parse_click(key_after, key_selectors), parse_gate(data.get(key_gate)))
+                for key_after, key_selectors, key_gate in CLICK_SEQUENCE_KEYS
+            ])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     if not url.startswith(("http://", "https://")):
         return jsonify({"error": "URL måste börja med http:// eller https://"}), 400
 
+    settings_overrides = data.get("settings") or None
+    if settings_overrides is not None:
+        if not isinstance(settings_overrides, dict):
+            return jsonify({"error": "settings måste vara ett objekt"}), 400
+        try:
+            get_settings(settings_overrides)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
     job_id = uuid.uuid4().hex[:12]
     job = JobStatus(job_id=job_id, state="queued", message="Köad...")
     _set_job(job)
 
-    t = threading.Thread(
-        target=_run_playwright_job,
-        args=(job_id, url, timeout_seconds),
-        kwargs={
-            "click_after_seconds_0": click_after_0,
-            "click_selectors_0": click_selectors_0,
-            "click_after_seconds": click_after,
-            "click_selectors": click_selectors,
-            "click_after_seconds_2": click_after_2,
-            "click_selectors_2": click_selectors_2,
-            "click_after_seconds_3": click_after_3,
-            "click_selectors_3": click_selectors_3,
-        },
-        daemon=True,
-    )
-    t.start()
+    def _run():
+        # Async engine: returns the job's future, so the scheduler thread is free again.
+        return _start_playwright_job(
+            job_id,
+            url,
+            timeout_seconds,
+            flow=flow,
+            settings_overrides=settings_overrides,
+        )
+
+    try:
+        _get_scheduler().submit(job_id, _run)
+    except QueueFull as e:
+        _drop_job(job_id)
+        return (
+            jsonify({"error": "Kön är full, försök igen senare.", "retry_after": e.retry_after}),
+            429,
+            {"Retry-After": str(e.retry_after)},
+        )
 
-    return jsonify(asdict(job))
+    return jsonify(asdict(_get_job(job_id) or job))
 
 
 @app.get("/api/status/<job_id>")
 def api_status(job_id: str):
-    job = _get_job(job_id)
-    if not job:
+    snapshot = _get_job_store().lookup(job_id)
+    if not snapshot:
         return jsonify({"error": "job not found"}), 404
-    return jsonify(asdict(job))
+    return jsonify({**snapshot, "final": _job_events.is_final(job_id)})
+
+
+@app.get("/api/events/<job_id>")
+def api_events(job_id: str):
+    """Server-Sent Events: one `status` event per JobStatus change, resumable via Last-Event-ID.
+
+    After the job's final event the stream sends `end` and closes; clients
+    close on `end`, not on a terminal state.
+    """
+    if not _job_events.has_job(job_id):
+        snapshot = _get_job_store().lookup(job_id)
+        if not snapshot:
+            return jsonify({"error": "job not found"}), 404
+        # Evicted/finished job: one final snapshot from history, then end the stream.
+        data = json.dumps(snapshot, ensure_ascii=False, default=str)
+        return Response(
+            f"retry: 2000\n\nevent: status\ndata: {data}\n\n{SSE_END}",
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+    after = parse_last_event_id(request.headers.get("Last-Event-ID") or request.args.get("last_event_id"))
+
+    def stream():
+        nonlocal after
+        yield "retry: 2000\n\n"
+        while True:
+            events, final = _job_events.wait(job_id, after, timeout=SSE_HEARTBEAT_SECONDS)
+            if not events and not final:
+                yield ": keepalive\n\n"
+                continue
+            for seq, data in events:
+                after = seq
+                yield f"id: {seq}\nevent: status\ndata: {data}\n\n"
+            if final:
+                yield SSE_END
+                return
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/api/cancel/<job_id>")
 def api_cancel(job_id: str):
-    ok = _cancel_job(job_id)
-    return jsonify({"ok": ok})
+    return jsonify({"ok": cancel_job(job_id)})
+
+
+@app.get("/api/pool")
+def api_pool():
+    if engine_mode() == "async":
+        return jsonify(get_async_engine().stats())
+    return jsonify(get_browser_pool().stats())
+
+
+@app.get("/api/scheduler")
+def api_scheduler():
+    return jsonify(_get_scheduler().stats())
+
+
+@app.get("/api/logs/stats")
+def api_log_stats():
+    return jsonify(get_job_log_writer(SESSION_LOG_DIR).stats())
+
+
+@app.get("/api/capture/stats")
+def api_capture_stats():
+    return jsonify(capture_totals())
+
+
+@app.get("/api/config")
+def api_config():
+    """Effective settings (config.txt + env) and where each value came from."""
+    return jsonify(_settings_store.describe())
+
+
+@app.get("/api/jobs/stats")
+def api_job_stats():
+    return jsonify({**_get_job_store().stats(), "housekeeping": dict(_last_housekeeping)})
+
+
+@app.get("/api/selectors/stats")
+def api_selectors_stats():
+    return jsonify(get_selector_stats().snapshot())
+
+
+@app.get("/api/artifacts/stats")
+def api_artifact_stats():
+    return jsonify(get_artifact_pipeline().stats())
 
 
 @app.post("/api/open-playwright")
@@ -1224,6 +715,10 @@ def main():
     except Exception:
         pass
 
+    # Warm the browser pool so the first job does not pay for driver + browser start.
+    warm_engine()
+    _start_housekeeping()
+
     print(f"Server kör på {url}")
     print("Tryck Ctrl+C för att stoppa.")
     app.run(host=APP_HOST, port=APP_PORT, debug=False, threaded=True)
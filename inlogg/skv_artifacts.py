@@ -0,0 +1,210 @@
+"""
+skv_artifacts.py - Background artifact pipeline for job screenshots and HTML.
+
+The job thread only grabs bytes from the browser (a JPEG screenshot and the
+page HTML); hashing, gzip and disk writes happen on a writer thread. Each
+artifact path is reserved before the job publishes its final state, so the
+UI can request /results/<job_id>/screenshot.jpg straight away and the route
+waits for the pending write instead of returning 404.
+
+Identical content (same SHA-256) is stored once: later copies are hard links
+to the first file, so deleting one job dir never breaks another.
+
+Playwright screenshots are PNG or JPEG only, so compressed screenshots are
+JPEG. HTML is stored as <name>.gz and served with Content-Encoding: gzip
+(inflated by the route for clients that do not accept gzip).
+
+Environment:
+  SKV_SCREENSHOT_QUALITY  - JPEG quality 1-100 (default 70)
+  SKV_ARTIFACT_WORKERS    - Writer threads (default 1)
+"""
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from skv_drive import run_async, run_sync
+
+
+SCREENSHOT_NAME = "screenshot.jpg"
+HTML_NAME = "formular.html"
+GZIP_SUFFIX = ".gz"
+
+DEFAULT_SCREENSHOT_QUALITY = 70
+DEFAULT_WORKERS = 1
+# Remember this many content hashes for deduplication.
+MAX_KNOWN_HASHES = 256
+
+
+def screenshot_options() -> Dict[str, Any]:
+    quality = int(os.environ.get("SKV_SCREENSHOT_QUALITY", DEFAULT_SCREENSHOT_QUALITY))
+    return {"type": "jpeg", "quality": min(100, max(1, quality)), "full_page": True}
+
+
+class ArtifactPipeline:
+    def __init__(self, workers: int = DEFAULT_WORKERS) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="skv-artifacts")
+        self._pending: Dict[str, Future] = {}
+        self._known: "OrderedDict[str, str]" = OrderedDict()  # sha256 -> stored path
+        self._lock = threading.Lock()
+        self._counters = {"written": 0, "deduplicated": 0, "failed": 0, "abandoned": 0, "bytes_in": 0, "bytes_out": 0, "write_ms": 0.0}
+
+    # -- job side --
+
+    def reserve(self, path: str) -> None:
+        """Mark path as coming; wait_for(path) blocks until submit/abandon resolves it."""
+        with self._lock:
+            if path not in self._pending or self._pending[path].done():
+                self._pending[path] = Future()
+
+    def submit(self, path: str, data: bytes, compress: bool = False) -> None:
+        """Queue data for path (path + .gz when compress). Returns immediately."""
+        target = path + GZIP_SUFFIX if compress else path
+        with self._lock:
+            fut = self._pending.get(target)
+            if fut is None or fut.done():
+                fut = self._pending[target] = Future()
+        self._executor.submit(self._write, target, data, compress, fut)
+
+    def abandon(self, path: str) -> None:
+        with self._lock:
+            fut = self._pending.pop(path, None)
+            if fut is not None:
+                self._counters["abandoned"] += 1
+        if fut is not None and not fut.done():
+            fut.set_result(False)
+
+    def wait_for(self, path: str, timeout: float) -> bool:
+        """Block until a pending write of path finishes. True if the file exists afterwards."""
+        with self._lock:
+            fut = self._pending.get(path)
+        if fut is not None:
+            try:
+                fut.result(timeout=timeout)
+            except Exception:
+                pass
+        return os.path.exists(path)
+
+    def is_pending(self, path: str) -> bool:
+        with self._lock:
+            fut = self._pending.get(path)
+        return fut is not None and not fut.done()
+
+    # -- writer side --
+
+    def _write(self, path: str, data: bytes, compress: bool, fut: Future) -> None:
+        started = time.perf_counter()
+        ok = False
+        try:
+            digest = hashlib.sha256(data).hexdigest() + (GZIP_SUFFIX if compress else "")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                os.remove(path)
+            if self._link_known(digest, path):
+                ok = True
+                with self._lock:
+                    self._counters["deduplicated"] += 1
+            else:
+                out = gzip.compress(data, compresslevel=6) if compress else data
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(out)
+                os.replace(tmp, path)
+                ok = True
+                with self._lock:
+                    self._known[digest] = path
+                    self._known.move_to_end(digest)
+                    while len(self._known) > MAX_KNOWN_HASHES:
+                        self._known.popitem(last=False)
+                    self._counters["written"] += 1
+                    self._counters["bytes_in"] += len(data)
+                    self._counters["bytes_out"] += len(out)
+        except Exception as e:
+            with self._lock:
+                self._counters["failed"] += 1
+            print(f"Artifact write error ({os.path.basename(path)}): {e}")
+        finally:
+            with self._lock:
+                self._counters["write_ms"] += (time.perf_counter() - started) * 1000
+                if self._pending.get(path) is fut:
+                    del self._pending[path]
+            fut.set_result(ok)
+
+    def _link_known(self, digest: str, path: str) -> bool:
+        with self._lock:
+            existing = self._known.get(digest)
+        if not existing or not os.path.exists(existing):
+            return False
+        try:
+            os.link(existing, path)
+            return True
+        except OSError:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self._counters)
+            out["pending"] = sum(1 for f in self._pending.values() if not f.done())
+        out["write_ms"] = round(out["write_ms"], 1)
+        return out
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+_pipeline: Optional[ArtifactPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_artifact_pipeline() -> ArtifactPipeline:
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = ArtifactPipeline(workers=int(os.environ.get("SKV_ARTIFACT_WORKERS", DEFAULT_WORKERS)))
+        return _pipeline
+
+
+# ----------------------------
+# Job helpers (sync + async Playwright)
+# ----------------------------
+
+def reserve_job_artifacts(session, html: bool = True) -> str:
+    """Reserve this job's screenshot (and HTML) paths. Returns the screenshot URL path."""
+    pipeline = get_artifact_pipeline()
+    pipeline.reserve(session.artifact_path(SCREENSHOT_NAME))
+    if html:
+        pipeline.reserve(session.artifact_path(HTML_NAME) + GZIP_SUFFIX)
+    return session.artifact_url_path(SCREENSHOT_NAME)
+
+
+def capture_page_artifacts_body(session, page, html: bool = True):
+    """Grab screenshot/HTML bytes from page and hand them to the pipeline (skv_drive body)."""
+    pipeline = get_artifact_pipeline()
+    captured = {"screenshot": False, "html": False}
+    if html:
+        html_path = session.artifact_path(HTML_NAME)
+        try:
+            pipeline.submit(html_path, (yield page.content).encode("utf-8"), compress=True)
+            captured["html"] = True
+        except Exception:
+            pipeline.abandon(html_path + GZIP_SUFFIX)
+    shot_path = session.artifact_path(SCREENSHOT_NAME)
+    try:
+        pipeline.submit(shot_path, (yield lambda: page.screenshot(**screenshot_options())))
+        captured["screenshot"] = True
+    except Exception:
+        pipeline.abandon(shot_path)
+    return captured
+
+
+def capture_page_artifacts(session, page, html: bool = True) -> Dict[str, bool]:
+    """capture_page_artifacts_body on a sync page (this thread)."""
+    return run_sync(capture_page_artifacts_body(session, page, html))
+
+
+async def capture_page_artifacts_async(session, page, html: bool = True) -> Dict[str, bool]:
+    return await run_async(capture_page_artifacts_body(session, page, html))
@@ -0,0 +1,232 @@
+"""
+skv_async_engine.py - asyncio engine for the SKV login-and-fill flow.
+
+The sync engine pins one OS thread (and one pooled browser) per session for
+the whole BankID wait. This engine runs every session as a coroutine on one
+event loop in a background thread, with one Chromium and a fresh context per
+session, so dozens of sessions can wait on their QR scans concurrently.
+
+Jobs run the same body as skv_engine._run_job_in_context (skv_job.job_body,
+driven by skv_drive.run_async), with AsyncFormReadinessWatcher for readiness.
+publish (job store + event bus) and the selector-stats update are Blocking
+steps of that body, so their SQLite/JSON writes run in the loop's default
+executor rather than on the loop thread. Enabled with SKV_ENGINE=async;
+skv_engine._start_playwright_job then hands the job to AsyncEngine.submit_job
+and returns its future, so a scheduler slot stays taken for the job's
+lifetime but no thread waits on it (skv_scheduler). AsyncEngine.run_job is
+the blocking form for callers without a scheduler (skv_int7).
+
+Environment:
+  SKV_ENGINE               - "async" to route jobs here (default "sync")
+  SKV_ASYNC_MAX_SESSIONS   - Concurrent sessions on the loop (default 24)
+  SKV_BROWSER_HEADLESS     - y = headless Chromium (default n)
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from skv_capture import ResponseCapture
+from skv_core import is_truthy
+from skv_drive import run_async
+from skv_flow import ClickStep
+from skv_job import job_body
+from skv_readiness import AsyncFormReadinessWatcher
+from skv_settings import SkvSettings
+
+
+DEFAULT_MAX_SESSIONS = 24
+
+
+def engine_mode() -> str:
+    return (os.environ.get("SKV_ENGINE") or "sync").strip().lower()
+
+
+class AsyncEngine:
+    """One asyncio loop + one Chromium; each job gets its own browser context."""
+
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS, headless: bool = False) -> None:
+        self.max_sessions = max(1, int(max_sessions))
+        self.headless = headless
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="skv-async-engine", daemon=True)
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._playwright = None
+        self._browser = None
+        self._browser_lock: Optional[asyncio.Lock] = None
+        self._sessions: Optional[asyncio.Semaphore] = None
+        self._active = 0
+        self._counters = {"launches": 0, "jobs_total": 0, "jobs_failed": 0}
+
+    # -- lifecycle --
+
+    def start(self) -> "AsyncEngine":
+        with self._start_lock:
+            if not self._started:
+                self._thread.start()
+                self._started = True
+                asyncio.run_coroutine_threadsafe(self._init_primitives(), self._loop).result()
+        return self
+
+    async def _init_primitives(self) -> None:
+        self._browser_lock = asyncio.Lock()
+        self._sessions = asyncio.Semaphore(self.max_sessions)
+
+    async def _ensure_browser(self):
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            if self._playwright is None:
+                from playwright.async_api import async_playwright
+
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self._counters["launches"] += 1
+            return self._browser
+
+    async def _shutdown(self) -> None:
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+        self._browser = None
+        self._playwright = None
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        if not self._started:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=timeout)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # -- jobs --
+
+    async def _run_in_context(self, job_coro_factory: Callable[[Any], Any]) -> Any:
+        async with self._sessions:
+            self._active += 1
+            context = None
+            try:
+                browser = await self._ensure_browser()
+                context = await browser.new_context()
+                self._counters["jobs_total"] += 1
+                return await job_coro_factory(context)
+            except BaseException:
+                self._counters["jobs_failed"] += 1
+                raise
+            finally:
+                self._active -= 1
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+
+    async def _run_and_finish(self, job_coro_factory: Callable[[Any], Any], finish: Callable[[Optional[BaseException]], None]) -> None:
+        error: Optional[BaseException] = None
+        try:
+            await self._run_in_context(job_coro_factory)
+        except Exception as e:
+            error = e
+        # Job store writes and log closing are file/SQLite I/O: keep them off the loop thread.
+        await asyncio.get_running_loop().run_in_executor(None, finish, error)
+
+    def submit_job(self, job, session, on_done: Optional[Callable[[Optional[BaseException]], None]] = None, **kwargs) -> Future:
+        """Start one job on the loop without waiting for it.
+
+        on_done(error or None) runs in the loop's default executor after the
+        job; the returned future is done once on_done has returned, and its
+        callbacks run in that executor thread too, not on the loop. Without
+        on_done the future carries the job's exception instead.
+        """
+        self.start()
+
+        def factory(context):
+            return run_job_async(context, job, session, **kwargs)
+
+        if on_done is None:
+            return asyncio.run_coroutine_threadsafe(self._run_in_context(factory), self._loop)
+        done: Future = Future()
+
+        def finish(error: Optional[BaseException]) -> None:
+            try:
+                on_done(error)
+            except BaseException as e:
+                done.set_exception(e)
+            else:
+                done.set_result(None)
+
+        asyncio.run_coroutine_threadsafe(self._run_and_finish(factory, finish), self._loop)
+        return done
+
+    def run_job(self, job, session, **kwargs) -> None:
+        """Blocking entry point: run one job on the loop and wait for it to finish."""
+        self.submit_job(job, session, **kwargs).result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "engine": "async",
+            "max_sessions": self.max_sessions,
+            "active_sessions": self._active,
+            "browser_connected": bool(self._browser and self._browser.is_connected()),
+            **self._counters,
+        }
+
+
+_engine: Optional[AsyncEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_async_engine() -> AsyncEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AsyncEngine(
+                max_sessions=int(os.environ.get("SKV_ASYNC_MAX_SESSIONS", DEFAULT_MAX_SESSIONS)),
+                headless=is_truthy(os.environ.get("SKV_BROWSER_HEADLESS", "")),
+            )
+        return _engine
+
+
+# ----------------------------
+# Job flow
+# ----------------------------
+
+async def run_job_async(
+    context,
+    job,
+    session,
+    capture: ResponseCapture,
+    settings: SkvSettings,
+    url: str,
+    timeout_seconds: float,
+    flow: List[ClickStep],
+    publish: Callable[[Any], None],
+    is_cancelled: Callable[[], bool],
+) -> None:
+    """Click sequences → QR login → form fill, for one job on an async context."""
+    readiness = await AsyncFormReadinessWatcher(context, log=session.log).attach()
+    await run_async(
+        job_body(
+            context,
+            readiness,
+            job,
+            session,
+            capture,
+            settings,
+            url,
+            timeout_seconds,
+            flow,
+            publish=publish,
+            is_cancelled=is_cancelled,
+            is_async=True,
+        )
+    )
@@ -0,0 +1,309 @@
+"""
+skv_browser_pool.py - Warm Chromium pool for SKV jobs.
+
+Sync Playwright objects are bound to the thread that created them, so every
+pooled browser lives on its own slot thread. Jobs are queued to the pool and
+picked up by the first free slot, which runs them against a fresh, isolated
+browser context. Browsers are health-checked while idle and recycled after
+SKV_BROWSER_MAX_JOBS jobs.
+
+Environment:
+  SKV_BROWSER_POOL_SIZE        - Number of pre-launched browsers (default 2)
+  SKV_BROWSER_MAX_JOBS         - Jobs per browser before recycle (default 20)
+  SKV_BROWSER_HEADLESS         - y = headless Chromium (default n, QR must be visible)
+  SKV_BROWSER_HEALTH_INTERVAL  - Seconds between idle health checks (default 30)
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from skv_core import is_truthy
+
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_JOBS_PER_BROWSER = 20
+DEFAULT_HEALTH_INTERVAL = 30.0
+
+
+class PoolClosed(RuntimeError):
+    """Raised when a job is submitted to a pool that has been shut down."""
+
+
+class LeaseCancelled(RuntimeError):
+    """Raised when the caller cancels while still waiting for a free browser."""
+
+
+@dataclass
+class BrowserLease:
+    """A fresh browser context handed to one job. Closed by the pool afterwards."""
+    context: Any
+    browser: Any
+    slot: int
+    wait_seconds: float
+    browser_job_number: int
+
+
+class _Slot:
+    """One pooled browser and the thread that owns it."""
+
+    def __init__(self, pool: "BrowserPool", index: int) -> None:
+        self.pool = pool
+        self.index = index
+        self.playwright = None
+        self.browser = None
+        self.launched_at: Optional[float] = None
+        self.jobs_served = 0
+        self.busy = False
+        self.thread = threading.Thread(target=self._loop, name=f"skv-browser-{index}", daemon=True)
+
+    # -- browser lifecycle (slot thread only) --
+
+    def _launch(self) -> None:
+        if self.playwright is None:
+            from playwright.sync_api import sync_playwright
+
+            self.playwright = sync_playwright().start()
+        self.browser = self.playwright.chromium.launch(headless=self.pool.headless)
+        self.launched_at = time.time()
+        self.jobs_served = 0
+        self.pool._bump("launches")
+
+    def _close_browser(self) -> None:
+        if self.browser is not None:
+            try:
+                self.browser.close()
+            except Exception:
+                pass
+        self.browser = None
+        self.launched_at = None
+
+    def _stop_driver(self) -> None:
+        self._close_browser()
+        if self.playwright is not None:
+            try:
+                self.playwright.stop()
+            except Exception:
+                pass
+        self.playwright = None
+
+    def _is_healthy(self) -> bool:
+        try:
+            return self.browser is not None and self.browser.is_connected()
+        except Exception:
+            return False
+
+    def _ensure_browser(self) -> None:
+        if self._is_healthy():
+            return
+        if self.browser is not None:
+            self.pool._bump("health_failures")
+            self._close_browser()
+        try:
+            self._launch()
+        except Exception:
+            # Driver itself may be gone - restart it once before giving up.
+            self._stop_driver()
+            self._launch()
+
+    def _recycle(self) -> None:
+        self._close_browser()
+        self.pool._bump("recycles")
+        try:
+            self._launch()
+        except Exception:
+            self._stop_driver()
+
+    # -- main loop --
+
+    def _loop(self) -> None:
+        try:
+            self._ensure_browser()
+        except Exception as e:
+            print(f"Browser pool slot {self.index}: warm launch failed: {e}")
+
+        while True:
+            try:
+                task = self.pool._tasks.get(timeout=self.pool.health_interval)
+            except queue.Empty:
+                if not self._is_healthy():
+                    try:
+                        self._ensure_browser()
+                    except Exception as e:
+                        print(f"Browser pool slot {self.index}: relaunch failed: {e}")
+                continue
+
+            if task is None:
+                break
+
+            fn, fut, submitted_at = task
+            if not fut.set_running_or_notify_cancel():
+                continue
+
+            self.busy = True
+            context = None
+            try:
+                self._ensure_browser()
+                context = self.browser.new_context()
+                self.jobs_served += 1
+                lease = BrowserLease(
+                    context=context,
+                    browser=self.browser,
+                    slot=self.index,
+                    wait_seconds=round(time.time() - submitted_at, 3),
+                    browser_job_number=self.jobs_served,
+                )
+                self.pool._bump("jobs_total")
+                fut.set_result(fn(lease))
+            except BaseException as e:
+                self.pool._bump("jobs_failed")
+                fut.set_exception(e)
+            finally:
+                if context is not None:
+                    try:
+                        context.close()
+                    except Exception:
+                        pass
+                self.busy = False
+                if self.jobs_served >= self.pool.max_jobs_per_browser or not self._is_healthy():
+                    self._recycle()
+
+        self._stop_driver()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "slot": self.index,
+            "busy": self.busy,
+            "connected": self._is_healthy(),
+            "jobs_served": self.jobs_served,
+            "browser_age_seconds": round(time.time() - self.launched_at, 1) if self.launched_at else None,
+        }
+
+
+class BrowserPool:
+    """N pre-launched Chromium browsers; jobs lease a fresh context from a free one."""
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        max_jobs_per_browser: int = DEFAULT_MAX_JOBS_PER_BROWSER,
+        headless: bool = False,
+        health_interval: float = DEFAULT_HEALTH_INTERVAL,
+    ) -> None:
+        self.size = max(1, int(size))
+        self.max_jobs_per_browser = max(1, int(max_jobs_per_browser))
+        self.headless = headless
+        self.health_interval = max(1.0, float(health_interval))
+        self._tasks: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._slots: List[_Slot] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._closed = False
+        self._counters: Dict[str, int] = {
+            "launches": 0,
+            "recycles": 0,
+            "health_failures": 0,
+            "jobs_total": 0,
+            "jobs_failed": 0,
+        }
+
+    def _bump(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def start(self) -> "BrowserPool":
+        """Start slot threads (each pre-launches its browser). Idempotent."""
+        with self._lock:
+            if self._started or self._closed:
+                return self
+            self._started = True
+            self._slots = [_Slot(self, i) for i in range(self.size)]
+        for slot in self._slots:
+            slot.thread.start()
+        return self
+
+    def submit(self, fn: Callable[[BrowserLease], Any]) -> Future:
+        """Queue fn to run on the next free browser. fn receives a BrowserLease."""
+        if self._closed:
+            raise PoolClosed("browser pool is shut down")
+        self.start()
+        fut: Future = Future()
+        self._tasks.put((fn, fut, time.time()))
+        return fut
+
+    def run(
+        self,
+        fn: Callable[[BrowserLease], Any],
+        cancel_check: Optional[Callable[[], bool]] = None,
+        poll_seconds: float = 0.5,
+    ) -> Any:
+        """Run fn on a pooled browser and wait for its result.
+
+        While the job is still queued, cancel_check is polled; a cancel before a
+        browser is leased raises LeaseCancelled. Once running, fn owns cancellation.
+        """
+        fut = self.submit(fn)
+        while True:
+            try:
+                return fut.result(timeout=poll_seconds)
+            except FutureTimeoutError:
+                if cancel_check and cancel_check() and fut.cancel():
+                    raise LeaseCancelled("cancelled while waiting for a browser")
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Stop all slots and close their browsers."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            slots = list(self._slots)
+        for _ in slots:
+            self._tasks.put(None)
+        for slot in slots:
+            slot.thread.join(timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            slots = list(self._slots)
+        slot_stats = [s.stats() for s in slots]
+        return {
+            "size": self.size,
+            "max_jobs_per_browser": self.max_jobs_per_browser,
+            "headless": self.headless,
+            "started": self._started,
+            "closed": self._closed,
+            "busy": sum(1 for s in slot_stats if s["busy"]),
+            "queued": self._tasks.qsize(),
+            **counters,
+            "slots": slot_stats,
+        }
+
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    """Process-wide pool, configured from SKV_BROWSER_* env on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._closed:
+            _pool = BrowserPool(
+                size=int(os.environ.get("SKV_BROWSER_POOL_SIZE", DEFAULT_POOL_SIZE)),
+                max_jobs_per_browser=int(os.environ.get("SKV_BROWSER_MAX_JOBS", DEFAULT_MAX_JOBS_PER_BROWSER)),
+                headless=is_truthy(os.environ.get("SKV_BROWSER_HEADLESS", "")),
+                health_interval=float(os.environ.get("SKV_BROWSER_HEALTH_INTERVAL", DEFAULT_HEALTH_INTERVAL)),
+            )
+        return _pool
+
+
+def shutdown_browser_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
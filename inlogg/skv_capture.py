@@ -0,0 +1,191 @@
+"""
+skv_capture.py - Network capture for the BankID/QR login and flytt API signal.
+
+page.on("response") fires for every response, static assets included. The
+handler keeps the original URL rules (keyword gate, "aid=" anywhere in the
+URL, /web/app/ pages for the auth SPA URL, the secure flytt API path) but
+rejects most responses with one precompiled search over the URL, and only
+fetches a body for the one endpoint whose body we consume
+(getautostarttoken). Everything else we need - aid, auth SPA URL, flytt API
+readiness - is read from the URL and status alone.
+
+Environment:
+  SKV_CAPTURE_LOG_BODIES  - y = also log JSON bodies of auth/API responses
+                            (debugging; costs one round-trip each, default n)
+"""
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from skv_core import is_truthy
+
+
+# The original handler's gate: any of these substrings in the lower-cased URL,
+# host and resource type not considered. One precompiled search replaces the
+# nine "in" checks; what passes is classified exactly as before.
+_GATE_RE = re.compile(r"bankid|auth|status|poll|collect|sign|qr|session|api")
+_AID_RE = re.compile(r"aid=([^&]+)")
+_FLYTT_API = "/secure/folkbokforing/flyttanmalan/"
+_IMAGE_EXTS = (".svg", ".png", ".jpg", ".ico")
+
+QR_PAGE_URL_TEMPLATE = "https://auth.funktionstjanster.se/id/bankid/qr?aid={aid}"
+
+_totals_lock = threading.Lock()
+_totals: Dict[str, float] = {}
+
+
+def _new_counters() -> Dict[str, float]:
+    return {
+        "seen": 0,
+        "skipped_gate": 0,
+        "skipped_no_hit": 0,
+        "matched": 0,
+        "body_fetches": 0,
+        "errors": 0,
+        "handler_ms": 0.0,
+        "handler_max_ms": 0.0,
+    }
+
+
+def capture_totals() -> Dict[str, Any]:
+    """Process-wide counters summed over finished captures."""
+    with _totals_lock:
+        totals = dict(_totals)
+    for k in ("handler_ms", "handler_max_ms"):
+        if k in totals:
+            totals[k] = round(totals[k], 2)
+    return totals
+
+
+class ResponseCapture:
+    """Per-job response handler. Use on_response (sync API) or on_response_async."""
+
+    def __init__(self, session, readiness=None) -> None:
+        self.session = session
+        self.readiness = readiness
+        self.log_bodies = is_truthy(os.environ.get("SKV_CAPTURE_LOG_BODIES", "n"))
+        self.counters = _new_counters()
+
+    # -- classification (no I/O) --
+
+    def _classify(self, response) -> Optional[Tuple[str, int, Dict[str, str]]]:
+        c = self.counters
+        c["seen"] += 1
+        url = response.url
+        lower = url.lower()
+        if not _GATE_RE.search(lower):
+            c["skipped_gate"] += 1
+            return None
+        hits: Dict[str, str] = {}
+        if _FLYTT_API in lower:
+            hits["flytt"] = _FLYTT_API
+        if "getautostarttoken" in lower:
+            hits["autostart"] = "getautostarttoken"
+        m = _AID_RE.search(url) if "aid=" in url else None
+        if m:
+            hits["aid"] = m.group(1)
+            # Full auth SPA URL comes from the /web/app/ HTML page, not its images
+            if "/web/app/" in url and not any(x in lower for x in _IMAGE_EXTS):
+                hits["webapp"] = url
+        if not hits and not self.log_bodies:
+            c["skipped_no_hit"] += 1
+            return None
+        c["matched"] += 1
+        return url, response.status, hits
+
+    def _apply_url_hits(self, url: str, status: int, hits: Dict[str, str]) -> None:
+        aid = hits.get("aid")
+        if aid:
+            self.session.update_capture(aid=aid, qr_page_url=QR_PAGE_URL_TEMPLATE.format(aid=aid))
+            if "webapp" in hits:
+                # Full auth SPA URL (not /qr - that gives EM_MISSING_AUTH_ATTEMPT when opened directly)
+                self.session.update_capture(auth_spa_url=url)
+        if "flytt" in hits and status == 200:
+            # Logged-in API signal: secure flytt endpoints become available after QR auth.
+            if self.session.mark_flytt_api_ready(url):
+                self.session.log_qr("FORM_API_READY", {"url": url, "status": status})
+            if self.readiness is not None:
+                self.readiness.signal("flytt_api", url)
+
+    def _apply_token(self, url: str, hits: Dict[str, str], body_text: str) -> None:
+        if not body_text or len(body_text) >= 500:
+            return
+        token = body_text.strip().strip('"')
+        bankid_url = f"bankid:///?autostarttoken={token}&redirect=null"
+        self.session.update_capture(autostart_token=token, bankid_url=bankid_url)
+        self.session.log_qr("AUTOSTART_TOKEN_CAPTURED", {
+            "aid": hits.get("aid") or self.session.capture().get("aid", ""),
+            "token": token[:20] + "...",
+            "bankid_url": bankid_url,
+        })
+
+    def _wants_body_log(self, response) -> bool:
+        return self.log_bodies and "json" in (response.headers.get("content-type") or "")
+
+    def _timed(self, started: float) -> None:
+        ms = (time.perf_counter() - started) * 1000
+        self.counters["handler_ms"] += ms
+        if ms > self.counters["handler_max_ms"]:
+            self.counters["handler_max_ms"] = ms
+
+    # -- handlers --
+
+    def on_response(self, response) -> None:
+        started = time.perf_counter()
+        try:
+            hit = self._classify(response)
+            if hit is None:
+                return
+            url, status, hits = hit
+            self._apply_url_hits(url, status, hits)
+            if "autostart" in hits and status == 200:
+                self.counters["body_fetches"] += 1
+                self._apply_token(url, hits, response.text())
+            elif self._wants_body_log(response):
+                self.counters["body_fetches"] += 1
+                self.session.log_qr("RESPONSE", {"url": url, "status": status, "body": response.json()})
+        except Exception:
+            self.counters["errors"] += 1
+        finally:
+            self._timed(started)
+
+    async def on_response_async(self, response) -> None:
+        started = time.perf_counter()
+        try:
+            hit = self._classify(response)
+            if hit is None:
+                return
+            url, status, hits = hit
+            self._apply_url_hits(url, status, hits)
+            if "autostart" in hits and status == 200:
+                self.counters["body_fetches"] += 1
+                self._apply_token(url, hits, await response.text())
+            elif self._wants_body_log(response):
+                self.counters["body_fetches"] += 1
+                self.session.log_qr("RESPONSE", {"url": url, "status": status, "body": await response.json()})
+        except Exception:
+            self.counters["errors"] += 1
+        finally:
+            self._timed(started)
+
+    # -- reporting --
+
+    def stats(self) -> Dict[str, Any]:
+        out = dict(self.counters)
+        out["handler_ms"] = round(out["handler_ms"], 2)
+        out["handler_max_ms"] = round(out["handler_max_ms"], 2)
+        return out
+
+    def finish(self) -> Dict[str, Any]:
+        """Fold this job's counters into the process totals and return them."""
+        with _totals_lock:
+            for k, v in self.counters.items():
+                if k == "handler_max_ms":
+                    _totals[k] = max(_totals.get(k, 0.0), v)
+                else:
+                    _totals[k] = _totals.get(k, 0) + v
+            _totals["jobs"] = _totals.get("jobs", 0) + 1
+        return self.stats()
+
@@ -0,0 +1,158 @@
+"""
+skv_clicks.py - "First of many" click for the click sequences.
+
+A click sequence lists fallback selectors (e.g. several cookie-banner
+variants). Trying them one by one with page.click(sel, timeout=...) costs a
+full timeout per missing selector before the working one is tried. Here all
+selectors are combined with Locator.or_ and we wait once for whichever
+becomes visible first; the earliest selector in the list that is visible at
+that moment is clicked, and the winner is recorded. Worst case is one
+timeout, not N.
+
+click_first and click_first_async share one body (skv_drive). Playwright
+is imported on first use, so importing this module (and skv_flow) stays
+cheap for callers that never click.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from skv_drive import run_async, run_sync
+
+
+# Sequence index -> (job.details error key, nonblocking-warning key), as before.
+CLICK_DETAIL_KEYS = {
+    0: ("click_errors_0", "click_warnings_nonblocking_0"),
+    1: ("click_errors", "click_warnings_nonblocking_1"),
+    2: ("click_errors_2", "click_warnings_nonblocking_2"),
+    3: ("click_errors_3", "click_warnings_nonblocking_3"),
+}
+
+
+@dataclass
+class ClickRace:
+    selector: Optional[str] = None  # winner, None if nothing was clicked
+    index: Optional[int] = None     # position of the winner in the selector list
+    elapsed_ms: int = 0
+    candidates: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def as_detail(self) -> Dict[str, Any]:
+        return {"selector": self.selector, "index": self.index, "elapsed_ms": self.elapsed_ms, "candidates": self.candidates}
+
+
+def _clean(selectors: Optional[List[str]]) -> List[str]:
+    return [s.strip() for s in (selectors or []) if s and s.strip()]
+
+
+def combined_locator(page, selectors: List[str]):
+    """First match of any of selectors (Locator.or_ over the list)."""
+    loc = page.locator(selectors[0])
+    for sel in selectors[1:]:
+        loc = loc.or_(page.locator(sel))
+    return loc.first
+
+
+def _first_line(e: Exception) -> str:
+    return (str(e).splitlines() or [""])[0]
+
+
+def _remaining_ms(deadline: float) -> int:
+    return max(1, int((deadline - time.monotonic()) * 1000))
+
+
+def click_first_body(page, selectors: Optional[List[str]], timeout_ms: int, click: Optional[Callable[[Any, int], Any]]):
+    """click_first as a skv_drive body; run_sync / run_async supply the awaits."""
+    # The sync and async APIs raise the same TimeoutError class.
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+    sels = _clean(selectors)
+    race = ClickRace(candidates=len(sels))
+    if not sels:
+        return race
+    started = time.monotonic()
+    deadline = started + timeout_ms / 1000
+    try:
+        try:
+            yield lambda: combined_locator(page, sels).wait_for(state="visible", timeout=timeout_ms)
+        except PlaywrightTimeoutError:
+            race.errors.append(f"inget av {len(sels)} selectors synligt inom {timeout_ms} ms")
+            return race
+        except Exception:
+            # A malformed selector poisons the combined locator: drop it and race the rest.
+            valid = []
+            for sel in sels:
+                try:
+                    yield lambda: page.locator(sel).count()
+                    valid.append(sel)
+                except Exception as e:
+                    race.errors.append(f"{sel}: {_first_line(e)}")
+            if not valid:
+                return race
+            sels = valid
+            try:
+                yield lambda: combined_locator(page, sels).wait_for(state="visible", timeout=_remaining_ms(deadline))
+            except Exception as e:
+                race.errors.append(f"inget av {len(sels)} selectors synligt: {_first_line(e)}")
+                return race
+        for sel in sels:
+            loc = page.locator(sel).first
+            try:
+                if not (yield loc.is_visible):
+                    continue
+                if click:
+                    yield lambda: click(loc, _remaining_ms(deadline))
+                else:
+                    yield lambda: loc.click(timeout=_remaining_ms(deadline))
+                race.selector, race.index = sel, _clean(selectors).index(sel)
+                return race
+            except Exception as e:
+                race.errors.append(f"{sel}: {_first_line(e)}")
+        return race
+    finally:
+        race.elapsed_ms = int((time.monotonic() - started) * 1000)
+
+
+def click_first(
+    page,
+    selectors: Optional[List[str]],
+    timeout_ms: int,
+    click: Optional[Callable[[Any, int], None]] = None,
+) -> ClickRace:
+    """Wait for the first visible selector and click it.
+
+    click(locator, timeout_ms) replaces the plain locator.click, e.g. to wrap
+    the click in context.expect_page.
+    """
+    return run_sync(click_first_body(page, selectors, timeout_ms, click))
+
+
+async def click_first_async(
+    page,
+    selectors: Optional[List[str]],
+    timeout_ms: int,
+    click: Optional[Callable[[Any, int], Any]] = None,
+) -> ClickRace:
+    """click_first for playwright.async_api pages; click is awaited when given."""
+    return await run_async(click_first_body(page, selectors, timeout_ms, click))
+
+
+def record_click_race(job, index: int, race: ClickRace) -> None:
+    """Store the race outcome on the job (winner + errors/warnings) and set job.message."""
+    err_key, warn_key = CLICK_DETAIL_KEYS.get(index, (f"click_errors_{index}", f"click_warnings_nonblocking_{index}"))
+    job.details = job.details or {}
+    job.details.setdefault("click_winners", {})[str(index)] = race.as_detail()
+    what = "cookie-banner" if index == 0 else race.selector
+    if race.selector:
+        if race.errors:
+            job.details[warn_key] = race.errors
+            job.message = f"Klickade på {what} (sekvens {index}). Fortsatte efter fallback-selector."
+        else:
+            job.message = f"Klickade på {what} (sekvens {index})."
+        job.details[err_key] = []
+    else:
+        job.details[err_key] = job.details.get(err_key, []) + race.errors
+        if index == 0:
+            job.message = "Cookie-banner: ingen selector fungerade (kanske ingen banner). Fortsätter..."
+        else:
+            job.message = f"Klicksekvens {index}: ingen selector fungerade. Fortsätter bevaka fältet..."
@@ -1,9 +1,14 @@
 """
 Shared SKV automation primitives used by skv6 and skv_int7.
+
+Page helpers that both engines need are skv_drive bodies (*_body), with a
+sync and an async entry point each.
 """
 
 from typing import Any, Dict, Optional, Tuple, List
 
+from skv_drive import run_async, run_sync
+
 
 FORM_NEXT_HOST_SELECTOR = "skv-button-10-0-7[button-type='primary'].flytt-skv-wizard-step-button"
 
@@ -33,88 +38,122 @@ def load_config(config_file: str) -> Dict[str, str]:
     return out
 
 
-def get_form_signals(p, next_selector: str = FORM_NEXT_HOST_SELECTOR) -> Dict[str, Any]:
-    """Collect robust readiness signals from main/popup page."""
-    if not p:
-        return {
-            "ok": False,
-            "url": "",
-            "url_has_flytt": False,
-            "has_form": False,
-            "has_wizard_step": False,
-            "has_active_step": False,
-            "has_next_host": False,
-            "error": "no page",
+# Page-side readiness walker. One walk over the document and every open shadow root
+# (the wizard is built from skv-* components) answers all questions at once; it
+# stops as soon as everything has been found.
+FORM_SIGNALS_WALK_JS = """(nextSel) => {
+    const found = { hasForm: false, hasWizardStep: false, hasActiveStep: false, hasNextHost: false, hasNextButton: false };
+    const matches = (el, sel) => { try { return el.matches(sel); } catch (e) { return false; } };
+    const buttonName = (el) => {
+        const own = (el.getAttribute('aria-label') || el.textContent || '').trim();
+        const host = own ? null : el.getRootNode().host;
+        return own || (host ? (host.getAttribute('aria-label') || host.textContent || '').trim() : '');
+    };
+    const stack = [document.documentElement];
+    let left = 5;
+    while (stack.length && left > 0) {
+        const root = stack.pop();
+        if (!root) continue;
+        const els = root.querySelectorAll ? root.querySelectorAll('*') : [];
+        const all = root.nodeType === 1 ? [root, ...els] : els;
+        for (const el of all) {
+            if (el.shadowRoot) stack.push(el.shadowRoot);
+            if (!found.hasForm && el.id === 'fbfFlyttanmalanForm') { found.hasForm = true; left--; }
+            if (!found.hasWizardStep && el.localName === 'flytt-skv-wizard-step') { found.hasWizardStep = true; left--; }
+            if (!found.hasActiveStep && el.classList && (el.classList.contains('flytt-skv-wizard-step--active')
+                    || el.classList.contains('flytt-skv-wizard-step--check'))) { found.hasActiveStep = true; left--; }
+            if (!found.hasNextHost && matches(el, nextSel)) { found.hasNextHost = true; left--; }
+            if (!found.hasNextButton && (el.localName === 'button' || el.getAttribute('role') === 'button')
+                    && buttonName(el).toLowerCase().includes('nästa')) {
+                found.hasNextButton = true; left--;
+            }
         }
+    }
+    return { ...found, title: document.title || '' };
+}"""
+
+# Readiness probe: answered by the live shadow-DOM index (skv_shadow_index, installed as
+# an init script) when present, else by the walker above.
+FORM_SIGNALS_JS = """(nextSel) => {
+    const idx = window.__skvIndex;
+    if (idx && idx.nextSel === nextSel) return idx.snapshot();
+    return (""" + FORM_SIGNALS_WALK_JS + """)(nextSel);
+}"""
+
+# BankID/QR links present on the page before the QR click (logged for debugging).
+QR_LINKS_JS = """() => {
+    const links = Array.from(document.querySelectorAll('a[href*="bankid"], a[href*="redirect"], [data-qr-url], [data-autostart]'));
+    return links.map(el => ({
+        href: el.href || el.getAttribute('href'),
+        'data-qr-url': el.getAttribute('data-qr-url'),
+        'data-autostart': el.getAttribute('data-autostart'),
+        text: (el.textContent || '').slice(0, 100)
+    })).filter(x => x.href || x['data-qr-url'] || x['data-autostart']);
+}"""
+
+# Base URL of the BankID auth SPA; the aid query param is appended when opening a clone tab.
+AUTH_SPA_URL_TEMPLATE = (
+    "https://auth.funktionstjanster.se/web/app/v2/68a6db1b897fa1039c3b3d40/"
+    "67dace697e15efe89cf3d575/?lang=sv&aid={aid}"
+)
+
+
+def _empty_signals(url: str, ok: bool, error: str, url_has_flytt: bool = False) -> Dict[str, Any]:
+    return {
+        "ok": ok,
+        "url": url,
+        "url_has_flytt": url_has_flytt,
+        "has_form": False,
+        "has_wizard_step": False,
+        "has_active_step": False,
+        "has_next_host": False,
+        "has_next_button": False,
+        "error": error,
+    }
+
+
+def _signals_from_probe(url: str, out: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "ok": True,
+        "url": url,
+        "url_has_flytt": True,
+        "has_form": bool(out.get("hasForm")),
+        "has_wizard_step": bool(out.get("hasWizardStep")),
+        "has_active_step": bool(out.get("hasActiveStep")),
+        "has_next_host": bool(out.get("hasNextHost")),
+        "has_next_button": bool(out.get("hasNextButton")),
+        "title": out.get("title", ""),
+        "error": "",
+    }
+
+
+def get_form_signals_body(p, next_selector: str = FORM_NEXT_HOST_SELECTOR):
+    """get_form_signals as a skv_drive body."""
+    if not p:
+        return _empty_signals("", False, "no page")
 
     try:
         url = p.url or ""
     except Exception:
-        return {
-            "ok": False,
-            "url": "",
-            "url_has_flytt": False,
-            "has_form": False,
-            "has_wizard_step": False,
-            "has_active_step": False,
-            "has_next_host": False,
-            "error": "url unavailable",
-        }
+        return _empty_signals("", False, "url unavailable")
 
-    url_has_flytt = "flytt" in url.lower()
-    if not url_has_flytt:
-        return {
-            "ok": True,
-            "url": url,
-            "url_has_flytt": False,
-            "has_form": False,
-            "has_wizard_step": False,
-            "has_active_step": False,
-            "has_next_host": False,
-            "error": "",
-        }
+    if "flytt" not in url.lower():
+        return _empty_signals(url, True, "")
 
     try:
-        out = p.evaluate(
-            """(nextSel) => {
-                function qs(root, sel) {
-                    try { const el = root.querySelector(sel); if (el) return el; } catch(e) {}
-                    const nodes = root.querySelectorAll('*');
-                    for (const n of nodes) {
-                        if (n.shadowRoot) { const f = qs(n.shadowRoot, sel); if (f) return f; }
-                    }
-                    return null;
-                }
-                const hasForm = !!qs(document, '#fbfFlyttanmalanForm');
-                const hasWizardStep = !!qs(document, 'flytt-skv-wizard-step');
-                const hasActiveStep = !!qs(document, '.flytt-skv-wizard-step--active, .flytt-skv-wizard-step--check');
-                const hasNextHost = !!qs(document, nextSel);
-                return { hasForm, hasWizardStep, hasActiveStep, hasNextHost, title: document.title || '' };
-            }""",
-            next_selector,
-        )
-        return {
-            "ok": True,
-            "url": url,
-            "url_has_flytt": url_has_flytt,
-            "has_form": bool(out.get("hasForm")),
-            "has_wizard_step": bool(out.get("hasWizardStep")),
-            "has_active_step": bool(out.get("hasActiveStep")),
-            "has_next_host": bool(out.get("hasNextHost")),
-            "title": out.get("title", ""),
-            "error": "",
-        }
+        return _signals_from_probe(url, (yield lambda: p.evaluate(FORM_SIGNALS_JS, next_selector)))
     except Exception as e:
-        return {
-            "ok": False,
-            "url": url,
-            "url_has_flytt": url_has_flytt,
-            "has_form": False,
-            "has_wizard_step": False,
-            "has_active_step": False,
-            "has_next_host": False,
-            "error": str(e),
-        }
+        return _empty_signals(url, False, str(e), url_has_flytt=True)
+
+
+def get_form_signals(p, next_selector: str = FORM_NEXT_HOST_SELECTOR) -> Dict[str, Any]:
+    """Collect robust readiness signals from main/popup page."""
+    return run_sync(get_form_signals_body(p, next_selector))
+
+
+async def get_form_signals_async(p, next_selector: str = FORM_NEXT_HOST_SELECTOR) -> Dict[str, Any]:
+    """get_form_signals for playwright.async_api pages."""
+    return await run_async(get_form_signals_body(p, next_selector))
 
 
 def is_form_ready_from_signals(signals: Dict[str, Any], api_ready: bool) -> bool:
@@ -137,14 +176,79 @@ def get_all_pages_for_form(page) -> List[Any]:
     return []
 
 
-def pick_form_page(
-    page,
-    popup_ref,
-    api_ready: bool,
-    all_pages: Optional[list] = None,
-    next_selector: str = FORM_NEXT_HOST_SELECTOR,
-) -> Tuple[Optional[Any], str, Dict[str, Any], Optional[Dict[str, Any]]]:
-    """Pick ready page among main, popup, and other tabs."""
+class FormSignalProbe:
+    """Per-tick signal snapshots for the form wait loop.
+
+    Each pick_form_page call is one tick: every open tab on a flytt URL is
+    evaluated at most once (the result is reused for main/popup/tab lookups
+    in the same tick); other tabs cost no browser round-trip at all.
+    """
+
+    def __init__(self, next_selector: str = FORM_NEXT_HOST_SELECTOR) -> None:
+        self.next_selector = next_selector
+        self._cache: Dict[int, Tuple[Any, Dict[str, Any]]] = {}
+        self.ticks = 0
+        self.round_trips = 0
+        self.last_tick: Dict[str, int] = {}
+
+    def new_tick(self) -> None:
+        self._cache.clear()
+        self.ticks += 1
+        self.last_tick = {"round_trips": 0, "evaluated": 0, "skipped": 0, "cached": 0}
+
+    def _lookup(self, p) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """(url, signals) when no evaluate is needed; (url, None) when it is."""
+        if not p:
+            return None, _empty_signals("", False, "no page")
+        hit = self._cache.get(id(p))
+        if hit is not None and hit[0] is p:
+            self.last_tick["cached"] = self.last_tick.get("cached", 0) + 1
+            return None, hit[1]
+        try:
+            url = p.url or ""
+        except Exception:
+            return None, _empty_signals("", False, "url unavailable")
+        if "flytt" not in url.lower():
+            self.last_tick["skipped"] = self.last_tick.get("skipped", 0) + 1
+            return None, self._store(p, _empty_signals(url, True, ""))
+        return url, None
+
+    def _store(self, p, sig: Dict[str, Any]) -> Dict[str, Any]:
+        self._cache[id(p)] = (p, sig)
+        return sig
+
+    def _count_round_trip(self) -> None:
+        self.round_trips += 1
+        self.last_tick["round_trips"] = self.last_tick.get("round_trips", 0) + 1
+        self.last_tick["evaluated"] = self.last_tick.get("evaluated", 0) + 1
+
+    def signals_body(self, p):
+        """signals as a skv_drive body."""
+        url, sig = self._lookup(p)
+        if sig is not None:
+            return sig
+        self._count_round_trip()
+        try:
+            return self._store(p, _signals_from_probe(url, (yield lambda: p.evaluate(FORM_SIGNALS_JS, self.next_selector))))
+        except Exception as e:
+            return self._store(p, _empty_signals(url, False, str(e), url_has_flytt=True))
+
+    def signals(self, p) -> Dict[str, Any]:
+        return run_sync(self.signals_body(p))
+
+    async def signals_async(self, p) -> Dict[str, Any]:
+        return await run_async(self.signals_body(p))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ticks": self.ticks,
+            "round_trips": self.round_trips,
+            "round_trips_per_tick": round(self.round_trips / self.ticks, 2) if self.ticks else 0.0,
+            "last_tick": dict(self.last_tick),
+        }
+
+
+def _pages_to_check(page, popup_ref, all_pages: Optional[list]) -> List[Tuple[Any, str]]:
     pages_to_check = []
     if all_pages:
         pages_to_check = [(p, f"tab_{i}") for i, p in enumerate(all_pages) if p and not p.is_closed()]
@@ -152,23 +256,61 @@ def pick_form_page(
         pages_to_check = [(page, "main")]
         if popup_ref and not popup_ref.is_closed():
             pages_to_check.append((popup_ref, "popup"))
+    return pages_to_check
 
-    main_signals = get_form_signals(page, next_selector)
-    popup_signals = get_form_signals(popup_ref, next_selector) if popup_ref and not popup_ref.is_closed() else None
 
-    for p, source in pages_to_check:
+def _candidate_signals(sig: Dict[str, Any], api_ready: bool) -> Optional[Dict[str, Any]]:
+    """Signals to report if this tab counts as ready, else None."""
+    if is_form_ready_from_signals(sig, api_ready):
+        return sig
+    if sig.get("url_has_flytt") and sig.get("has_next_button"):
+        return {**sig, "has_next_host": True}
+    return None
+
+
+def pick_form_page_body(
+    page,
+    popup_ref,
+    api_ready: bool,
+    all_pages: Optional[list] = None,
+    next_selector: str = FORM_NEXT_HOST_SELECTOR,
+    probe: Optional[FormSignalProbe] = None,
+):
+    """pick_form_page as a skv_drive body."""
+    probe = probe or FormSignalProbe(next_selector)
+    probe.new_tick()
+    main_signals = yield from probe.signals_body(page)
+    popup_signals = (yield from probe.signals_body(popup_ref)) if popup_ref and not popup_ref.is_closed() else None
+
+    for p, source in _pages_to_check(page, popup_ref, all_pages):
         try:
-            sig = get_form_signals(p, next_selector)
-            if is_form_ready_from_signals(sig, api_ready):
+            sig = _candidate_signals((yield from probe.signals_body(p)), api_ready)
+            if sig is not None:
                 return p, source, sig, main_signals
-            if sig.get("url_has_flytt"):
-                try:
-                    if p.locator(next_selector).count() > 0:
-                        return p, source, {**sig, "has_next_host": True}, main_signals
-                    if p.get_by_role("button", name="Nästa").count() > 0:
-                        return p, source, {**sig, "has_next_host": True}, main_signals
-                except Exception:
-                    pass
         except Exception:
             continue
     return None, "", main_signals, popup_signals
+
+
+def pick_form_page(
+    page,
+    popup_ref,
+    api_ready: bool,
+    all_pages: Optional[list] = None,
+    next_selector: str = FORM_NEXT_HOST_SELECTOR,
+    probe: Optional[FormSignalProbe] = None,
+) -> Tuple[Optional[Any], str, Dict[str, Any], Optional[Dict[str, Any]]]:
+    """Pick ready page among main, popup, and other tabs. One probe tick per call."""
+    return run_sync(pick_form_page_body(page, popup_ref, api_ready, all_pages, next_selector, probe))
+
+
+async def pick_form_page_async(
+    page,
+    popup_ref,
+    api_ready: bool,
+    all_pages: Optional[list] = None,
+    next_selector: str = FORM_NEXT_HOST_SELECTOR,
+    probe: Optional[FormSignalProbe] = None,
+) -> Tuple[Optional[Any], str, Dict[str, Any], Optional[Dict[str, Any]]]:
+    """pick_form_page for playwright.async_api pages."""
+    return await run_async(pick_form_page_body(page, popup_ref, api_ready, all_pages, next_selector, probe))
@@ -0,0 +1,112 @@
+"""
+skv_drive.py - One body for sync and async Playwright code.
+
+playwright.sync_api and playwright.async_api have the same methods; the async
+ones return awaitables. Logic both engines need is written once, as a
+generator that yields every blocking point instead of calling it:
+
+    snap = yield lambda: page.evaluate(JS)   # browser call (value sent back)
+    yield Sleep(0.5)                         # time.sleep / asyncio.sleep
+    yield Blocking(publish, job)             # file/DB work
+    result = yield from other_body(page)     # nested body
+    yield from call(hook, step)              # plain function, coroutine fn or body
+
+run_sync drives such a body on a sync page. run_async drives it on an async
+page: it awaits whatever a call returns and runs Blocking work in the loop's
+default executor, so the loop thread that serves every session does no file
+or SQLite I/O. An exception raised by a call is thrown back into the body at
+its yield, so try/except around a yield works like around the call itself.
+"""
+import asyncio
+import inspect
+import time
+from typing import Any, Callable, Generator
+
+
+class Sleep:
+    __slots__ = ("seconds",)
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+
+
+class Blocking:
+    """fn(*args) that may block on disk or a database."""
+
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn: Callable[..., Any], *args: Any) -> None:
+        self.fn = fn
+        self.args = args
+
+
+Body = Generator[Any, Any, Any]
+
+
+def _call_sync(op: Any) -> Any:
+    if isinstance(op, Sleep):
+        if op.seconds > 0:
+            time.sleep(op.seconds)
+        return None
+    if isinstance(op, Blocking):
+        return op.fn(*op.args)
+    return op()
+
+
+async def _call_async(op: Any) -> Any:
+    if isinstance(op, Sleep):
+        await asyncio.sleep(max(0.0, op.seconds))
+        return None
+    if isinstance(op, Blocking):
+        return await asyncio.get_running_loop().run_in_executor(None, lambda: op.fn(*op.args))
+    result = op()
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+
+def call(fn: Callable[..., Any], *args: Any):
+    """Body that runs fn(*args), whether fn is a plain function, a coroutine
+    function (async driver only) or returns a body itself."""
+    result = fn(*args)
+    if inspect.isgenerator(result):
+        return (yield from result)
+    if inspect.isawaitable(result):
+        return (yield lambda: result)
+    return result
+
+
+def run_sync(body: Body) -> Any:
+    """Run body to completion on the calling thread. Returns its return value."""
+    value, error = None, None
+    try:
+        while True:
+            try:
+                op = body.throw(error) if error is not None else body.send(value)
+            except StopIteration as stop:
+                return stop.value
+            value, error = None, None
+            try:
+                value = _call_sync(op)
+            except Exception as e:
+                error = e
+    finally:
+        body.close()
+
+
+async def run_async(body: Body) -> Any:
+    """run_sync for async pages: calls are awaited, Blocking work goes to the executor."""
+    value, error = None, None
+    try:
+        while True:
+            try:
+                op = body.throw(error) if error is not None else body.send(value)
+            except StopIteration as stop:
+                return stop.value
+            value, error = None, None
+            try:
+                value = await _call_async(op)
+            except Exception as e:
+                error = e
+    finally:
+        body.close()
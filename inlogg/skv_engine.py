@@ -0,0 +1,379 @@
+"""
+skv_engine.py - Automation engine for the Flyttanmälan jobs (no web UI).
+
+Jobs, the job store and its event bus, scheduler, housekeeping, settings,
+browser engine lifecycle and the job body itself (click flow -> QR login ->
+form fill -> artifacts). skv6 serves the Flask UI/API on top of this;
+skv_int7 and other engine users import this module only, so they do not
+load Flask, requests or the UI templates.
+
+Heavy modules stay lazy: Playwright is imported by the browser pool / async
+engine when the first browser starts, the form filler when a form is found.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Any
+
+from skv_browser_pool import BrowserLease, LeaseCancelled, get_browser_pool, shutdown_browser_pool
+from skv_scheduler import JobScheduler, scheduler_from_env
+from skv_session import JobSession, close_session, open_session
+from skv_readiness import FormReadinessWatcher
+from skv_events import JobEventBus
+from skv_capture import ResponseCapture
+from skv_drive import run_sync
+from skv_flow import ClickStep, describe_flow
+from skv_job import job_body
+from skv_selector_stats import get_selector_stats
+from skv_settings import SettingsStore, SkvSettings
+from skv_jobstore import JobStore, job_store_from_env, prune_artifacts, retention_from_env
+from skv_async_engine import engine_mode, get_async_engine
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULT_DIR = os.path.join(SCRIPT_DIR, "results")
+# Nothing is created at import: the job history creates runtime/ when the job
+# store is first used, the first job's session creates results/.
+RUNTIME_DIR = os.path.join(SCRIPT_DIR, "runtime")
+
+
+# Per-job session logs (JSONL, buffered): runtime/sessions/<job_id>_session_log.jsonl
+SESSION_LOG_DIR = os.path.join(RUNTIME_DIR, "sessions")
+
+CONFIG_FILE = os.path.join(SCRIPT_DIR, "config.txt")
+DEFAULT_PAYLOAD_FILE = os.path.join(RUNTIME_DIR, "skv_payload_latest.json")
+
+# Durable history of finished jobs (SQLite); /api/status falls back to it after eviction.
+JOB_HISTORY_DB = os.path.join(RUNTIME_DIR, "job_history.sqlite3")
+HOUSEKEEPING_INTERVAL_SECONDS = 300.0
+
+
+# config.txt + SKV_* env, parsed once and re-read only when config.txt changes.
+_settings_store = SettingsStore(CONFIG_FILE, defaults={"payload_file": DEFAULT_PAYLOAD_FILE})
+
+
+def get_settings(overrides: Optional[Dict[str, Any]] = None) -> SkvSettings:
+    """Effective settings for a new job (raises ValueError on unknown override keys)."""
+    return _settings_store.get().with_overrides(overrides)
+
+
+# ----------------------------
+# Job handling
+# ----------------------------
+
+@dataclass
+class JobStatus:
+    job_id: str
+    state: str            # queued | running | matched | timeout | error | cancelled
+    message: str = ""
+    started_at: Optional[float] = None
+    ended_at: Optional[float] = None
+    screenshot_path: Optional[str] = None
+    details: Optional[Dict[str, Any]] = None
+    queue_position: Optional[int] = None        # 1-based while queued, None once started
+    estimated_start_at: Optional[float] = None  # epoch seconds, scheduler estimate
+
+
+# Pushes every JobStatus change to /api/events/<job_id> subscribers.
+_job_events = JobEventBus()
+
+# Bounded LRU/TTL memory tier + SQLite history of finished jobs (see skv_jobstore).
+_jobs: Optional[JobStore] = None
+_jobs_lock = threading.Lock()
+
+
+def _get_job_store() -> JobStore:
+    """Process-wide job store; opens (or creates) the history database on first use."""
+    global _jobs
+    with _jobs_lock:
+        if _jobs is None:
+            _jobs = job_store_from_env(JOB_HISTORY_DB, on_evict=_job_events.forget)
+        return _jobs
+
+
+def _set_job(job: JobStatus, final: bool = False) -> None:
+    """Store and publish job. final=True for its last update (ends SSE streams)."""
+    _get_job_store().put(job)
+    _job_events.publish(job.job_id, asdict(job), final=final)
+
+
+def _drop_job(job_id: str) -> None:
+    _get_job_store().remove(job_id)
+    _job_events.forget(job_id)
+
+
+# ----------------------------
+# Housekeeping: TTL eviction + artifact/history retention
+# ----------------------------
+
+_housekeeping_thread: Optional[threading.Thread] = None
+_housekeeping_lock = threading.Lock()
+_last_housekeeping: Dict[str, Any] = {}
+
+
+def housekeeping_once() -> Dict[str, Any]:
+    limits = retention_from_env()
+    jobs = _get_job_store()
+    active = jobs.active_ids()
+    report: Dict[str, Any] = {"at": time.time(), "evicted": jobs.sweep()}
+    report["results"] = prune_artifacts(
+        RESULT_DIR,
+        max_age_seconds=limits["results_max_age_seconds"],
+        max_total_bytes=limits["results_max_bytes"],
+        keep=active,
+    )
+    report["session_logs"] = prune_artifacts(
+        SESSION_LOG_DIR,
+        max_age_seconds=limits["results_max_age_seconds"],
+        keep=active,
+    )
+    get_selector_stats().flush()
+    if jobs.history is not None and limits["history_max_age_seconds"]:
+        report["history_pruned"] = jobs.history.prune(limits["history_max_age_seconds"])
+    _last_housekeeping.clear()
+    _last_housekeeping.update(report)
+    return report
+
+
+def _housekeeping_loop() -> None:
+    while True:
+        try:
+            housekeeping_once()
+        except Exception as e:
+            print(f"Housekeeping error: {e}")
+        time.sleep(HOUSEKEEPING_INTERVAL_SECONDS)
+
+
+def _start_housekeeping() -> None:
+    global _housekeeping_thread
+    with _housekeeping_lock:
+        if _housekeeping_thread is None:
+            _housekeeping_thread = threading.Thread(target=_housekeeping_loop, name="skv-housekeeping", daemon=True)
+            _housekeeping_thread.start()
+
+
+# ----------------------------
+# Scheduler: bounded workers + FIFO queue (admission control for /api/run)
+# ----------------------------
+
+_scheduler: Optional[JobScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def _update_queue_positions(positions: list) -> None:
+    for job_id, position, eta in positions:
+        job = _get_job(job_id)
+        if not job or job.state != "queued":
+            continue
+        job.queue_position = position
+        job.estimated_start_at = eta
+        job.message = f"Köad (plats {position})..."
+        _set_job(job)
+
+
+def _get_scheduler() -> JobScheduler:
+    """Process-wide scheduler. Workers default to the engine's capacity so jobs never overcommit."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            capacity = get_async_engine().max_sessions if engine_mode() == "async" else get_browser_pool().size
+            _scheduler = scheduler_from_env(capacity, on_positions=_update_queue_positions)
+        return _scheduler
+
+
+def _get_job(job_id: str) -> Optional[JobStatus]:
+    return _get_job_store().get(job_id)
+
+
+def _cancel_job(job_id: str) -> bool:
+    return _get_job_store().request_cancel(job_id)
+
+
+def _is_cancelled(job_id: str) -> bool:
+    return _get_job_store().is_cancelled(job_id)
+
+
+def cancel_job(job_id: str) -> bool:
+    """Request cancellation; a job still waiting in the queue is marked cancelled right away."""
+    ok = _cancel_job(job_id)
+    if ok and _get_scheduler().cancel_queued(job_id):
+        job = _get_job(job_id)
+        if job:
+            job.state = "cancelled"
+            job.ended_at = time.time()
+            job.queue_position = None
+            job.estimated_start_at = None
+            job.message = "Avbruten av användaren (i kö)."
+            _set_job(job, final=True)
+    return ok
+
+
+# ----------------------------
+# Core: Fill Watch job
+# ----------------------------
+
+def warm_engine() -> None:
+    """Start the configured engine (browser pool or async loop) ahead of the first job."""
+    if engine_mode() == "async":
+        get_async_engine().start()
+    else:
+        get_browser_pool().start()
+
+
+def shutdown_engine() -> None:
+    get_selector_stats().flush()
+    if engine_mode() == "async":
+        get_async_engine().shutdown()
+    else:
+        shutdown_browser_pool()
+
+
+def _run_playwright_job(
+    job_id: str,
+    url: str,
+    timeout_seconds: float,
+    flow: Optional[list[ClickStep]] = None,
+    settings_overrides: Optional[Dict[str, Any]] = None,
+    settings: Optional[SkvSettings] = None,
+) -> None:
+    """Run one job to completion on the configured engine (see _start_playwright_job)."""
+    pending = _start_playwright_job(job_id, url, timeout_seconds, flow, settings_overrides, settings)
+    if pending is not None:
+        pending.result()
+
+
+def _start_playwright_job(
+    job_id: str,
+    url: str,
+    timeout_seconds: float,
+    flow: Optional[list[ClickStep]] = None,
+    settings_overrides: Optional[Dict[str, Any]] = None,
+    settings: Optional[SkvSettings] = None,
+) -> Optional[Future]:
+    """Start one job on the configured engine.
+
+    The sync engine runs the job in the calling thread and returns None. The
+    async engine returns a Future that is done once the job has ended and its
+    final event is published; the scheduler keeps the job's slot until then
+    without holding a thread.
+
+    settings is the job's run options (payload, mockup fallback, window and
+    clone flags, fast fill); without it they are resolved from config.txt and
+    the environment. settings_overrides apply on top either way.
+    """
+    job = _get_job(job_id)
+    if not job or job.state == "cancelled":
+        return None
+
+    job.state = "running"
+    job.started_at = time.time()
+    job.queue_position = None
+    job.estimated_start_at = None
+    job.message = "Väntar på ledig webbläsare..."
+    _set_job(job)
+
+    # New session: own log file, capture state and artifact dir for this job only
+    session = open_session(job_id, SESSION_LOG_DIR, RESULT_DIR)
+    session.write_header()
+    job.details = job.details or {}
+    job.details["session_log"] = session.log_file
+    # Resolved once per job; the flow below only reads attributes.
+    settings = settings.with_overrides(settings_overrides) if settings is not None else get_settings(settings_overrides)
+    job.details["settings"] = asdict(settings)
+    flow = flow or []
+    job.details["flow_definition"] = describe_flow(flow)
+    capture = ResponseCapture(session)
+
+    def _job_in_browser(lease: BrowserLease) -> None:
+        job.details = job.details or {}
+        job.details["browser_pool"] = {
+            "slot": lease.slot,
+            "lease_wait_seconds": lease.wait_seconds,
+            "browser_job_number": lease.browser_job_number,
+        }
+        job.message = "Startar webbläsare..."
+        _set_job(job)
+        _run_job_in_context(
+            job,
+            session,
+            capture,
+            settings,
+            lease.context,
+            url,
+            timeout_seconds,
+            flow=flow,
+        )
+
+    def _finish(error: Optional[BaseException]) -> None:
+        if isinstance(error, LeaseCancelled):
+            job.state = "cancelled"
+            job.ended_at = time.time()
+            job.message = "Avbruten av användaren."
+            session.log("Session cancelled before a browser was free", "DONE")
+            _set_job(job)
+        elif error is not None:
+            job.state = "error"
+            job.ended_at = time.time()
+            job.message = f"Fel: {error}"
+            session.log(f"Session error: {error}", "DONE")
+            _set_job(job)
+        job.details = job.details or {}
+        job.details["capture"] = capture.finish()
+        dropped = session.log_dropped
+        if dropped:
+            job.details["log_dropped"] = dropped
+        _set_job(job, final=True)
+        close_session(job_id)
+
+    if engine_mode() == "async":
+        # The coroutine engine runs the whole flow on its event loop.
+        return get_async_engine().submit_job(
+            job,
+            session,
+            on_done=_finish,
+            capture=capture,
+            settings=settings,
+            url=url,
+            timeout_seconds=timeout_seconds,
+            flow=flow,
+            publish=_set_job,
+            is_cancelled=lambda: _is_cancelled(job_id),
+        )
+    error: Optional[BaseException] = None
+    try:
+        get_browser_pool().run(_job_in_browser, cancel_check=lambda: _is_cancelled(job_id))
+    except Exception as e:
+        error = e
+    _finish(error)
+    return None
+
+
+def _run_job_in_context(
+    job: JobStatus,
+    session: JobSession,
+    capture: ResponseCapture,
+    settings: SkvSettings,
+    context,
+    url: str,
+    timeout_seconds: float,
+    flow: Optional[list[ClickStep]] = None,
+) -> None:
+    """Job body (skv_job.job_body) on a pooled browser's thread."""
+    readiness = FormReadinessWatcher(context, log=session.log).attach()
+    run_sync(
+        job_body(
+            context,
+            readiness,
+            job,
+            session,
+            capture,
+            settings,
+            url,
+            timeout_seconds,
+            flow or [],
+            publish=_set_job,
+            is_cancelled=lambda: _is_cancelled(job.job_id),
+        )
+    )
@@ -0,0 +1,108 @@
+"""
+skv_events.py - In-process JobStatus event bus for the SSE endpoint.
+
+Every _set_job publishes one serialized snapshot. Each job keeps a short
+numbered history so an EventSource that reconnects with Last-Event-ID gets
+exactly the events it missed (or the latest snapshot if it fell too far
+behind). Waiting subscribers block on a condition variable - no polling.
+
+A job keeps publishing after its state turns terminal (screenshot path,
+capture counters), so the state alone does not end a stream. The engine
+publishes the job's last snapshot with final=True once nothing else will
+follow; wait() reports the channel as final when the subscriber has that
+event, and also when the channel has been forgotten (job evicted).
+"""
+import json
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+HISTORY_PER_JOB = 100
+TERMINAL_STATES = ("matched", "timeout", "error", "cancelled")
+
+
+class _JobChannel:
+    def __init__(self) -> None:
+        self.seq = 0
+        self.history: Deque[Tuple[int, str]] = deque(maxlen=HISTORY_PER_JOB)
+        self.final = False
+
+
+class JobEventBus:
+    def __init__(self) -> None:
+        self._channels: Dict[str, _JobChannel] = {}
+        self._cond = threading.Condition()
+
+    def publish(self, job_id: str, snapshot: dict, final: bool = False) -> int:
+        """Store a snapshot as the job's next event and wake subscribers. Returns its event id.
+
+        final=True marks the job's last event: streams end after delivering it.
+        """
+        data = json.dumps(snapshot, ensure_ascii=False, default=str)
+        with self._cond:
+            ch = self._channels.get(job_id)
+            if ch is None:
+                ch = self._channels[job_id] = _JobChannel()
+            ch.seq += 1
+            ch.history.append((ch.seq, data))
+            ch.final = ch.final or final
+            self._cond.notify_all()
+            return ch.seq
+
+    def has_job(self, job_id: str) -> bool:
+        with self._cond:
+            return job_id in self._channels
+
+    def is_final(self, job_id: str) -> bool:
+        """True once the job's final event is published, or if it has no channel."""
+        with self._cond:
+            ch = self._channels.get(job_id)
+            return ch is None or ch.final
+
+    def wait(self, job_id: str, after: int, timeout: float) -> Tuple[List[Tuple[int, str]], bool]:
+        """Events with id > after, blocking up to timeout for the first one.
+
+        Returns (events, final): final is True when these events end with the
+        job's final event (or the subscriber already had it), or when the
+        channel is gone. If `after` predates the retained history the latest
+        snapshot alone is returned, since every event is a full snapshot.
+        """
+        with self._cond:
+            def _pending() -> List[Tuple[int, str]]:
+                ch = self._channels.get(job_id)
+                if ch is None or not ch.history:
+                    return []
+                if after > ch.seq:
+                    # Client id from an earlier process: restart from the latest snapshot.
+                    return [ch.history[-1]]
+                if ch.seq == after:
+                    return []
+                oldest = ch.history[0][0] if ch.history else ch.seq
+                if after < oldest - 1:
+                    return [ch.history[-1]]
+                return [ev for ev in ch.history if ev[0] > after]
+
+            events = _pending()
+            if not events:
+                def _ready() -> bool:
+                    ch = self._channels.get(job_id)
+                    return ch is None or ch.final or bool(_pending())
+
+                self._cond.wait_for(_ready, timeout=timeout)
+                events = _pending()
+            ch = self._channels.get(job_id)
+            final = ch is None or (ch.final and (not events or events[-1][0] == ch.seq))
+            return events, final
+
+    def forget(self, job_id: str) -> None:
+        with self._cond:
+            if self._channels.pop(job_id, None) is not None:
+                self._cond.notify_all()
+
+
+def parse_last_event_id(value: Optional[str]) -> int:
+    try:
+        return max(0, int((value or "").strip()))
+    except ValueError:
+        return 0
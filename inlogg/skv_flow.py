@@ -0,0 +1,391 @@
+"""
+skv_flow.py - Declarative click flow and the step engine that runs it.
+
+A flow is a list of ClickStep: what to wait for (skv_gates), which
+selectors to race (skv_clicks), whether the click opens a popup, and the
+timeouts. run_click_flow / run_click_flow_async run the steps in order with
+the same bookkeeping for every step: learned selector order, job message,
+gate wait, cancellation check, race, selector stats, click_winners /
+click_errors_N keys. Each step also gets a timing breakdown:
+
+  job.details["flow"] = {
+      "steps": [{"index", "name", "started_ms", "gate_ms", "race_ms",
+                 "hook_ms", "total_ms", "gate_met", "selector", "popup"}, ...],
+      "total_ms": ..., "cancelled": ...,
+  }
+
+Steps with learn_order=False always click in the configured order; their
+races are still recorded in the selector stats. The race clicks the first
+visible selector, so the order decides which element is clicked whenever
+selectors overlap. Learning is off by default for:
+  - the cookie banner, whose list is a consent preference (necessary-only
+    before accept-all);
+  - steps with a catch-all selector (tags and classes only, e.g. "svg path",
+    "slot.fin-skv-button-label"). It would win every race it is promoted
+    into, and the specific selectors behind it would never be tried again.
+
+Flow-specific side effects (QR logging, clone tab, focus) go in the
+before_click / after_click hooks, so the engine itself knows nothing about
+BankID. run_click_flow and run_click_flow_async run the same body
+(click_flow_body, skv_drive); only the popup click differs.
+
+Flows come from skv_int7 (INT7_FLOW), from /api/run as a "flow" list
+(parse_flow), or from the legacy click_after_seconds_N / click_selectors_N
+fields (flow_from_sequences).
+"""
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from skv_clicks import ClickRace, click_first_body, record_click_race
+from skv_drive import Blocking, call, run_async, run_sync
+from skv_gates import (
+    ResponseWatch,
+    StepGate,
+    StepWait,
+    default_gate,
+    parse_gate,
+    record_step_wait,
+    wait_for_gate_body,
+)
+from skv_selector_stats import get_selector_stats
+
+
+# How long a popup-expecting click waits for the new tab after clicking.
+POPUP_WAIT_MS = 3000
+DEFAULT_STEP_TIMEOUT_MS = 5000
+
+# Legacy sequence number -> (name, job message label, race timeout ms, expects popup, learn order)
+SEQUENCE_DEFAULTS = {
+    0: ("cookie", "Klicksekvens 0 (cookie)", 3000, False, False),
+    1: ("login", "Klicksekvens 1", 5000, False, True),
+    2: ("bankid", "Klicksekvens 2", 5000, False, True),
+    3: ("qr", "Klicksekvens 3 (QR-kod)", 5000, True, True),
+}
+
+
+@dataclass(frozen=True)
+class ClickStep:
+    index: int                      # sequence number: job.details keys (click_errors_N, ...)
+    selectors: Tuple[str, ...]
+    wait_seconds: float             # upper bound of the gate wait
+    gate: Optional[StepGate] = None  # None = skv_gates.default_gate
+    timeout_ms: int = DEFAULT_STEP_TIMEOUT_MS
+    expect_popup: bool = False
+    name: str = ""
+    label: str = ""
+    learn_order: bool = True        # False = always click in the configured order
+
+    @property
+    def key(self) -> str:
+        """Selector-statistics key."""
+        return self.name or str(self.index)
+
+    @property
+    def title(self) -> str:
+        return self.label or f"Klicksekvens {self.index}"
+
+
+@dataclass
+class StepOutcome:
+    step: ClickStep
+    selectors: List[str]
+    wait: StepWait
+    race: ClickRace = field(default_factory=ClickRace)
+    popup: Any = None
+    started_ms: int = 0
+    hook_ms: int = 0
+    total_ms: int = 0
+
+    def timing(self) -> Dict[str, Any]:
+        return {
+            "index": self.step.index,
+            "name": self.step.key,
+            "started_ms": self.started_ms,
+            "gate_ms": self.wait.waited_ms,
+            "race_ms": self.race.elapsed_ms,
+            "hook_ms": self.hook_ms,
+            "total_ms": self.total_ms,
+            "gate_met": self.wait.met,
+            "selector": self.race.selector,
+            "popup": self.popup is not None,
+        }
+
+
+@dataclass
+class FlowResult:
+    outcomes: List[StepOutcome] = field(default_factory=list)
+    cancelled: bool = False
+    popup: Any = None  # last popup page opened by an expect_popup step
+    total_ms: int = 0
+
+    def as_detail(self) -> Dict[str, Any]:
+        return {"steps": [o.timing() for o in self.outcomes], "total_ms": self.total_ms, "cancelled": self.cancelled}
+
+
+# ----------------------------
+# Flow definitions
+# ----------------------------
+
+# Only tag names, classes and combinators: no id, attribute or text condition.
+_CATCH_ALL_RE = re.compile(r"^[\w\s.>+~*-]+$")
+
+
+def is_catch_all(selector: str) -> bool:
+    """True for a selector that matches by markup shape alone (e.g. "svg path")."""
+    return bool(_CATCH_ALL_RE.match(selector.strip()))
+
+
+def _learnable(selectors: List[str]) -> bool:
+    return not any(is_catch_all(s) for s in selectors)
+
+
+def _selector_list(value: Any) -> List[str]:
+    if isinstance(value, str):
+        return [s.strip() for s in value.splitlines() if s.strip()]
+    if isinstance(value, (list, tuple)):
+        return [s.strip() for s in value if isinstance(s, str) and s.strip()]
+    return []
+
+
+def flow_from_sequences(sequences: List[Tuple[Optional[float], Optional[List[str]], Optional[StepGate]]]) -> List[ClickStep]:
+    """Flow from the legacy (click_after_seconds, selectors, gate) per sequence 0-3.
+
+    Sequences without seconds or selectors are left out, as before.
+    """
+    flow = []
+    for index, (after, selectors, gate) in enumerate(sequences):
+        sels = _selector_list(selectors)
+        if not (after and sels):
+            continue
+        name, label, timeout_ms, expect_popup, learn_order = SEQUENCE_DEFAULTS.get(index, ("", "", DEFAULT_STEP_TIMEOUT_MS, False, True))
+        flow.append(ClickStep(
+            index=index,
+            selectors=tuple(sels),
+            wait_seconds=float(after),
+            gate=gate,
+            timeout_ms=timeout_ms,
+            expect_popup=expect_popup,
+            name=name,
+            label=label,
+            learn_order=learn_order and _learnable(sels),
+        ))
+    return flow
+
+
+_STEP_KEYS = {"name", "label", "selectors", "wait_seconds", "wait", "timeout_ms", "expect_popup", "learn_order"}
+
+
+def parse_flow(value: Any) -> List[ClickStep]:
+    """Flow from a JSON list of step objects. Raises ValueError on bad input.
+
+    Step keys: selectors (list or newline-separated string, required),
+    wait_seconds (gate bound, default 3), wait (skv_gates.parse_gate),
+    timeout_ms, expect_popup, name, label, learn_order (default true; false
+    for a step named "cookie" or with a catch-all selector).
+    """
+    if not isinstance(value, list) or not value:
+        raise ValueError("flow måste vara en icke-tom lista av steg")
+    flow = []
+    for index, raw in enumerate(value):
+        if not isinstance(raw, dict):
+            raise ValueError(f"Steg {index}: måste vara ett objekt")
+        unknown = sorted(set(raw) - _STEP_KEYS)
+        if unknown:
+            raise ValueError(f"Steg {index}: okända fält: {', '.join(unknown)}")
+        sels = _selector_list(raw.get("selectors"))
+        if not sels:
+            raise ValueError(f"Steg {index}: selectors saknas")
+        try:
+            wait_seconds = float(raw.get("wait_seconds", 3.0))
+            timeout_ms = int(raw.get("timeout_ms", DEFAULT_STEP_TIMEOUT_MS))
+            gate = parse_gate(raw.get("wait"))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Steg {index}: {e}") from None
+        if wait_seconds < 0 or timeout_ms <= 0:
+            raise ValueError(f"Steg {index}: wait_seconds/timeout_ms utanför intervall")
+        name = str(raw.get("name") or "")
+        flow.append(ClickStep(
+            index=index,
+            selectors=tuple(sels),
+            wait_seconds=wait_seconds,
+            gate=gate,
+            timeout_ms=timeout_ms,
+            expect_popup=bool(raw.get("expect_popup")),
+            name=name,
+            label=str(raw.get("label") or ""),
+            learn_order=bool(raw.get("learn_order", name != "cookie" and _learnable(sels))),
+        ))
+    return flow
+
+
+def describe_flow(flow: List[ClickStep]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "index": s.index,
+            "name": s.key,
+            "selectors": list(s.selectors),
+            "wait_seconds": s.wait_seconds,
+            "wait": s.gate.describe() if s.gate else None,
+            "timeout_ms": s.timeout_ms,
+            "expect_popup": s.expect_popup,
+            "learn_order": s.learn_order,
+        }
+        for s in flow
+    ]
+
+
+# ----------------------------
+# Engine
+# ----------------------------
+
+def _ms_since(t: float) -> int:
+    return int((time.monotonic() - t) * 1000)
+
+
+def _begin_step(job, step: ClickStep) -> List[str]:
+    """Learned selector order for step; recorded in job.details when it differs."""
+    selectors = list(step.selectors)
+    if not step.learn_order:
+        return selectors
+    ordered = get_selector_stats().order(step.key, selectors)
+    if ordered != selectors:
+        job.details = job.details or {}
+        job.details.setdefault("selector_order", {})[str(step.index)] = ordered
+    return ordered
+
+
+def _finish_race(job, session, outcome: StepOutcome) -> None:
+    step, race = outcome.step, outcome.race
+    get_selector_stats().record(step.key, outcome.selectors, race.selector, outcome.wait.waited_ms + race.elapsed_ms)
+    record_click_race(job, step.index, race)
+    session.log(f"Click sequence {step.index}", "CLICKS", race.as_detail())
+
+
+def _popup_click(page, popups: list) -> Callable[[Any, int], None]:
+    """Click that also waits for the popup it opens (sync API)."""
+    def click(loc, remaining_ms: int) -> None:
+        clicked = False
+        try:
+            with page.context.expect_page(timeout=POPUP_WAIT_MS) as popup_info:
+                loc.click(timeout=remaining_ms)
+                clicked = True
+            popups.append(popup_info.value)
+        except Exception:
+            if not clicked:
+                raise  # click failed: let the race try the next candidate
+
+    return click
+
+
+def _popup_click_async(page, popups: list) -> Callable[[Any, int], Any]:
+    """_popup_click for playwright.async_api pages."""
+    async def click(loc, remaining_ms: int) -> None:
+        clicked = False
+        try:
+            async with page.context.expect_page(timeout=POPUP_WAIT_MS) as popup_info:
+                await loc.click(timeout=remaining_ms)
+                clicked = True
+            popups.append(await popup_info.value)
+        except Exception:
+            if not clicked:
+                raise
+
+    return click
+
+
+def click_flow_body(
+    page,
+    job,
+    session,
+    flow: List[ClickStep],
+    publish: Callable[[Any], None],
+    is_cancelled: Callable[[], bool],
+    responses: Optional[ResponseWatch] = None,
+    before_click: Optional[Callable[[ClickStep], Any]] = None,
+    after_click: Optional[Callable[[StepOutcome], Any]] = None,
+    is_async: bool = False,
+):
+    """The flow as a skv_drive body (run_click_flow, skv_job). Hooks may be
+    plain functions, coroutine functions or bodies. publish and the
+    selector-stats update are Blocking: the async engine runs them off the loop."""
+    popup_click = _popup_click_async if is_async else _popup_click
+    result = FlowResult()
+    flow_started = time.monotonic()
+    since = flow_started
+    job.details = job.details or {}
+    session.log("Click sequences starting", "CLICKS", {"steps": [s.key for s in flow]})
+    try:
+        for position, step in enumerate(flow):
+            step_started = time.monotonic()
+            selectors = _begin_step(job, step)
+            gate = step.gate or default_gate(list(step.selectors), first_step=position == 0)
+            job.message = f"{step.title}: väntar på {gate.describe()} (max {step.wait_seconds}s)..."
+            yield Blocking(publish, job)
+            wait = yield from wait_for_gate_body(page, gate, step.wait_seconds, responses, since, step.index)
+            record_step_wait(job, wait)
+            session.log(f"Click sequence {step.index} gate", "CLICKS", wait.as_detail())
+            outcome = StepOutcome(step=step, selectors=selectors, wait=wait, started_ms=int((step_started - flow_started) * 1000))
+            result.outcomes.append(outcome)
+            if is_cancelled():
+                outcome.total_ms = _ms_since(step_started)
+                result.cancelled = True
+                return result
+
+            hook_ms = 0
+            if before_click:
+                t = time.monotonic()
+                yield from call(before_click, step)
+                hook_ms += _ms_since(t)
+
+            popups: list = []
+            since = time.monotonic()  # the next gate's responses come after this click
+            outcome.race = yield from click_first_body(page, selectors, step.timeout_ms, popup_click(page, popups) if step.expect_popup else None)
+            if popups:
+                outcome.popup = result.popup = popups[0]
+            yield Blocking(_finish_race, job, session, outcome)
+            yield Blocking(publish, job)
+
+            if after_click:
+                t = time.monotonic()
+                yield from call(after_click, outcome)
+                hook_ms += _ms_since(t)
+            outcome.hook_ms = hook_ms
+            outcome.total_ms = _ms_since(step_started)
+            job.details["flow"] = result.as_detail()
+        return result
+    finally:
+        result.total_ms = _ms_since(flow_started)
+        job.details["flow"] = result.as_detail()
+        session.log("Click sequences done", "CLICKS", job.details["flow"])
+
+
+def run_click_flow(
+    page,
+    job,
+    session,
+    flow: List[ClickStep],
+    publish: Callable[[Any], None],
+    is_cancelled: Callable[[], bool],
+    responses: Optional[ResponseWatch] = None,
+    before_click: Optional[Callable[[ClickStep], None]] = None,
+    after_click: Optional[Callable[[StepOutcome], None]] = None,
+) -> FlowResult:
+    """Run flow on a sync page. Stops early (result.cancelled) when is_cancelled()."""
+    return run_sync(click_flow_body(page, job, session, flow, publish, is_cancelled, responses, before_click, after_click))
+
+
+async def run_click_flow_async(
+    page,
+    job,
+    session,
+    flow: List[ClickStep],
+    publish: Callable[[Any], None],
+    is_cancelled: Callable[[], bool],
+    responses: Optional[ResponseWatch] = None,
+    before_click: Optional[Callable[[ClickStep], Any]] = None,
+    after_click: Optional[Callable[[StepOutcome], Any]] = None,
+) -> FlowResult:
+    """run_click_flow for playwright.async_api pages; hooks are awaited."""
+    return await run_async(click_flow_body(page, job, session, flow, publish, is_cancelled, responses, before_click, after_click, is_async=True))
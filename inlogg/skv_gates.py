@@ -0,0 +1,209 @@
+"""
+skv_gates.py - Readiness gates for the click sequences.
+
+Each click sequence used to start with time.sleep(click_after_seconds), a
+fixed floor paid even when the page was ready long before. A StepGate names
+the condition the step actually waits for; click_after_seconds becomes the
+upper bound of that wait. The step continues as soon as the condition holds,
+or when the bound runs out (the click race then decides, as before).
+
+Conditions (all given ones must hold, checked in this order):
+  load_state  page.wait_for_load_state(...) ("domcontentloaded", "load", "networkidle")
+  response    a response whose URL matches this regex, seen since the previous step
+  selector    this selector visible
+
+A step without an explicit gate (default_gate):
+  first step   any of its click selectors visible. The page was just loaded,
+               so nothing on it is left over from an earlier click.
+  later steps  its primary (first configured) selector visible. The page of
+               the previous click is usually still showing, and fallbacks like
+               "svg path" or "slot.fin-skv-button-label" already match there.
+               Waiting for any of them would fire the click on the old page.
+               If the primary never appears, the step waits the whole bound
+               (the old fixed sleep) before the race.
+StepGate(sleep=True) restores the old fixed sleep for a step.
+
+Waits pump the Playwright driver (wait_for_timeout / locator waits), so
+response events keep arriving while a sync job is gated. wait_for_gate and
+wait_for_gate_async share one body (skv_drive).
+"""
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from skv_clicks import combined_locator
+from skv_drive import Sleep, run_async, run_sync
+
+
+# Poll interval for the response condition.
+RESPONSE_POLL_MS = 50
+# Remember this many response URLs per page for the response condition.
+MAX_RESPONSES = 512
+
+LOAD_STATES = ("domcontentloaded", "load", "networkidle")
+
+
+@dataclass(frozen=True)
+class StepGate:
+    selector: Optional[str] = None
+    response: Optional[str] = None
+    load_state: Optional[str] = None
+    sleep: bool = False
+    any_of: Tuple[str, ...] = ()  # any of these visible (default gate)
+
+    def describe(self) -> str:
+        if self.sleep:
+            return "sleep"
+        parts = []
+        if self.load_state:
+            parts.append(f"load_state={self.load_state}")
+        if self.response:
+            parts.append(f"response~{self.response}")
+        if self.selector:
+            parts.append(f"selector={self.selector}")
+        if self.any_of:
+            parts.append(f"selector={' | '.join(self.any_of)}")
+        return " & ".join(parts) or "none"
+
+
+def parse_gate(value: Any) -> Optional[StepGate]:
+    """StepGate from API/CLI input: None, a selector string, "sleep", or a dict.
+
+    Raises ValueError on unknown keys, a bad load state or an invalid regex.
+    """
+    if value is None or value == "" or value == {}:
+        return None
+    if isinstance(value, StepGate):
+        return value
+    if isinstance(value, str):
+        value = value.strip()
+        return StepGate(sleep=True) if value.lower() == "sleep" else StepGate(selector=value)
+    if not isinstance(value, dict):
+        raise ValueError("Villkor måste vara en selector-sträng eller ett objekt")
+    unknown = sorted(set(value) - {"selector", "response", "load_state", "sleep"})
+    if unknown:
+        raise ValueError(f"Okända villkor: {', '.join(unknown)}")
+    load_state = (value.get("load_state") or "").strip() or None
+    if load_state and load_state not in LOAD_STATES:
+        raise ValueError(f"Okänt load_state: {load_state}")
+    response = (value.get("response") or "").strip() or None
+    if response:
+        try:
+            re.compile(response)
+        except re.error as e:
+            raise ValueError(f"Ogiltigt response-mönster: {e}") from None
+    return StepGate(
+        selector=(value.get("selector") or "").strip() or None,
+        response=response,
+        load_state=load_state,
+        sleep=bool(value.get("sleep")),
+    )
+
+
+def default_gate(selectors: Optional[List[str]], first_step: bool = False) -> StepGate:
+    """Gate of a step without an explicit one, from its configured selectors.
+
+    The first step waits for any of them, later steps for the primary only.
+    """
+    sels = tuple(s.strip() for s in (selectors or []) if s and s.strip())
+    if first_step:
+        return StepGate(any_of=sels)
+    return StepGate(selector=sels[0] if sels else None)
+
+
+class ResponseWatch:
+    """Recent response URLs of one page, for the response condition."""
+
+    def __init__(self) -> None:
+        self._seen: Deque[Tuple[float, str]] = deque(maxlen=MAX_RESPONSES)
+        self._lock = threading.Lock()
+
+    def on_response(self, response) -> None:
+        with self._lock:
+            self._seen.append((time.monotonic(), response.url))
+
+    def seen_since(self, pattern: "re.Pattern[str]", since: float) -> Optional[str]:
+        with self._lock:
+            items = list(self._seen)
+        for at, url in reversed(items):
+            if at < since:
+                return None
+            if pattern.search(url):
+                return url
+        return None
+
+
+@dataclass
+class StepWait:
+    index: int
+    condition: str
+    bound_s: float
+    waited_ms: int = 0
+    met: bool = False
+    detail: Optional[str] = None
+
+    def as_detail(self) -> Dict[str, Any]:
+        return {
+            "condition": self.condition,
+            "bound_s": self.bound_s,
+            "waited_ms": self.waited_ms,
+            "met": self.met,
+            "detail": self.detail,
+        }
+
+
+def _remaining_ms(deadline: float) -> int:
+    return max(0, int((deadline - time.monotonic()) * 1000))
+
+
+def wait_for_gate_body(page, gate: StepGate, bound_s: float, watch: Optional[ResponseWatch], since: float, index: int):
+    """wait_for_gate as a skv_drive body."""
+    result = StepWait(index=index, condition=gate.describe(), bound_s=bound_s)
+    started = time.monotonic()
+    deadline = started + bound_s
+    try:
+        if gate.sleep:
+            yield Sleep(bound_s)
+            result.met = True
+            return result
+        if gate.load_state:
+            yield lambda: page.wait_for_load_state(gate.load_state, timeout=max(1, _remaining_ms(deadline)))
+        if gate.response:
+            pattern = re.compile(gate.response)
+            while True:
+                hit = watch.seen_since(pattern, since) if watch else None
+                if hit:
+                    result.detail = hit
+                    break
+                if _remaining_ms(deadline) <= 0:
+                    raise TimeoutError(f"ingen response matchade {gate.response}")
+                yield lambda: page.wait_for_timeout(min(RESPONSE_POLL_MS, _remaining_ms(deadline)))
+        if gate.selector:
+            yield lambda: page.locator(gate.selector).first.wait_for(state="visible", timeout=max(1, _remaining_ms(deadline)))
+        if gate.any_of:
+            yield lambda: combined_locator(page, list(gate.any_of)).wait_for(state="visible", timeout=max(1, _remaining_ms(deadline)))
+        result.met = True
+    except Exception as e:
+        result.detail = (str(e).splitlines() or [""])[0]
+    finally:
+        result.waited_ms = int((time.monotonic() - started) * 1000)
+    return result
+
+
+def wait_for_gate(page, gate: StepGate, bound_s: float, watch: Optional[ResponseWatch], since: float, index: int) -> StepWait:
+    """Block until gate holds on page or bound_s has passed."""
+    return run_sync(wait_for_gate_body(page, gate, bound_s, watch, since, index))
+
+
+async def wait_for_gate_async(page, gate: StepGate, bound_s: float, watch: Optional[ResponseWatch], since: float, index: int) -> StepWait:
+    """wait_for_gate for playwright.async_api pages."""
+    return await run_async(wait_for_gate_body(page, gate, bound_s, watch, since, index))
+
+
+def record_step_wait(job, wait: StepWait) -> None:
+    """job.details.step_waits[index] = what the step waited for and for how long."""
+    job.details = job.details or {}
+    job.details.setdefault("step_waits", {})[str(wait.index)] = wait.as_detail()
@@ -2,7 +2,37 @@
 skv_int7.py
 
 Runs the same Playwright methodology as skv6, but as a
-manual-triggered automation entrypoint for dev flows.
+manual-triggered automation entrypoint for dev flows. Imports the engine
+(skv_engine) only, not the Flask UI.
+
+Two modes:
+  one-shot  python skv_int7.py --payload-file ...   one flow, then exit
+  daemon    python skv_int7.py --daemon             long-running worker
+
+The daemon keeps the interpreter, imports and the warm browser engine
+(skv_engine.warm_engine) across flows and takes work over localhost HTTP
+(stdlib only), so starting a flow is one request instead of a process
+spawn. Flows run concurrently through the engine's scheduler; each gets its own
+runtime/int7_sessions/<job_id>/ directory with the payload it was started
+with, and its options travel as a SkvSettings object (int7_settings), not
+through os.environ, so concurrent flows do not see each other's payload.
+
+Every run, one-shot or daemon, logs to int7_log.txt in its own run directory.
+Daemon-wide messages go to stdout (the web app points it at
+runtime/skv_int7_daemon.log). The daemon binds its port before it warms the
+browser, so a second daemon started for the same port exits right away
+instead of launching Chromium next to the first.
+
+  POST /start            {"payload": {...}, "url"?, "timeout_seconds"?,
+                          "allow_mockup_data"?, "allow_normal_browser_window"?,
+                          "force_clone_fallback"?} -> job snapshot (202)
+  GET  /status/<job_id>  job snapshot (skv_engine.JobStatus)
+  POST /cancel/<job_id>
+  GET  /health           pid, uptime, scheduler + sessions
+
+Environment:
+  SKV_INT7_DAEMON_PORT     - daemon port on 127.0.0.1 (default 8768)
+  SKV_INT7_TIMEOUT_SECONDS - default form detection timeout (default 300)
 """
 
 import argparse
@@ -10,21 +40,39 @@ import json
 import os
 import time
 import uuid
+from dataclasses import asdict
 from datetime import datetime
-from typing import Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
 
-import skv6
+import skv_engine
+from skv_flow import flow_from_sequences
+from skv_jobstore import prune_artifacts, retention_from_env
+from skv_scheduler import QueueFull
+from skv_settings import SkvSettings
 
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 RUNTIME_DIR = os.path.join(SCRIPT_DIR, "runtime")
 DEFAULT_PAYLOAD_FILE = os.path.join(RUNTIME_DIR, "skv_payload_latest.json")
-SESSION_LOG_FILE = os.path.join(SCRIPT_DIR, "skv_int7_session_log.txt")
+DEFAULT_URL = "https://www7.skatteverket.se/portal/flyttanmalan/"
+
+# Per-run dirs (payload + log), the daemon's port and the pid/port file the web app reads.
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = int(os.environ.get("SKV_INT7_DAEMON_PORT", "8768"))
+DAEMON_SESSIONS_DIR = os.path.join(RUNTIME_DIR, "int7_sessions")
+RUN_LOG_NAME = "int7_log.txt"
+DAEMON_STATE_FILE = os.path.join(RUNTIME_DIR, "skv_int7_daemon.json")
+# Largest accepted /start body.
+MAX_REQUEST_BYTES = 1 << 20
 
 os.makedirs(RUNTIME_DIR, exist_ok=True)
 
 
-# Keep selectors/timings aligned with skv6 defaults.
+# Keep selectors/timings aligned with skv6 defaults. The seconds are upper
+# bounds: the cookie step starts as soon as any of its selectors is visible,
+# later ones when their primary (first) selector is (skv_gates.default_gate).
+# The real waits end up in job.details["step_waits"].
 CLICK_AFTER_SECONDS_0 = 1.5
 CLICK_SELECTORS_0 = [
     "#deny-all",
@@ -51,24 +99,45 @@ CLICK_SELECTORS_3 = [
     "svg path",
 ]
 
+# The flow the engine runs for int7 (skv_flow): cookie banner, login, BankID, QR.
+INT7_FLOW = flow_from_sequences([
+    (CLICK_AFTER_SECONDS_0, CLICK_SELECTORS_0, None),
+    (CLICK_AFTER_SECONDS_1, CLICK_SELECTORS_1, None),
+    (CLICK_AFTER_SECONDS_2, CLICK_SELECTORS_2, None),
+    (CLICK_AFTER_SECONDS_3, CLICK_SELECTORS_3, None),
+])
+
+
+def _run_dir(job_id: str) -> str:
+    return os.path.join(DAEMON_SESSIONS_DIR, job_id)
+
 
-def _log(message: str, data: Optional[dict] = None) -> None:
-    ts = datetime.now().strftime("%H:%M:%S")
-    with open(SESSION_LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(f"[{ts}] {message}\n")
-        if data is not None:
-            f.write(json.dumps(data, ensure_ascii=False, indent=2) + "\n")
-    print(message)
+def _log(message: str, data: Optional[dict] = None, job_id: Optional[str] = None) -> None:
+    """Append to the run's int7_log.txt (when job_id is given) and print."""
+    if job_id:
+        ts = datetime.now().strftime("%H:%M:%S")
+        with open(os.path.join(_run_dir(job_id), RUN_LOG_NAME), "a", encoding="utf-8") as f:
+            f.write(f"[{ts}] {message}\n")
+            if data is not None:
+                f.write(json.dumps(data, ensure_ascii=False, indent=2) + "\n")
+    if job_id:
+        print(f"[{job_id}] {message}", flush=True)
+    else:
+        print(message if data is None else f"{message} {json.dumps(data, ensure_ascii=False, default=str)}", flush=True)
 
 
-def _reset_log() -> None:
-    with open(SESSION_LOG_FILE, "w", encoding="utf-8") as f:
+def _start_run_log(job_id: str) -> str:
+    """Create the run's directory and log header. Returns the directory."""
+    run_dir = _run_dir(job_id)
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, RUN_LOG_NAME), "w", encoding="utf-8") as f:
         f.write("=" * 60 + "\n")
-        f.write(f"  SKV INT7 SESSION  |  {datetime.now().isoformat()}\n")
+        f.write(f"  SKV INT7 SESSION {job_id}  |  {datetime.now().isoformat()}\n")
         f.write("=" * 60 + "\n\n")
+    return run_dir
 
 
-def _write_last_payload_snapshot(payload_file: str) -> None:
+def _write_last_payload_snapshot(payload_file: str, job_id: str) -> None:
     if not payload_file or not os.path.isfile(payload_file):
         return
     snapshot_file = os.path.join(RUNTIME_DIR, "last_used_payload.json")
@@ -78,23 +147,28 @@ def _write_last_payload_snapshot(payload_file: str) -> None:
         with open(snapshot_file, "w", encoding="utf-8") as dst:
             json.dump(payload, dst, ensure_ascii=False, indent=2)
     except Exception as e:
-        _log("Failed writing payload snapshot", {"error": str(e)})
+        _log("Failed writing payload snapshot", {"error": str(e)}, job_id)
 
 
-def _set_env(temp_env: dict[str, str]) -> dict[str, Optional[str]]:
-    previous: dict[str, Optional[str]] = {}
-    for key, value in temp_env.items():
-        previous[key] = os.environ.get(key)
-        os.environ[key] = value
-    return previous
-
+def int7_settings(
+    payload_file: str,
+    allow_mockup_data: bool,
+    allow_normal_browser_window: bool,
+    force_clone_fallback: bool,
+) -> SkvSettings:
+    """Per-run options of one int7 flow (config.txt/env defaults + these overrides).
 
-def _restore_env(previous: dict[str, Optional[str]]) -> None:
-    for key, old_value in previous.items():
-        if old_value is None:
-            os.environ.pop(key, None)
-        else:
-            os.environ[key] = old_value
+    Passed to skv_engine._run_playwright_job as an object, so flows that run in
+    the same process (daemon mode) each keep their own payload and flags.
+    """
+    return skv_engine.get_settings({
+        "payload_file": payload_file,
+        "allow_mockup_data": allow_mockup_data,
+        # Prevent opening another default browser window by default for int7.
+        "disable_normal_browser_window": not allow_normal_browser_window,
+        # In dev + popup-constrained environments, clone fallback improves QR visibility.
+        "force_clone_tab_fallback": force_clone_fallback,
+    })
 
 
 def run_int7_flow(
@@ -105,72 +179,242 @@ def run_int7_flow(
     allow_normal_browser_window: bool,
     force_clone_fallback: bool,
 ) -> int:
-    _reset_log()
-    _write_last_payload_snapshot(payload_file)
+    # Launch the pooled browser (or async engine) now so it is warm by the time the job starts.
+    skv_engine.warm_engine()
+    job_id = uuid.uuid4().hex[:12]
+    _start_run_log(job_id)
+    _write_last_payload_snapshot(payload_file, job_id)
 
+    settings = int7_settings(payload_file, allow_mockup_data, allow_normal_browser_window, force_clone_fallback)
     _log("Starting skv_int7 flow", {
         "target_url": target_url,
-        "payload_file": payload_file,
         "timeout_seconds": timeout_seconds,
-        "allow_mockup_data": allow_mockup_data,
         "allow_normal_browser_window": allow_normal_browser_window,
         "force_clone_fallback": force_clone_fallback,
-        "skv_synligt_skv": os.environ.get("SKV_SYNLIGT_SKV", ""),
-    })
+        "settings": asdict(settings),
+    }, job_id)
 
-    temp_env = {
-        "SKV_PAYLOAD_FILE": payload_file,
-        "SKV_ALLOW_MOCKUP_DATA": "y" if allow_mockup_data else "n",
-        # Prevent opening another default browser window by default for int7.
-        "SKV_DISABLE_NORMAL_BROWSER_WINDOW": "n" if allow_normal_browser_window else "y",
-        # In dev + popup-constrained environments, clone fallback improves QR visibility.
-        "SKV_FORCE_CLONE_TAB_FALLBACK": "y" if force_clone_fallback else "n",
-    }
+    job = skv_engine.JobStatus(job_id=job_id, state="queued", message="Köad...")
+    skv_engine._set_job(job)
+
+    skv_engine._run_playwright_job(
+        job_id=job_id,
+        url=target_url,
+        timeout_seconds=timeout_seconds,
+        flow=INT7_FLOW,
+        settings=settings,
+    )
 
-    previous_env = _set_env(temp_env)
+    final_job = skv_engine._get_job(job_id)
+    if not final_job:
+        _log("skv_int7 finished without final job record", job_id=job_id)
+        return 1
+
+    _log("skv_int7 finished", {
+        "state": final_job.state,
+        "message": final_job.message,
+        "screenshot_path": final_job.screenshot_path,
+        "details": final_job.details or {},
+    }, job_id)
+
+    if final_job.state == "matched":
+        return 0
+    return 1
+
+
+# ----------------------------
+# Daemon mode
+# ----------------------------
+
+def start_daemon_flow(body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    """Queue one int7 flow from a /start body. Returns (HTTP status, response)."""
+    payload = body.get("payload")
+    if not isinstance(payload, dict):
+        return 400, {"ok": False, "error": "payload måste vara ett objekt"}
+    url = (body.get("url") or DEFAULT_URL).strip()
+    if not url.startswith(("http://", "https://")):
+        return 400, {"ok": False, "error": "URL måste börja med http:// eller https://"}
     try:
-        job_id = uuid.uuid4().hex[:12]
-        job = skv6.JobStatus(job_id=job_id, state="queued", message="Köad...")
-        skv6._set_job(job)
-
-        skv6._run_playwright_job(
-            job_id=job_id,
-            url=target_url,
-            timeout_seconds=timeout_seconds,
-            click_after_seconds_0=CLICK_AFTER_SECONDS_0,
-            click_selectors_0=CLICK_SELECTORS_0,
-            click_after_seconds=CLICK_AFTER_SECONDS_1,
-            click_selectors=CLICK_SELECTORS_1,
-            click_after_seconds_2=CLICK_AFTER_SECONDS_2,
-            click_selectors_2=CLICK_SELECTORS_2,
-            click_after_seconds_3=CLICK_AFTER_SECONDS_3,
-            click_selectors_3=CLICK_SELECTORS_3,
+        timeout_seconds = float(body.get("timeout_seconds") or os.environ.get("SKV_INT7_TIMEOUT_SECONDS", "300"))
+    except (TypeError, ValueError):
+        return 400, {"ok": False, "error": "timeout_seconds måste vara ett tal"}
+
+    job_id = uuid.uuid4().hex[:12]
+    session_dir = _start_run_log(job_id)
+    payload_file = os.path.join(session_dir, "payload.json")
+    with open(payload_file, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    settings = int7_settings(
+        payload_file,
+        bool(body.get("allow_mockup_data")),
+        bool(body.get("allow_normal_browser_window")),
+        body.get("force_clone_fallback", True) is not False,
+    )
+
+    job = skv_engine.JobStatus(job_id=job_id, state="queued", message="Köad...")
+    job.details = {"int7": {
+        "session_dir": session_dir,
+        "log_file": os.path.join(session_dir, RUN_LOG_NAME),
+        "url": url,
+        "timeout_seconds": timeout_seconds,
+    }}
+    skv_engine._set_job(job)
+
+    def _finished(_pending=None) -> None:
+        final_job = skv_engine._get_job(job_id)
+        _log("skv_int7 daemon flow finished", {
+            "state": final_job.state if final_job else None,
+            "message": final_job.message if final_job else None,
+        }, job_id)
+
+    def _run():
+        # Async engine: returns the job's future, so the scheduler thread is free again.
+        pending = skv_engine._start_playwright_job(
+            job_id,
+            url,
+            timeout_seconds,
+            flow=INT7_FLOW,
+            settings=settings,
         )
+        if pending is None:
+            _finished()
+        else:
+            pending.add_done_callback(_finished)
+        return pending
+
+    try:
+        skv_engine._get_scheduler().submit(job_id, _run)
+    except QueueFull as e:
+        skv_engine._drop_job(job_id)
+        return 429, {"ok": False, "error": "Kön är full, försök igen senare.", "retry_after": e.retry_after}
+
+    _log("skv_int7 daemon flow queued", {"url": url, "session_dir": session_dir}, job_id)
+    return 202, {"ok": True, "started": True, "job": skv_engine._get_job_store().lookup(job_id)}
+
+
+def _prune_daemon_sessions() -> Dict[str, int]:
+    limits = retention_from_env()
+    return prune_artifacts(
+        DAEMON_SESSIONS_DIR,
+        max_age_seconds=limits["results_max_age_seconds"],
+        keep=skv_engine._get_job_store().active_ids(),
+    )
+
+
+class _DaemonHandler(BaseHTTPRequestHandler):
+    server_version = "skv-int7"
+    started_at = 0.0
+
+    def _send(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Optional[Dict[str, Any]]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_REQUEST_BYTES:
+            return None
+        try:
+            body = json.loads(self.rfile.read(length).decode("utf-8"))
+        except ValueError:
+            return None
+        return body if isinstance(body, dict) else None
+
+    def do_GET(self) -> None:
+        parts = [p for p in self.path.split("?", 1)[0].split("/") if p]
+        if parts == ["health"]:
+            self._send(200, {
+                "ok": True,
+                "pid": os.getpid(),
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "scheduler": skv_engine._get_scheduler().stats(),
+                "active_jobs": skv_engine._get_job_store().active_ids(),
+            })
+        elif len(parts) == 2 and parts[0] == "status":
+            snapshot = skv_engine._get_job_store().lookup(parts[1])
+            if snapshot is None:
+                self._send(404, {"ok": False, "error": "job not found"})
+            else:
+                self._send(200, {"ok": True, "job": snapshot})
+        else:
+            self._send(404, {"ok": False, "error": "not found"})
+
+    def do_POST(self) -> None:
+        parts = [p for p in self.path.split("?", 1)[0].split("/") if p]
+        if parts == ["start"]:
+            body = self._read_json()
+            if body is None:
+                self._send(400, {"ok": False, "error": "Ogiltig JSON"})
+                return
+            try:
+                status, response = start_daemon_flow(body)
+            except Exception as e:
+                _log("skv_int7 daemon start failed", {"error": str(e)})
+                status, response = 500, {"ok": False, "error": "Kunde inte starta flödet"}
+            self._send(status, response)
+        elif len(parts) == 2 and parts[0] == "cancel":
+            self._send(200, {"ok": skv_engine.cancel_job(parts[1])})
+        else:
+            self._send(404, {"ok": False, "error": "not found"})
 
-        final_job = skv6._get_job(job_id)
-        if not final_job:
-            _log("skv_int7 finished without final job record")
-            return 1
+    def log_message(self, format, *args) -> None:
+        pass
 
-        _log("skv_int7 finished", {
-            "state": final_job.state,
-            "message": final_job.message,
-            "screenshot_path": final_job.screenshot_path,
-            "details": final_job.details or {},
-        })
 
-        if final_job.state == "matched":
-            return 0
+def _write_daemon_state(port: int) -> None:
+    with open(DAEMON_STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump({"pid": os.getpid(), "port": port, "startedAt": datetime.now().isoformat()}, f, indent=2)
+        f.write("\n")
+
+
+def _clear_daemon_state() -> None:
+    try:
+        with open(DAEMON_STATE_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("pid") == os.getpid():
+            os.remove(DAEMON_STATE_FILE)
+    except (OSError, ValueError):
+        pass
+
+
+def run_daemon(port: int) -> int:
+    """Serve /start, /status, /cancel and /health until interrupted.
+
+    Returns 1 without starting anything when the port is taken (another
+    daemon won the race to start).
+    """
+    try:
+        # Bound first: the port is the lock that keeps a second daemon from warming a browser.
+        server = ThreadingHTTPServer((DAEMON_HOST, port), _DaemonHandler)
+    except OSError as e:
+        _log("skv_int7 daemon not started: port in use", {"port": port, "error": str(e)})
         return 1
+    server.daemon_threads = True
+    skv_engine.warm_engine()
+    skv_engine._start_housekeeping()
+    os.makedirs(DAEMON_SESSIONS_DIR, exist_ok=True)
+    _prune_daemon_sessions()
+    _DaemonHandler.started_at = time.time()
+    _write_daemon_state(server.server_address[1])
+    _log("skv_int7 daemon listening", {"host": DAEMON_HOST, "port": server.server_address[1], "pid": os.getpid()})
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
     finally:
-        _restore_env(previous_env)
+        server.server_close()
+        _clear_daemon_state()
+    return 0
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Run SKV int7 BankID flow")
     parser.add_argument(
         "--url",
-        default="https://www7.skatteverket.se/portal/flyttanmalan/",
+        default=DEFAULT_URL,
         help="Target URL to open",
     )
     parser.add_argument(
@@ -199,19 +443,41 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Disable forced clone fallback for QR tab in int7 mode",
     )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Run as a long-lived worker that accepts flows over localhost HTTP",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=DAEMON_PORT,
+        help="Daemon port on 127.0.0.1 (0 = any free port)",
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
-    exit_code = run_int7_flow(
-        target_url=args.url,
-        payload_file=args.payload_file,
-        timeout_seconds=args.timeout_seconds,
-        allow_mockup_data=args.allow_mockup_data,
-        allow_normal_browser_window=args.allow_normal_browser_window,
-        force_clone_fallback=not args.no_force_clone_fallback,
-    )
-    # Give user-visible browser operations a tiny flush window before process exits.
-    time.sleep(0.2)
+    if args.daemon:
+        try:
+            exit_code = run_daemon(args.port)
+        finally:
+            skv_engine.shutdown_engine()
+        raise SystemExit(exit_code)
+    # A single CLI flow only ever needs one warm browser.
+    os.environ.setdefault("SKV_BROWSER_POOL_SIZE", "1")
+    try:
+        exit_code = run_int7_flow(
+            target_url=args.url,
+            payload_file=args.payload_file,
+            timeout_seconds=args.timeout_seconds,
+            allow_mockup_data=args.allow_mockup_data,
+            allow_normal_browser_window=args.allow_normal_browser_window,
+            force_clone_fallback=not args.no_force_clone_fallback,
+        )
+        # Give user-visible browser operations a tiny flush window before process exits.
+        time.sleep(0.2)
+    finally:
+        skv_engine.shutdown_engine()
     raise SystemExit(exit_code)
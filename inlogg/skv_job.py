@@ -0,0 +1,355 @@
+"""
+skv_job.py - The job body both engines run: click flow -> QR login -> form
+fill -> artifacts.
+
+job_body is a skv_drive body, so it is written once:
+skv_engine._run_job_in_context drives it with run_sync on a pooled browser's
+thread, skv_async_engine.run_job_async with run_async on the event loop.
+What differs per engine comes in as arguments (the attached readiness
+watcher, is_async for the response handler, popup click and filler), and
+publish is Blocking so the async engine stores job state off the loop thread.
+
+Phases:
+  flow      navigate, click sequences (skv_flow) with the QR hooks below
+  phase 1   wait for login + form: event-driven readiness, two-check
+            debounce, Nästa scroll/click fallback on flytt tabs, one late
+            detection after the timeout; cancel saves a screenshot
+  phase 2   form filler
+  phase 3   publish the result, then screenshot + HTML via skv_artifacts
+"""
+import os
+import time
+from typing import Any, Callable, Dict, List
+
+from skv_artifacts import HTML_NAME, capture_page_artifacts_body, reserve_job_artifacts
+from skv_core import (
+    AUTH_SPA_URL_TEMPLATE,
+    FORM_NEXT_HOST_SELECTOR,
+    QR_LINKS_JS,
+    FormSignalProbe,
+    get_all_pages_for_form,
+    pick_form_page_body,
+)
+from skv_drive import Blocking, Sleep
+from skv_flow import ClickStep, StepOutcome, click_flow_body
+from skv_gates import ResponseWatch
+from skv_readiness import CONFIRM_DELAY_SECONDS, FALLBACK_CHECK_SECONDS
+from skv_settings import SkvSettings
+
+
+# Phase 1: try the Nästa fallback on flytt tabs at most this often.
+NEXT_FALLBACK_INTERVAL_SECONDS = 10.0
+# Debug status line / FORM_WAIT log interval while waiting for the form.
+STATUS_INTERVAL_SECONDS = 5.0
+
+
+def _qr_hooks(context, page, job, session, settings: SkvSettings):
+    """before_click / after_click bodies for the flow: QR logging, clone tab, focus."""
+
+    def before_click(step: ClickStep):
+        if not step.expect_popup:
+            return
+        try:
+            qr_info = yield lambda: page.evaluate(QR_LINKS_JS)
+            if qr_info:
+                session.log_qr("QR_URL_FROM_PAGE", qr_info)
+        except Exception:
+            pass
+
+    def after_click(outcome: StepOutcome):
+        if not (outcome.step.expect_popup and outcome.race.selector):
+            return
+        popup = outcome.popup
+        if popup is not None:
+            session.log_qr("QR_NEW_TAB_URL", {"url": popup.url})
+        session.log_qr("QR_CLICK", {"job_id": job.job_id, "popup": popup is not None, **outcome.race.as_detail()})
+
+        cap = session.capture()
+        bankid_url = cap.get("bankid_url")
+
+        # Clone tab fallback: when QR click doesn't open a popup,
+        # we open a clone to the auth URL so the user can see and scan the QR code.
+        # Without this, there's no visible QR if the browser doesn't create a popup.
+        # Controlled by CLONE_TAB_FALLBACK in config.txt (default: off).
+        if popup is None:
+            if settings.clone_enabled:
+                clone_url = cap.get("auth_spa_url")
+                if not clone_url and cap.get("aid"):
+                    clone_url = AUTH_SPA_URL_TEMPLATE.format(aid=cap["aid"])
+                if clone_url:
+                    try:
+                        clone_page = yield context.new_page
+                        yield lambda: clone_page.goto(clone_url, wait_until="domcontentloaded", timeout=30000)
+                        session.log_qr("QR_CLONE_OPENED", {"url": clone_url})
+                    except Exception as e:
+                        session.log_qr("QR_CLONE_ERROR", str(e))
+            else:
+                session.log_qr("QR_NO_POPUP_NO_CLONE", {"reason": "CLONE_TAB_FALLBACK not enabled"})
+
+        if bankid_url:
+            session.log_qr("BANKID_URL_AVAILABLE", {"url": bankid_url})
+
+        # Dev signal: keep focus on BankID QR window when requested.
+        if settings.synligt_skv and popup is not None and not popup.is_closed():
+            try:
+                yield popup.bring_to_front
+                session.log_qr("QR_FOCUSED_FOR_DEV", {"enabled": True})
+            except Exception:
+                pass
+
+    return before_click, after_click
+
+
+def _status_bits(main_signals: Dict[str, Any], popup_signals: Any, api_ready: bool, ready_streak: int) -> str:
+    status_bits = (
+        f"main(form={main_signals.get('has_form')},wiz={main_signals.get('has_wizard_step')},"
+        f"active={main_signals.get('has_active_step')},next={main_signals.get('has_next_host')})"
+    )
+    if popup_signals:
+        status_bits += (
+            f", popup(form={popup_signals.get('has_form')},wiz={popup_signals.get('has_wizard_step')},"
+            f"active={popup_signals.get('has_active_step')},next={popup_signals.get('has_next_host')})"
+        )
+    return status_bits + f", api_ready={api_ready}, streak={ready_streak}/2"
+
+
+def _next_fallback(page, popup_page_ref, all_pages: list, readiness, job, session, publish):
+    """On a flytt tab without a detected form: scroll down (Nästa is often below
+    the fold on the intro page) and click the first Nästa. Checks all tabs, the
+    form often opens in a new tab after BankID."""
+    for try_page in all_pages or [page, popup_page_ref]:
+        if try_page is None or try_page.is_closed():
+            continue
+        try:
+            url = try_page.url or ""
+            if "flytt" not in url.lower():
+                continue
+            yield lambda: try_page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            yield Sleep(0.5)
+            # Playwright pierces shadow DOM; try primary + text fallback
+            for loc, extra in (
+                (try_page.locator(FORM_NEXT_HOST_SELECTOR), {}),
+                (try_page.get_by_role("button", name="Nästa"), {"selector": "role"}),
+            ):
+                if (yield loc.count) > 0:
+                    yield loc.first.scroll_into_view_if_needed
+                    yield Sleep(0.3)
+                    yield lambda: loc.first.click(timeout=3000)
+                    session.log_qr("NÄSTA_FALLBACK_CLICK", {"url": url[:60], **extra})
+                    job.message = "Klickade på Nästa (fallback), väntar på formulär..."
+                    yield Blocking(publish, job)
+                    yield lambda: readiness.wait(try_page, 2.0)
+                    return
+        except Exception as e:
+            session.log_qr("NÄSTA_FALLBACK_FAIL", {"error": str(e)})
+
+
+def job_body(
+    context,
+    readiness,
+    job,
+    session,
+    capture,
+    settings: SkvSettings,
+    url: str,
+    timeout_seconds: float,
+    flow: List[ClickStep],
+    publish: Callable[[Any], None],
+    is_cancelled: Callable[[], bool],
+    is_async: bool = False,
+):
+    """Run one job on context. readiness is the context's attached
+    FormReadinessWatcher (AsyncFormReadinessWatcher when is_async)."""
+    page = yield context.new_page
+
+    # QR/BankID capture (aid, autostart token for the "clone" tab) and the flytt API signal
+    capture.readiness = readiness
+    page.on("response", capture.on_response_async if is_async else capture.on_response)
+    responses = ResponseWatch()
+    page.on("response", responses.on_response)
+
+    job.message = f"Navigerar till: {url}"
+    yield Blocking(publish, job)
+    session.log(f"Navigate to {url}", "INIT")
+    yield lambda: page.goto(url, wait_until="domcontentloaded")
+
+    # ---- Click flow (skv_flow) ----
+    # Each step waits for its gate, races its selectors and records a timing
+    # breakdown in job.details["flow"]. QR specifics live in the hooks.
+    before_click, after_click = _qr_hooks(context, page, job, session, settings)
+    flow_result = yield from click_flow_body(
+        page,
+        job,
+        session,
+        flow,
+        publish=publish,
+        is_cancelled=is_cancelled,
+        responses=responses,
+        before_click=before_click,
+        after_click=after_click,
+        is_async=is_async,
+    )
+    if flow_result.cancelled:
+        job.state = "cancelled"
+        job.ended_at = time.time()
+        job.message = "Avbruten av användaren."
+        yield Blocking(publish, job)
+        return
+    popup_page_ref = flow_result.popup
+
+    # ---- Phase 1: wait for login + form ----
+    job.message = "Väntar på inloggning (QR)..."
+    yield Blocking(publish, job)
+
+    start = time.time()
+    flytt_page = None
+    last_status_at = start
+    last_fallback_at = 0.0
+    ready_streak = 0
+    ready_source = ""
+    # One evaluate per flytt tab per check, shared by main/popup/tab lookups.
+    probe = FormSignalProbe(FORM_NEXT_HOST_SELECTOR)
+
+    # Each check runs right after a readiness event (or a slow safety tick);
+    # the confirming second check follows after CONFIRM_DELAY_SECONDS.
+    while (time.time() - start) < timeout_seconds:
+        if is_cancelled():
+            job.state = "cancelled"
+            job.ended_at = time.time()
+            job.message = "Avbruten av användaren."
+            session.log("Session cancelled by user", "DONE")
+            job.screenshot_path = reserve_job_artifacts(session, html=False)
+            yield Blocking(publish, job)
+            captured = yield from capture_page_artifacts_body(session, page, html=False)
+            if not captured["screenshot"]:
+                job.screenshot_path = None
+                yield Blocking(publish, job)
+            return
+
+        api_ready = session.api_ready
+        all_pages = get_all_pages_for_form(page)
+        candidate_page, candidate_source, source_signals, other_signals = yield from pick_form_page_body(
+            page, popup_page_ref, api_ready, all_pages, FORM_NEXT_HOST_SELECTOR, probe
+        )
+        if candidate_source == "popup":
+            main_signals, popup_signals = other_signals, source_signals
+        else:
+            main_signals, popup_signals = source_signals, other_signals
+
+        if time.time() - last_status_at >= STATUS_INTERVAL_SECONDS:
+            last_status_at = time.time()
+            elapsed = int(time.time() - start)
+            job.message = f"Väntar på formulär ({elapsed}s)... {_status_bits(main_signals, popup_signals, api_ready, ready_streak)}"
+            yield Blocking(publish, job)
+            session.log(
+                f"Waiting for form ({elapsed}s)",
+                "FORM_WAIT",
+                {
+                    "api_ready": api_ready,
+                    "candidate_source": candidate_source,
+                    "tabs_checked": len(all_pages) if all_pages else 0,
+                    "streak": f"{ready_streak}/2",
+                    "signals": dict(readiness.counts),
+                    "probe": probe.stats(),
+                },
+            )
+
+        if candidate_page:
+            if ready_source == candidate_source:
+                ready_streak += 1
+            else:
+                ready_source = candidate_source
+                ready_streak = 1
+
+            if ready_streak == 1:
+                session.log_qr(
+                    "FORM_READY_CANDIDATE",
+                    {"source": candidate_source, "api_ready": api_ready, "signals": source_signals},
+                )
+
+            if ready_streak >= 2:
+                flytt_page = candidate_page
+                readiness.mark_detected()
+                session.log(
+                    f"Form detected on {candidate_source}",
+                    "FORM_DETECT",
+                    {"url": flytt_page.url, "signals": source_signals},
+                )
+                job.message = f"Formulär hittat på {candidate_source}, startar ifyllning..."
+                yield Blocking(publish, job)
+                break
+        else:
+            ready_streak = 0
+            ready_source = ""
+            if time.time() - last_fallback_at >= NEXT_FALLBACK_INTERVAL_SECONDS:
+                last_fallback_at = time.time()
+                yield from _next_fallback(page, popup_page_ref, all_pages, readiness, job, session, publish)
+
+        yield lambda: readiness.wait(page, CONFIRM_DELAY_SECONDS if ready_streak else FALLBACK_CHECK_SECONDS)
+
+    if not flytt_page:
+        candidate_page, candidate_source, source_signals, _ = yield from pick_form_page_body(
+            page, popup_page_ref, session.api_ready, get_all_pages_for_form(page), FORM_NEXT_HOST_SELECTOR, probe
+        )
+        if candidate_page:
+            flytt_page = candidate_page
+            readiness.mark_detected()
+            session.log(
+                f"Form detected late on {candidate_source}",
+                "FORM_DETECT",
+                {"url": flytt_page.url, "signals": source_signals},
+            )
+
+    if flytt_page and settings.open_normal_browser_window:
+        try:
+            import webbrowser
+
+            yield Blocking(webbrowser.open, flytt_page.url)
+            session.log("Opened form URL in default browser (POPUP_BROWSER_NORMAL_WINDOW)", "FORM_DETECT")
+        except Exception:
+            pass
+
+    # ---- Phase 2: form filler (output goes to the session log) ----
+    form_filler_done = False
+    if flytt_page:
+        try:
+            from formulär.flytt_form_filler import flytt_form_filler_body
+
+            job.message = "Fyller flyttformulär..."
+            yield Blocking(publish, job)
+            session.log("Starting form filler", "FORM")
+            readiness.mark_fill_started()
+            job.details = job.details or {}
+            job.details["readiness"] = {**readiness.timings(), "probe": probe.stats()}
+            session.log("Readiness timings", "FORM_DETECT", job.details["readiness"])
+            job.details["filler"] = yield from flytt_form_filler_body(
+                flytt_page,
+                is_cancelled,
+                log_callback=lambda msg: session.log(msg.strip(), "FORM"),
+                settings=settings,
+                mode="async" if is_async else "sync",
+            )
+            form_filler_done = True
+        except Exception as e:
+            job.details = job.details or {}
+            job.details["flytt_filler_error"] = str(e)
+            session.log(f"Form filler error: {e}", "FORM")
+
+    job.ended_at = time.time()
+    if form_filler_done:
+        job.state = "matched"
+        job.message = f"Formulär ifyllt! Se {os.path.basename(session.log_file)} + {session.artifact_url_path(HTML_NAME)}"
+        session.log("Session completed successfully", "DONE")
+    elif job.state != "cancelled":
+        job.state = "timeout"
+        job.message = "Timeout: formuläret hittades inte inom vald tid (inloggning klar?)."
+        session.log("Session ended: form not found within timeout", "DONE")
+
+    # ---- Phase 3: report the result first; screenshot + HTML snapshot are
+    # written in the background (the paths are reserved so /results/ waits for them).
+    job.screenshot_path = reserve_job_artifacts(session)
+    yield Blocking(publish, job)
+    captured = yield from capture_page_artifacts_body(session, flytt_page or page)
+    if not captured["screenshot"]:
+        job.screenshot_path = None
+        yield Blocking(publish, job)
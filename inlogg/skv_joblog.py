@@ -0,0 +1,227 @@
+"""
+skv_joblog.py - Buffered structured per-job logger.
+
+Callers (including Playwright event callbacks) only enqueue a record; a single
+background thread serializes it to JSONL, one file per job, with size-based
+rotation. The queue is bounded: when it is full the record is dropped and
+counted instead of blocking the browser event thread. A dict passed as data
+is copied (one level) when it is queued, so the caller may keep changing it.
+
+One writer (and thread) per log directory: get_job_log_writer(log_dir).
+
+Environment:
+  SKV_LOG_QUEUE_SIZE      - Max buffered records (default 5000)
+  SKV_LOG_MAX_BYTES       - Rotate a job file above this size (default 5 MB)
+  SKV_LOG_BACKUPS         - Rotated files kept per job (default 3)
+  SKV_LOG_BODY_MAX_CHARS  - Max serialized size of a "body" value; 0 drops
+                            bodies, -1 keeps them whole (default 2000)
+"""
+import json
+import os
+import queue
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+DEFAULT_QUEUE_SIZE = 5000
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUPS = 3
+DEFAULT_BODY_MAX_CHARS = 2000
+MAX_OPEN_FILES = 32
+
+_FLUSH = object()
+_CLOSE = object()
+
+
+def truncate_body(value: Any, max_chars: int) -> Any:
+    """Apply the body policy: keep, drop or cut to a preview with the original size."""
+    if max_chars < 0:
+        return value
+    if max_chars == 0:
+        return {"_dropped": True}
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    if len(text) <= max_chars:
+        return value
+    return {"_truncated": True, "chars": len(text), "preview": text[:max_chars]}
+
+
+class JobLogWriter:
+    def __init__(
+        self,
+        log_dir: str,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        backups: int = DEFAULT_BACKUPS,
+        body_max_chars: int = DEFAULT_BODY_MAX_CHARS,
+    ) -> None:
+        self.log_dir = log_dir
+        self.max_bytes = max(1024, int(max_bytes))
+        self.backups = max(0, int(backups))
+        self.body_max_chars = int(body_max_chars)
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._files: "OrderedDict[str, Any]" = OrderedDict()
+        self._counters_lock = threading.Lock()
+        self._dropped: Dict[str, int] = {}
+        self._counters = {"written": 0, "dropped": 0, "rotations": 0, "write_errors": 0}
+        os.makedirs(log_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="skv-joblog", daemon=True)
+        self._thread.start()
+
+    def path_for(self, job_id: str) -> str:
+        return os.path.join(self.log_dir, f"{job_id}_session_log.jsonl")
+
+    # -- producer side (never blocks) --
+
+    def emit(self, job_id: str, msg: str, section: str = "", data: Optional[Any] = None) -> bool:
+        record = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "job_id": job_id,
+            "section": section,
+            "msg": msg,
+        }
+        if data is not None:
+            record["data"] = dict(data) if isinstance(data, dict) else data
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            with self._counters_lock:
+                self._counters["dropped"] += 1
+                self._dropped[job_id] = self._dropped.get(job_id, 0) + 1
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far is on disk."""
+        done = threading.Event()
+        try:
+            self._queue.put((_FLUSH, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def dropped_for(self, job_id: str) -> int:
+        with self._counters_lock:
+            return self._dropped.get(job_id, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._counters_lock:
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "queued": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "open_files": len(self._files),
+            "body_max_chars": self.body_max_chars,
+        }
+
+    # -- writer thread --
+
+    def _prepare(self, record: Dict[str, Any]) -> str:
+        data = record.get("data")
+        if isinstance(data, dict) and "body" in data:
+            record["data"] = {**data, "body": truncate_body(data["body"], self.body_max_chars)}
+        return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+    def _file(self, job_id: str):
+        f = self._files.pop(job_id, None)
+        if f is None:
+            f = open(self.path_for(job_id), "a", encoding="utf-8")
+            while len(self._files) >= MAX_OPEN_FILES:
+                _, old = self._files.popitem(last=False)
+                old.close()
+        self._files[job_id] = f
+        return f
+
+    def _rotate_if_needed(self, job_id: str, f) -> None:
+        if f.tell() < self.max_bytes:
+            return
+        f.close()
+        self._files.pop(job_id, None)
+        base = self.path_for(job_id)
+        if self.backups:
+            for i in range(self.backups - 1, 0, -1):
+                src = f"{base}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{base}.{i + 1}")
+            os.replace(base, f"{base}.1")
+        else:
+            os.remove(base)
+        with self._counters_lock:
+            self._counters["rotations"] += 1
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Drain whatever else is ready so one wake-up writes a whole burst.
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            touched = set()
+            waiters = []
+            for rec in batch:
+                if isinstance(rec, tuple):
+                    marker, arg = rec
+                    if marker is _FLUSH:
+                        waiters.append(arg)
+                    elif marker is _CLOSE:
+                        touched.discard(arg)
+                        f = self._files.pop(arg, None)
+                        if f is not None:
+                            f.close()
+                    continue
+                job_id = rec.get("job_id") or "_"
+                try:
+                    f = self._file(job_id)
+                    f.write(self._prepare(rec))
+                    touched.add(job_id)
+                    with self._counters_lock:
+                        self._counters["written"] += 1
+                    self._rotate_if_needed(job_id, f)
+                except Exception as e:
+                    with self._counters_lock:
+                        self._counters["write_errors"] += 1
+                    print(f"Job log write error: {e}")
+            for job_id in touched:
+                f = self._files.get(job_id)
+                if f is not None:
+                    try:
+                        f.flush()
+                    except Exception:
+                        pass
+            for w in waiters:
+                w.set()
+
+    def close_job(self, job_id: str) -> None:
+        """Release the job's file handle after its queued records are written,
+        and forget the job's drop count."""
+        with self._counters_lock:
+            self._dropped.pop(job_id, None)
+        try:
+            self._queue.put((_CLOSE, job_id), timeout=1.0)
+        except queue.Full:
+            pass  # LRU eviction closes it eventually
+
+
+_writers: Dict[str, JobLogWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def get_job_log_writer(log_dir: str) -> JobLogWriter:
+    """The writer for log_dir (created on first use)."""
+    key = os.path.abspath(log_dir)
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None:
+            writer = _writers[key] = JobLogWriter(
+                key,
+                queue_size=int(os.environ.get("SKV_LOG_QUEUE_SIZE", DEFAULT_QUEUE_SIZE)),
+                max_bytes=int(os.environ.get("SKV_LOG_MAX_BYTES", DEFAULT_MAX_BYTES)),
+                backups=int(os.environ.get("SKV_LOG_BACKUPS", DEFAULT_BACKUPS)),
+                body_max_chars=int(os.environ.get("SKV_LOG_BODY_MAX_CHARS", DEFAULT_BODY_MAX_CHARS)),
+            )
+        return writer
@@ -0,0 +1,314 @@
+"""
+skv_jobstore.py - Job store: bounded in-memory tier + optional SQLite history.
+
+The memory tier holds live JobStatus objects and cancel flags. Finished jobs
+stay there for SKV_JOB_TTL_SECONDS and the tier never holds more than
+SKV_JOB_MAX_IN_MEMORY entries (least recently updated finished jobs go
+first; queued/running jobs are never evicted). When a job reaches a terminal
+state its snapshot is written to the durable tier, so lookups keep working
+after eviction and across restarts.
+
+prune_artifacts applies the retention policy for per-job artifact dirs
+(results/<job_id>/) and other files under a directory.
+
+Environment:
+  SKV_JOB_MAX_IN_MEMORY       - Max jobs kept in memory (default 500)
+  SKV_JOB_TTL_SECONDS         - Keep finished jobs in memory this long (default 3600)
+  SKV_JOB_HISTORY             - n = no SQLite history (default y)
+  SKV_JOB_HISTORY_DAYS        - Delete history rows older than this (default 30)
+  SKV_RESULTS_MAX_AGE_DAYS    - Delete artifacts older than this (default 14, 0 = keep)
+  SKV_RESULTS_MAX_MB          - Delete oldest artifacts above this total (default 2000, 0 = no cap)
+"""
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from skv_core import is_truthy
+from skv_events import TERMINAL_STATES
+
+
+DEFAULT_MAX_IN_MEMORY = 500
+DEFAULT_TTL_SECONDS = 3600.0
+DEFAULT_HISTORY_DAYS = 30
+DEFAULT_RESULTS_MAX_AGE_DAYS = 14
+DEFAULT_RESULTS_MAX_MB = 2000
+
+
+class SqliteJobHistory:
+    """Durable tier: one row per finished job, holding its last snapshot."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " state TEXT NOT NULL,"
+                " ended_at REAL,"
+                " snapshot TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ended_at ON jobs(ended_at)")
+
+    def save(self, job_id: str, state: str, ended_at: Optional[float], snapshot: Dict[str, Any]) -> None:
+        data = json.dumps(snapshot, ensure_ascii=False, default=str)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, state, ended_at, snapshot) VALUES (?, ?, ?, ?)",
+                (job_id, state, ended_at or time.time(), data),
+            )
+
+    def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT snapshot FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def prune(self, max_age_seconds: float) -> int:
+        cutoff = time.time() - max_age_seconds
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM jobs WHERE ended_at < ?", (cutoff,)).rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobStore:
+    def __init__(
+        self,
+        max_in_memory: int = DEFAULT_MAX_IN_MEMORY,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        history: Optional[SqliteJobHistory] = None,
+        on_evict: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self.max_in_memory = max(1, int(max_in_memory))
+        self.ttl_seconds = max(0.0, float(ttl_seconds))
+        self.history = history
+        self._on_evict = on_evict
+        self._jobs: "OrderedDict[str, Any]" = OrderedDict()
+        self._cancel_flags: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+        self._counters = {"evicted": 0, "history_writes": 0, "history_errors": 0, "history_hits": 0}
+
+    # -- memory tier --
+
+    def put(self, job) -> None:
+        """Insert/refresh a job (moves it to the most-recent end). Persists terminal states."""
+        terminal = job.state in TERMINAL_STATES
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._jobs.move_to_end(job.job_id)
+            evicted = self._evict_locked(time.time()) if len(self._jobs) > self.max_in_memory else []
+        if terminal and self.history is not None:
+            try:
+                self.history.save(job.job_id, job.state, job.ended_at, asdict(job))
+                with self._lock:
+                    self._counters["history_writes"] += 1
+            except Exception as e:
+                with self._lock:
+                    self._counters["history_errors"] += 1
+                print(f"Job history write error: {e}")
+        self._notify_evicted(evicted)
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def remove(self, job_id: str) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._cancel_flags.pop(job_id, None)
+
+    def lookup(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Snapshot dict from memory, else from the durable tier."""
+        job = self.get(job_id)
+        if job is not None:
+            return asdict(job)
+        if self.history is None:
+            return None
+        try:
+            snapshot = self.history.load(job_id)
+        except Exception:
+            return None
+        if snapshot is not None:
+            with self._lock:
+                self._counters["history_hits"] += 1
+        return snapshot
+
+    def active_ids(self) -> List[str]:
+        with self._lock:
+            return [job_id for job_id, job in self._jobs.items() if job.state not in TERMINAL_STATES]
+
+    # -- cancel flags --
+
+    def request_cancel(self, job_id: str) -> bool:
+        with self._lock:
+            if job_id in self._jobs:
+                self._cancel_flags[job_id] = True
+                return True
+        return False
+
+    def is_cancelled(self, job_id: str) -> bool:
+        with self._lock:
+            return self._cancel_flags.get(job_id, False)
+
+    # -- eviction --
+
+    def _evict_locked(self, now: float) -> List[str]:
+        """Drop expired finished jobs, then the oldest finished ones above the cap."""
+        evicted = []
+        over = len(self._jobs) - self.max_in_memory
+        for job_id, job in list(self._jobs.items()):
+            if job.state not in TERMINAL_STATES:
+                continue
+            expired = self.ttl_seconds and job.ended_at and now - job.ended_at > self.ttl_seconds
+            if expired or over > 0:
+                del self._jobs[job_id]
+                self._cancel_flags.pop(job_id, None)
+                evicted.append(job_id)
+                over -= 1
+        self._counters["evicted"] += len(evicted)
+        return evicted
+
+    def _notify_evicted(self, job_ids: Iterable[str]) -> None:
+        if self._on_evict is None:
+            return
+        for job_id in job_ids:
+            try:
+                self._on_evict(job_id)
+            except Exception:
+                pass
+
+    def sweep(self) -> int:
+        """TTL pass; call periodically. Returns the number of evicted jobs."""
+        with self._lock:
+            evicted = self._evict_locked(time.time())
+        self._notify_evicted(evicted)
+        return len(evicted)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            states: Dict[str, int] = {}
+            for job in self._jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            in_memory = len(self._jobs)
+            counters = dict(self._counters)
+        return {
+            "in_memory": in_memory,
+            "max_in_memory": self.max_in_memory,
+            "ttl_seconds": self.ttl_seconds,
+            "states": states,
+            "history": self.history.path if self.history else None,
+            **counters,
+        }
+
+
+# ----------------------------
+# Artifact retention
+# ----------------------------
+
+def _entry_size_and_mtime(path: str) -> Tuple[int, float]:
+    if not os.path.isdir(path):
+        st = os.stat(path)
+        return st.st_size, st.st_mtime
+    size, mtime = 0, os.stat(path).st_mtime
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            size += st.st_size
+            mtime = max(mtime, st.st_mtime)
+    return size, mtime
+
+
+def prune_artifacts(
+    root: str,
+    max_age_seconds: float = 0,
+    max_total_bytes: int = 0,
+    keep: Iterable[str] = (),
+) -> Dict[str, int]:
+    """Delete entries (per-job dirs or files) directly under root.
+
+    First everything older than max_age_seconds, then the oldest entries until
+    the total is at most max_total_bytes. Entries of the job ids in `keep`
+    (active jobs) are never touched: the id itself and anything named
+    "<id>_..." (a session log and its rotations). 0 disables a limit.
+    """
+    keep = set(keep)
+    keep_prefixes = tuple(f"{job_id}_" for job_id in keep)
+    entries = []
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return {"removed": 0, "freed_bytes": 0, "total_bytes": 0}
+    for name in names:
+        if name in keep or name.startswith(keep_prefixes) or name.startswith("."):
+            continue
+        path = os.path.join(root, name)
+        try:
+            size, mtime = _entry_size_and_mtime(path)
+        except OSError:
+            continue
+        entries.append((mtime, size, path))
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    now = time.time()
+    removed = freed = 0
+    for mtime, size, path in entries:
+        too_old = max_age_seconds and now - mtime > max_age_seconds
+        too_big = max_total_bytes and total > max_total_bytes
+        if not (too_old or too_big):
+            continue
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError:
+            continue
+        removed += 1
+        freed += size
+        total -= size
+    return {"removed": removed, "freed_bytes": freed, "total_bytes": total}
+
+
+def job_store_from_env(history_path: str, on_evict: Optional[Callable[[str], None]] = None) -> JobStore:
+    history = None
+    if is_truthy(os.environ.get("SKV_JOB_HISTORY", "y")):
+        try:
+            history = SqliteJobHistory(history_path)
+        except Exception as e:
+            print(f"Job history disabled: {e}")
+    return JobStore(
+        max_in_memory=int(os.environ.get("SKV_JOB_MAX_IN_MEMORY", DEFAULT_MAX_IN_MEMORY)),
+        ttl_seconds=float(os.environ.get("SKV_JOB_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+        history=history,
+        on_evict=on_evict,
+    )
+
+
+def retention_from_env() -> Dict[str, float]:
+    """Artifact/history retention limits in seconds and bytes."""
+    days = float(os.environ.get("SKV_RESULTS_MAX_AGE_DAYS", DEFAULT_RESULTS_MAX_AGE_DAYS))
+    mb = float(os.environ.get("SKV_RESULTS_MAX_MB", DEFAULT_RESULTS_MAX_MB))
+    history_days = float(os.environ.get("SKV_JOB_HISTORY_DAYS", DEFAULT_HISTORY_DAYS))
+    return {
+        "results_max_age_seconds": days * 86400,
+        "results_max_bytes": int(mb * 1024 * 1024),
+        "history_max_age_seconds": history_days * 86400,
+    }
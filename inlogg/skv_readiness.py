@@ -0,0 +1,238 @@
+"""
+skv_readiness.py - Event-driven form readiness detection.
+
+Instead of re-checking every tab once per second, the job waits on a
+FormReadinessWatcher that wakes as soon as something relevant happens:
+
+  - flytt_api   secure /folkbokforing/flyttanmalan/ response (fed from on_response)
+  - page        a new tab/popup in the context (context.on("page"))
+  - navigated   main-frame navigation in any tab (page.on("framenavigated"))
+  - dom         #fbfFlyttanmalanForm or the active wizard step appeared, in
+                the light DOM or any shadow root, on a flytt URL (also after
+                client-side history navigation); reported via expose_binding
+
+The same attach() installs the shadow-DOM index (skv_shadow_index), so the
+per-check probe is a lookup instead of a walk over every shadow root.
+
+The readiness decision itself is unchanged (skv_core.is_form_ready_from_signals
+plus two consecutive positive checks); only the waiting between checks is
+event-driven. Sync Playwright only dispatches events while a Playwright call
+is in progress, so waits pump the driver with short page.wait_for_timeout
+slices rather than time.sleep.
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from skv_shadow_index import SHADOW_INDEX_JS
+
+
+BINDING_NAME = "__skvFormSignal"
+
+# Signals that mean "the form may be there now" (vs. plain wake-up hints).
+FORM_SIGNAL_KINDS = ("dom", "flytt_api")
+
+# Registered with context.add_init_script after SHADOW_INDEX_JS; runs in every
+# document of the context. It arms only on flytt URLs, and again after
+# history.pushState/replaceState, popstate and hashchange, so a single-page
+# app that routes to the flyttanmälan without a navigation is still seen.
+# Changes are taken from the shadow index (every shadow root); without it a
+# light-DOM MutationObserver is the fallback.
+READINESS_OBSERVER_JS = """
+(() => {
+  if (window.__skvReadyObserver) return;
+  window.__skvReadyObserver = true;
+  const onFlytt = () => /flytt/i.test(location.href);
+  let lastKey = '';
+  let armed = false;
+  const check = () => {
+    if (!onFlytt()) return;
+    const idx = window.__skvIndex;
+    const hasForm = idx ? idx.has('form') : !!document.getElementById('fbfFlyttanmalanForm');
+    const hasActive = idx ? idx.has('active')
+      : !!document.querySelector('.flytt-skv-wizard-step--active, .flytt-skv-wizard-step--check');
+    const key = (hasForm ? 'form' : '') + (hasActive ? '+active' : '');
+    if (key && key !== lastKey) {
+      lastKey = key;
+      try { window.%(binding)s && window.%(binding)s(key); } catch (e) {}
+    }
+  };
+  const arm = () => {
+    if (!onFlytt()) { lastKey = ''; return; }
+    if (!armed) {
+      const idx = window.__skvIndex;
+      if (idx && idx.subscribe) {
+        idx.subscribe(check);
+      } else if (document.documentElement) {
+        new MutationObserver(check).observe(document.documentElement, {
+          childList: true, subtree: true, attributes: true, attributeFilter: ['class'],
+        });
+      } else {
+        document.addEventListener('DOMContentLoaded', arm, { once: true });
+        return;
+      }
+      armed = true;
+    }
+    check();
+  };
+  for (const name of ['pushState', 'replaceState']) {
+    const orig = history[name];
+    history[name] = function () {
+      const result = orig.apply(this, arguments);
+      try { arm(); } catch (e) {}
+      return result;
+    };
+  }
+  window.addEventListener('popstate', arm);
+  window.addEventListener('hashchange', arm);
+  arm();
+})();
+""" % {"binding": BINDING_NAME}
+
+# How long to wait for an event before doing a safety re-check anyway.
+FALLBACK_CHECK_SECONDS = 2.0
+# Delay before the confirming (second) positive check of the debounce.
+CONFIRM_DELAY_SECONDS = 0.25
+# Granularity of the driver pump while waiting.
+PUMP_SLICE_MS = 50
+
+
+class FormReadinessWatcher:
+    def __init__(self, context, log=None) -> None:
+        self.context = context
+        self._log = log
+        self._dirty = False
+        self.counts: Dict[str, int] = {}
+        self.first_signal_kind: Optional[str] = None
+        self.first_signal_at: Optional[float] = None
+        self.detected_at: Optional[float] = None
+        self.fill_started_at: Optional[float] = None
+        self.checks = 0
+
+    # -- wiring --
+
+    def attach(self) -> "FormReadinessWatcher":
+        """Install binding, observer script and page listeners. Call before the first page opens."""
+        try:
+            self.context.expose_binding(BINDING_NAME, lambda source, key: self.signal("dom", key))
+            self.context.add_init_script(SHADOW_INDEX_JS)
+            self.context.add_init_script(READINESS_OBSERVER_JS)
+        except Exception as e:
+            if self._log:
+                self._log(f"Readiness observer unavailable: {e}", "FORM_WAIT")
+        self.context.on("page", self._on_page)
+        for p in list(self.context.pages):
+            self._watch_page(p)
+        return self
+
+    def _on_page(self, page) -> None:
+        self._watch_page(page)
+        self.signal("page", "")
+
+    def _watch_page(self, page) -> None:
+        def on_nav(frame) -> None:
+            try:
+                if frame == page.main_frame:
+                    self.signal("navigated", frame.url)
+            except Exception:
+                pass
+
+        page.on("framenavigated", on_nav)
+
+    # -- signals --
+
+    def signal(self, kind: str, detail: str = "") -> None:
+        self._dirty = True
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        if kind in FORM_SIGNAL_KINDS and self.first_signal_at is None:
+            self.first_signal_at = time.time()
+            self.first_signal_kind = kind
+            if self._log:
+                self._log(f"First form signal: {kind}", "FORM_WAIT", {"detail": str(detail)[:120]})
+
+    def wait(self, page, max_seconds: float) -> bool:
+        """Pump Playwright until a signal arrives or max_seconds pass. Returns True if signalled."""
+        deadline = time.time() + max(0.0, max_seconds)
+        while not self._dirty:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            slice_ms = min(PUMP_SLICE_MS, remaining * 1000)
+            try:
+                pump = page if page is not None and not page.is_closed() else self._any_open_page()
+                if pump is None:
+                    time.sleep(slice_ms / 1000)
+                else:
+                    pump.wait_for_timeout(slice_ms)
+            except Exception:
+                time.sleep(slice_ms / 1000)
+        signalled = self._dirty
+        self._dirty = False
+        self.checks += 1
+        return signalled
+
+    def _any_open_page(self):
+        try:
+            for p in self.context.pages:
+                if not p.is_closed():
+                    return p
+        except Exception:
+            pass
+        return None
+
+    # -- timing --
+
+    def mark_detected(self) -> None:
+        self.detected_at = time.time()
+
+    def mark_fill_started(self) -> None:
+        self.fill_started_at = time.time()
+
+    def timings(self) -> Dict[str, Any]:
+        def _ms(a: Optional[float], b: Optional[float]) -> Optional[int]:
+            return int((b - a) * 1000) if a is not None and b is not None else None
+
+        return {
+            "first_signal": self.first_signal_kind,
+            "signal_to_detect_ms": _ms(self.first_signal_at, self.detected_at),
+            "signal_to_fill_ms": _ms(self.first_signal_at, self.fill_started_at),
+            "checks": self.checks,
+            "signals": dict(self.counts),
+        }
+
+
+class AsyncFormReadinessWatcher(FormReadinessWatcher):
+    """Same signals for playwright.async_api contexts; waits on an asyncio.Event."""
+
+    def __init__(self, context, log=None) -> None:
+        super().__init__(context, log)
+        self._event = asyncio.Event()
+
+    async def attach(self) -> "AsyncFormReadinessWatcher":
+        try:
+            await self.context.expose_binding(BINDING_NAME, lambda source, key: self.signal("dom", key))
+            await self.context.add_init_script(SHADOW_INDEX_JS)
+            await self.context.add_init_script(READINESS_OBSERVER_JS)
+        except Exception as e:
+            if self._log:
+                self._log(f"Readiness observer unavailable: {e}", "FORM_WAIT")
+        self.context.on("page", self._on_page)
+        for p in list(self.context.pages):
+            self._watch_page(p)
+        return self
+
+    def signal(self, kind: str, detail: str = "") -> None:
+        super().signal(kind, detail)
+        self._event.set()
+
+    async def wait(self, page, max_seconds: float) -> bool:
+        """Sleep until a signal arrives or max_seconds pass. Returns True if signalled."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=max(0.0, max_seconds))
+        except asyncio.TimeoutError:
+            pass
+        signalled = self._dirty
+        self._dirty = False
+        self._event.clear()
+        self.checks += 1
+        return signalled
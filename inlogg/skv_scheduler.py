@@ -0,0 +1,203 @@
+"""
+skv_scheduler.py - Bounded job scheduler with admission control.
+
+A fixed number of worker threads take jobs from a FIFO queue of bounded
+depth. When the queue is full, submit() raises QueueFull with a suggested
+retry delay so the HTTP layer can answer 429 + Retry-After. Queue positions
+and estimated start times are pushed to a callback whenever the queue moves.
+
+`workers` is the number of jobs that may run at once. A job fn that returns a
+concurrent.futures.Future (the async engine's jobs, which run on its event
+loop) keeps its slot until the future is done, but hands its worker thread
+back right away; only jobs that run in the calling thread hold a thread.
+
+Environment:
+  SKV_SCHEDULER_WORKERS      - Concurrent jobs (default: browser pool size)
+  SKV_SCHEDULER_QUEUE_DEPTH  - Max waiting jobs before 429 (default 10)
+"""
+import heapq
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+
+DEFAULT_QUEUE_DEPTH = 10
+# Used for ETA until a few real jobs have finished (QR login dominates job time).
+DEFAULT_JOB_SECONDS = 120.0
+DURATION_WINDOW = 20
+
+
+class QueueFull(Exception):
+    """Raised by submit() when the waiting queue is at capacity."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"job queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+# Callback: list of (job_id, position (1-based), estimated_start_at epoch seconds)
+PositionCallback = Callable[[List[Tuple[str, int, float]]], None]
+
+
+class JobScheduler:
+    def __init__(
+        self,
+        workers: int,
+        queue_depth: int = DEFAULT_QUEUE_DEPTH,
+        on_positions: Optional[PositionCallback] = None,
+    ) -> None:
+        self.workers = max(1, int(workers))
+        self.queue_depth = max(0, int(queue_depth))
+        self._on_positions = on_positions
+        self._queue: Deque[Tuple[str, Callable[[], Any]]] = deque()
+        self._running: Dict[str, float] = {}
+        self._durations: Deque[float] = deque(maxlen=DURATION_WINDOW)
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._started = False
+        self._counters = {"admitted": 0, "rejected": 0, "completed": 0, "failed": 0, "cancelled_queued": 0}
+
+    # -- lifecycle --
+
+    def start(self) -> "JobScheduler":
+        with self._cond:
+            if self._started:
+                return self
+            self._started = True
+            self._threads = [
+                threading.Thread(target=self._worker, name=f"skv-job-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for t in self._threads:
+            t.start()
+        return self
+
+    # -- admission --
+
+    def submit(self, job_id: str, fn: Callable[[], Any]) -> Tuple[int, float]:
+        """Queue fn. Returns (position, estimated_start_at). Raises QueueFull."""
+        self.start()
+        with self._cond:
+            free_now = len(self._running) < self.workers and not self._queue
+            if not free_now and len(self._queue) >= self.queue_depth:
+                self._counters["rejected"] += 1
+                etas = self._estimate_locked(len(self._queue) + 1)
+                raise QueueFull(max(1, math.ceil(etas[-1] - time.time())))
+            self._queue.append((job_id, fn))
+            self._counters["admitted"] += 1
+            positions = self._positions_locked()
+            self._cond.notify()
+        self._publish(positions)
+        for jid, pos, eta in positions:
+            if jid == job_id:
+                return pos, eta
+        # Already picked up by a worker.
+        return 0, time.time()
+
+    def cancel_queued(self, job_id: str) -> bool:
+        """Remove a job that has not started yet. Returns True if it was queued."""
+        with self._cond:
+            for i, (jid, _) in enumerate(self._queue):
+                if jid == job_id:
+                    del self._queue[i]
+                    self._counters["cancelled_queued"] += 1
+                    positions = self._positions_locked()
+                    break
+            else:
+                return False
+        self._publish(positions)
+        return True
+
+    # -- estimates --
+
+    def _avg_duration_locked(self) -> float:
+        if not self._durations:
+            return DEFAULT_JOB_SECONDS
+        return sum(self._durations) / len(self._durations)
+
+    def _estimate_locked(self, count: int) -> List[float]:
+        """Estimated start times for the next `count` queue positions."""
+        now = time.time()
+        avg = self._avg_duration_locked()
+        free_at = [now + max(0.0, avg - (now - started)) for started in self._running.values()]
+        free_at += [now] * (self.workers - len(free_at))
+        heapq.heapify(free_at)
+        out = []
+        for _ in range(count):
+            t = heapq.heappop(free_at)
+            out.append(t)
+            heapq.heappush(free_at, t + avg)
+        return out
+
+    def _positions_locked(self) -> List[Tuple[str, int, float]]:
+        etas = self._estimate_locked(len(self._queue))
+        return [(jid, i + 1, round(etas[i], 1)) for i, (jid, _) in enumerate(self._queue)]
+
+    def _publish(self, positions: List[Tuple[str, int, float]]) -> None:
+        if self._on_positions and positions:
+            try:
+                self._on_positions(positions)
+            except Exception as e:
+                print(f"Scheduler position callback error: {e}")
+
+    # -- workers --
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue or len(self._running) >= self.workers:
+                    self._cond.wait()
+                job_id, fn = self._queue.popleft()
+                self._running[job_id] = time.time()
+                positions = self._positions_locked()
+            self._publish(positions)
+
+            try:
+                result = fn()
+            except Exception as e:
+                self._finished(job_id, e)
+                continue
+            if isinstance(result, Future):
+                result.add_done_callback(lambda f, jid=job_id: self._finished(jid, _future_error(f)))
+            else:
+                self._finished(job_id, None)
+
+    def _finished(self, job_id: str, error: Optional[BaseException]) -> None:
+        if error is not None:
+            print(f"Scheduled job {job_id} raised: {error}")
+        with self._cond:
+            started = self._running.pop(job_id, time.time())
+            self._durations.append(time.time() - started)
+            self._counters["failed" if error is not None else "completed"] += 1
+            positions = self._positions_locked()
+            self._cond.notify()
+        self._publish(positions)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "running": len(self._running),
+                "queued": len(self._queue),
+                "avg_job_seconds": round(self._avg_duration_locked(), 1),
+                **self._counters,
+            }
+
+
+def _future_error(fut: Future) -> Optional[BaseException]:
+    if fut.cancelled():
+        return RuntimeError("cancelled")
+    return fut.exception()
+
+
+def scheduler_from_env(default_workers: int, on_positions: Optional[PositionCallback] = None) -> JobScheduler:
+    return JobScheduler(
+        workers=int(os.environ.get("SKV_SCHEDULER_WORKERS", default_workers)),
+        queue_depth=int(os.environ.get("SKV_SCHEDULER_QUEUE_DEPTH", DEFAULT_QUEUE_DEPTH)),
+        on_positions=on_positions,
+    )
@@ -0,0 +1,160 @@
+"""
+skv_selector_stats.py - Learned ordering of click-sequence selectors.
+
+Every click race (skv_clicks) tells us which selector won and how long the
+step took to get there (gate wait + race). SelectorStats keeps, per flow
+step (skv_flow.ClickStep.key) and selector, a decayed hit rate and
+time-to-click, persists them to a small JSON file, and orders the next
+job's selectors by expected latency. The engine only asks for that order on
+steps whose selectors do not overlap (skv_flow.ClickStep.learn_order): the
+race clicks the first visible selector, so elsewhere the order would change
+which element is clicked, not just how fast.
+
+What a race tells us per selector:
+  winner                  hit, time-to-click = gate wait + race time
+  listed before winner    miss (it was not visible when the winner was)
+  listed after winner     nothing (never looked at)
+  no winner               miss for every selector
+
+Counters decay by DECAY per observation, so old outcomes fade. The JSON
+file is written at most every SAVE_INTERVAL_SECONDS from record(); flush()
+(housekeeping, engine shutdown) writes whatever is still pending.
+
+Environment:
+  SKV_SELECTOR_LEARNING    - n = keep the configured order (default y)
+  SKV_SELECTOR_STATS_FILE  - JSON file (default runtime/selector_stats.json)
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from skv_core import is_truthy
+
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STATS_FILE = os.path.join(SCRIPT_DIR, "runtime", "selector_stats.json")
+
+# Weight of the history on each new observation (0.7 ~ last 3-4 runs dominate).
+DECAY = 0.7
+# Prior for selectors with no data: one virtual attempt at this hit rate.
+PRIOR_HIT_RATE = 0.5
+# Latency charged for a miss when ranking (roughly one gate bound + race timeout).
+MISS_PENALTY_MS = 8000.0
+# Minimum time between two writes of the stats file from record().
+SAVE_INTERVAL_SECONDS = 60.0
+
+
+def _new_entry() -> Dict[str, float]:
+    return {"attempts": 0.0, "hits": 0.0, "ms": 0.0, "last_hit_at": 0.0, "runs": 0}
+
+
+class SelectorStats:
+    def __init__(self, path: str, enabled: bool = True) -> None:
+        self.path = path
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, Dict[str, float]]] = self._load()
+        self._dirty = False
+        self._saved_at = 0.0
+        self.reorders = 0
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_locked(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        except OSError as e:
+            print(f"Selector stats not saved: {e}")
+
+    @staticmethod
+    def expected_ms(entry: Optional[Dict[str, float]]) -> float:
+        """Expected time-to-click: avg hit time + miss probability * MISS_PENALTY_MS."""
+        entry = entry or _new_entry()
+        attempts = entry["attempts"] + 1.0
+        hit_rate = (entry["hits"] + PRIOR_HIT_RATE) / attempts
+        return entry["ms"] + (1.0 - hit_rate) * MISS_PENALTY_MS
+
+    def order(self, step: str, selectors: Optional[List[str]]) -> List[str]:
+        """selectors sorted by expected latency; ties keep the configured order."""
+        sels = list(selectors or [])
+        if not self.enabled or len(sels) < 2:
+            return sels
+        with self._lock:
+            seq = self._data.get(step, {})
+            ranked = sorted(range(len(sels)), key=lambda i: (self.expected_ms(seq.get(sels[i])), i))
+            ordered = [sels[i] for i in ranked]
+            if ordered != sels:
+                self.reorders += 1
+        return ordered
+
+    def record(self, step: str, selectors: List[str], winner: Optional[str], time_to_click_ms: int) -> None:
+        """Learn from one race over selectors (in the order it was run)."""
+        if not self.enabled or not selectors:
+            return
+        with self._lock:
+            seq = self._data.setdefault(step, {})
+            for sel in selectors:
+                entry = seq.setdefault(sel, _new_entry())
+                hit = sel == winner
+                entry["attempts"] = entry["attempts"] * DECAY + 1.0
+                entry["hits"] = entry["hits"] * DECAY + (1.0 if hit else 0.0)
+                entry["runs"] = int(entry.get("runs", 0)) + 1
+                if hit:
+                    entry["ms"] = float(time_to_click_ms) if not entry["last_hit_at"] else entry["ms"] * DECAY + time_to_click_ms * (1 - DECAY)
+                    entry["last_hit_at"] = time.time()
+                    break  # selectors after the winner were never looked at
+            self._dirty = True
+            if time.monotonic() - self._saved_at >= SAVE_INTERVAL_SECONDS:
+                self._save_locked()
+
+    def flush(self) -> None:
+        """Write pending observations to the stats file."""
+        with self._lock:
+            if self._dirty:
+                self._save_locked()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = {
+                key: {
+                    sel: {
+                        "hit_rate": round(e["hits"] / e["attempts"], 3) if e["attempts"] else None,
+                        "time_to_click_ms": round(e["ms"]),
+                        "expected_ms": round(self.expected_ms(e)),
+                        "runs": e.get("runs", 0),
+                        "last_hit_at": e["last_hit_at"] or None,
+                    }
+                    for sel, e in entries.items()
+                }
+                for key, entries in self._data.items()
+            }
+        return {"enabled": self.enabled, "path": self.path, "reorders": self.reorders, "steps": steps}
+
+
+_stats: Optional[SelectorStats] = None
+_stats_lock = threading.Lock()
+
+
+def get_selector_stats() -> SelectorStats:
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = SelectorStats(
+                os.environ.get("SKV_SELECTOR_STATS_FILE") or DEFAULT_STATS_FILE,
+                enabled=is_truthy(os.environ.get("SKV_SELECTOR_LEARNING", "y")),
+            )
+        return _stats
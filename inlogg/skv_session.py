@@ -0,0 +1,108 @@
+"""
+skv_session.py - Per-job session state for concurrent BankID sessions.
+
+Each job owns its captured BankID/QR state (aid, autostart token, flytt API
+readiness), its own session log file and its own artifact directory, so
+several sessions can run side by side in one process without clearing or
+overwriting each other. Log records go through the buffered JSONL writer in
+skv_joblog, so logging never blocks the caller on disk I/O.
+"""
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from skv_joblog import get_job_log_writer
+
+
+class JobSession:
+    def __init__(self, job_id: str, log_dir: str, artifact_root: str) -> None:
+        self.job_id = job_id
+        self._writer = get_job_log_writer(log_dir)
+        self.log_file = self._writer.path_for(job_id)
+        self.artifact_dir = os.path.join(artifact_root, job_id)
+        self._capture: Dict[str, Any] = {}
+        self._capture_lock = threading.Lock()
+        os.makedirs(self.artifact_dir, exist_ok=True)
+
+    # -- captured BankID/QR state --
+
+    def update_capture(self, **values: Any) -> None:
+        with self._capture_lock:
+            self._capture.update(values)
+
+    def mark_flytt_api_ready(self, url: str) -> bool:
+        """Record the logged-in flytt API signal. Returns True the first time it is seen."""
+        with self._capture_lock:
+            first_seen = not self._capture.get("flytt_api_ready")
+            self._capture["flytt_api_ready"] = True
+            self._capture["flytt_api_last_url"] = url
+        return first_seen
+
+    def capture(self) -> Dict[str, Any]:
+        """Snapshot copy of the captured state."""
+        with self._capture_lock:
+            return dict(self._capture)
+
+    @property
+    def api_ready(self) -> bool:
+        with self._capture_lock:
+            return bool(self._capture.get("flytt_api_ready"))
+
+    # -- log sink --
+
+    def write_header(self) -> None:
+        """Queue the START record that opens this job's log."""
+        self.log("FLYTTANMÄLAN SESSION", "START", {"job_id": self.job_id})
+
+    def log(self, msg: str, section: str = "", data: Optional[dict] = None) -> None:
+        """Queue a structured record for this job's JSONL log. Never blocks on disk."""
+        self._writer.emit(self.job_id, msg, section, data or None)
+
+    @property
+    def log_dropped(self) -> int:
+        """Records dropped because the log queue was full."""
+        return self._writer.dropped_for(self.job_id)
+
+    def close_log(self) -> None:
+        self._writer.close_job(self.job_id)
+
+    def log_qr(self, label: str, data: str | dict) -> None:
+        """Append QR/BankID-related data to the session log."""
+        payload = data if isinstance(data, dict) else {"msg": str(data)}
+        self.log(label, "QR/AUTH", payload)
+
+    # -- artifacts --
+
+    def artifact_path(self, name: str) -> str:
+        return os.path.join(self.artifact_dir, name)
+
+    def artifact_url_path(self, name: str) -> str:
+        """Path relative to the results root (as served by /results/<path>)."""
+        return f"{self.job_id}/{name}"
+
+
+_sessions: Dict[str, JobSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def open_session(job_id: str, log_dir: str, artifact_root: str) -> JobSession:
+    """Create (or return) the session for job_id."""
+    with _sessions_lock:
+        session = _sessions.get(job_id)
+        if session is None:
+            session = JobSession(job_id, log_dir, artifact_root)
+            _sessions[job_id] = session
+        return session
+
+
+def get_session(job_id: str) -> Optional[JobSession]:
+    with _sessions_lock:
+        return _sessions.get(job_id)
+
+
+def close_session(job_id: str) -> None:
+    """Forget in-memory state for a finished job. Log and artifacts stay on disk."""
+    with _sessions_lock:
+        session = _sessions.pop(job_id, None)
+    if session is not None:
+        session.close_log()
@@ -0,0 +1,161 @@
+"""
+skv_settings.py - Typed job settings from config.txt, environment and per-job overrides.
+
+Precedence (last wins): field default < config.txt < environment < per-job
+override. get_settings() is called once when a job starts; the job then only
+reads attributes of the frozen SkvSettings it got, so the flow itself never
+touches the filesystem or os.environ for configuration.
+
+config.txt is re-parsed only when its mtime changes, and its mtime is checked
+at most every CONFIG_CHECK_SECONDS. Environment values are re-read on each
+get_settings() call (an in-memory lookup), so a caller that sets SKV_* before
+starting a job still sees them. A variable that is set but empty counts as set
+(false / empty string, e.g. SKV_ALLOW_MOCKUP_DATA= turns mockup data off);
+only unset variables fall through to config.txt. Callers that run several jobs in one process
+with different options must not do that: they build one SkvSettings per run
+(get_settings(overrides)) and pass it to skv_engine._run_playwright_job.
+
+Fields (config key / env var):
+  popup_browser_normal_window    POPUP_BROWSER_NORMAL_WINDOW / SKV_POPUP_BROWSER_NORMAL_WINDOW
+  disable_normal_browser_window  - / SKV_DISABLE_NORMAL_BROWSER_WINDOW
+  clone_tab_fallback             CLONE_TAB_FALLBACK / SKV_CLONE_TAB_FALLBACK
+  force_clone_tab_fallback       - / SKV_FORCE_CLONE_TAB_FALLBACK
+  synligt_skv                    - / SKV_SYNLIGT_SKV
+  payload_file                   - / SKV_PAYLOAD_FILE
+  allow_mockup_data              - / SKV_ALLOW_MOCKUP_DATA (default y)
+  fast_fill                      FAST_FILL / SKV_FAST_FILL (one-evaluate form fill, default n)
+"""
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Any, Dict, Optional, Tuple
+
+from skv_core import is_truthy, load_config
+
+
+CONFIG_CHECK_SECONDS = 2.0
+
+
+@dataclass(frozen=True)
+class SkvSettings:
+    popup_browser_normal_window: bool = False
+    disable_normal_browser_window: bool = False
+    clone_tab_fallback: bool = False
+    force_clone_tab_fallback: bool = False
+    synligt_skv: bool = False
+    payload_file: str = ""
+    allow_mockup_data: bool = True
+    fast_fill: bool = False
+
+    @property
+    def open_normal_browser_window(self) -> bool:
+        return self.popup_browser_normal_window and not self.disable_normal_browser_window
+
+    @property
+    def clone_enabled(self) -> bool:
+        return self.force_clone_tab_fallback or self.clone_tab_fallback
+
+    def with_overrides(self, overrides: Optional[Dict[str, Any]]) -> "SkvSettings":
+        """Copy with per-job overrides applied. Raises ValueError on unknown keys."""
+        if not overrides:
+            return self
+        return replace(self, **_coerce_all(overrides))
+
+
+# field -> (config.txt key, environment variable)
+_SOURCES: Dict[str, Tuple[Optional[str], Optional[str]]] = {
+    "popup_browser_normal_window": ("POPUP_BROWSER_NORMAL_WINDOW", "SKV_POPUP_BROWSER_NORMAL_WINDOW"),
+    "disable_normal_browser_window": (None, "SKV_DISABLE_NORMAL_BROWSER_WINDOW"),
+    "clone_tab_fallback": ("CLONE_TAB_FALLBACK", "SKV_CLONE_TAB_FALLBACK"),
+    "force_clone_tab_fallback": (None, "SKV_FORCE_CLONE_TAB_FALLBACK"),
+    "synligt_skv": (None, "SKV_SYNLIGT_SKV"),
+    "payload_file": (None, "SKV_PAYLOAD_FILE"),
+    "allow_mockup_data": (None, "SKV_ALLOW_MOCKUP_DATA"),
+    "fast_fill": ("FAST_FILL", "SKV_FAST_FILL"),
+}
+
+_FIELD_TYPES = {f.name: f.type for f in fields(SkvSettings)}
+
+
+def _coerce(name: str, value: Any) -> Any:
+    kind = _FIELD_TYPES[name]
+    if kind in (bool, "bool"):
+        return value if isinstance(value, bool) else is_truthy(str(value))
+    return "" if value is None else str(value)
+
+
+def _coerce_all(values: Dict[str, Any]) -> Dict[str, Any]:
+    unknown = sorted(set(values) - set(_FIELD_TYPES))
+    if unknown:
+        raise ValueError(f"Okända inställningar: {', '.join(unknown)}")
+    return {k: _coerce(k, v) for k, v in values.items()}
+
+
+class SettingsStore:
+    def __init__(self, config_file: str, defaults: Optional[Dict[str, Any]] = None) -> None:
+        self.config_file = config_file
+        self._defaults = SkvSettings(**_coerce_all(defaults or {}))
+        self._lock = threading.Lock()
+        self._config: Dict[str, str] = {}
+        self._config_mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._key: Optional[tuple] = None
+        self._settings = self._defaults
+        self._sources: Dict[str, str] = {}
+        self.reloads = 0
+
+    def _refresh_config_locked(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._checked_at < CONFIG_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.config_file).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._config_mtime or force:
+            self._config = load_config(self.config_file) if mtime is not None else {}
+            self._config_mtime = mtime
+            self.reloads += 1
+
+    def get(self) -> SkvSettings:
+        with self._lock:
+            self._refresh_config_locked()
+            env = tuple(os.environ.get(env_key) if env_key else None for _, env_key in _SOURCES.values())
+            key = (self._config_mtime, env)
+            if key != self._key:
+                values: Dict[str, Any] = {}
+                sources: Dict[str, str] = {}
+                for (name, (cfg_key, _env_key)), env_value in zip(_SOURCES.items(), env):
+                    if env_value is not None:
+                        values[name], sources[name] = _coerce(name, env_value), "env"
+                    elif cfg_key and cfg_key in self._config:
+                        values[name], sources[name] = _coerce(name, self._config[cfg_key]), "config"
+                    else:
+                        sources[name] = "default"
+                self._settings = replace(self._defaults, **values)
+                self._sources = sources
+                self._key = key
+            return self._settings
+
+    def describe(self) -> Dict[str, Any]:
+        settings = self.get()
+        with self._lock:
+            return {
+                "effective": asdict(settings),
+                "derived": {
+                    "open_normal_browser_window": settings.open_normal_browser_window,
+                    "clone_enabled": settings.clone_enabled,
+                },
+                "sources": dict(self._sources),
+                "config_file": self.config_file,
+                "config_mtime": self._config_mtime,
+                "reloads": self.reloads,
+            }
+
+    def reload(self) -> SkvSettings:
+        with self._lock:
+            self._refresh_config_locked(force=True)
+            self._key = None
+        return self.get()
@@ -0,0 +1,186 @@
+"""
+skv_shadow_index.py - Live index of form elements across shadow roots.
+
+The Skatteverket wizard is built from skv-* web components, so a readiness
+probe that only walks the DOM has to descend into every shadow root on every
+poll. SHADOW_INDEX_JS is registered with context.add_init_script; it runs at
+document start in every frame, wraps Element.prototype.attachShadow so each
+shadow root (open or closed) is observed as it is created, and keeps small
+sets of the elements the readiness check asks about. Mutations only
+classify the nodes they touch, and a query only looks at those sets.
+subscribe() lets other init scripts (skv_readiness's observer) react to the
+same mutations without a second observer per shadow root.
+
+skv_core.FORM_SIGNALS_JS answers from window.__skvIndex when it was built for
+the same Nästa selector and falls back to the full walker otherwise (pages
+opened before the script was registered, or another selector).
+
+benchmark_page_html builds a synthetic deep-shadow page for
+bench_shadow_index.py, which compares the index with the walker.
+"""
+import json
+
+from skv_core import FORM_NEXT_HOST_SELECTOR
+
+
+_SHADOW_INDEX_TEMPLATE = """
+(() => {
+  if (window.__skvIndex) return;
+  const NEXT_SEL = %(next_sel)s;
+  const FORM_ID = 'fbfFlyttanmalanForm';
+  const STEP_TAG = 'flytt-skv-wizard-step';
+  const ACTIVE_CLASSES = ['flytt-skv-wizard-step--active', 'flytt-skv-wizard-step--check'];
+  const sets = { form: new Set(), step: new Set(), active: new Set(), next: new Set(), button: new Set() };
+  const stats = { roots: 1, mutations: 0, classified: 0 };
+  const listeners = [];
+
+  const matches = (el, sel) => { try { return el.matches(sel); } catch (e) { return false; } };
+  const put = (set, el, yes) => { if (yes) set.add(el); else set.delete(el); };
+
+  function classify(el) {
+    if (el.nodeType !== 1) return;
+    stats.classified++;
+    put(sets.form, el, el.id === FORM_ID);
+    put(sets.step, el, el.localName === STEP_TAG);
+    put(sets.active, el, !!el.classList && ACTIVE_CLASSES.some(c => el.classList.contains(c)));
+    put(sets.next, el, matches(el, NEXT_SEL));
+    put(sets.button, el, el.localName === 'button' || el.getAttribute('role') === 'button');
+  }
+
+  function indexTree(root) {
+    if (root.nodeType === 1) {
+      classify(root);
+      if (root.shadowRoot) watch(root.shadowRoot);
+    }
+    if (!root.querySelectorAll) return;
+    for (const el of root.querySelectorAll('*')) {
+      classify(el);
+      if (el.shadowRoot) watch(el.shadowRoot);
+    }
+  }
+
+  const observer = new MutationObserver((records) => {
+    for (const r of records) {
+      stats.mutations++;
+      if (r.type === 'attributes') classify(r.target);
+      else for (const n of r.addedNodes) indexTree(n);
+    }
+    for (const fn of listeners) { try { fn(); } catch (e) {} }
+  });
+  const watched = new WeakSet();
+  function watch(root) {
+    if (watched.has(root)) return;
+    watched.add(root);
+    if (root !== document) stats.roots++;
+    observer.observe(root, {
+      childList: true, subtree: true, attributes: true,
+      attributeFilter: ['id', 'class', 'role', 'button-type'],
+    });
+    indexTree(root);
+  }
+
+  const origAttach = Element.prototype.attachShadow;
+  Element.prototype.attachShadow = function (init) {
+    const root = origAttach.call(this, init);
+    try { watch(root); } catch (e) {}
+    return root;
+  };
+
+  function live(set) {
+    for (const el of set) {
+      if (el.isConnected) return el;
+      set.delete(el);
+    }
+    return null;
+  }
+
+  function buttonName(el) {
+    const own = (el.getAttribute('aria-label') || el.textContent || '').trim();
+    if (own) return own;
+    // Shadow button whose label is slotted into its host (skv-button > button > slot)
+    const host = el.getRootNode && el.getRootNode().host;
+    return host ? (host.getAttribute('aria-label') || host.textContent || '').trim() : '';
+  }
+
+  function hasNextButton() {
+    for (const el of sets.button) {
+      if (!el.isConnected) { sets.button.delete(el); continue; }
+      if (buttonName(el).toLowerCase().includes('nästa')) return true;
+    }
+    return false;
+  }
+
+  window.__skvIndex = {
+    nextSel: NEXT_SEL,
+    stats,
+    has(kind) { return !!live(sets[kind]); },
+    // fn() runs after every mutation batch in the document or any shadow root.
+    subscribe(fn) { listeners.push(fn); },
+    snapshot() {
+      return {
+        hasForm: !!live(sets.form),
+        hasWizardStep: !!live(sets.step),
+        hasActiveStep: !!live(sets.active),
+        hasNextHost: !!live(sets.next),
+        hasNextButton: hasNextButton(),
+        title: document.title || '',
+        indexed: true,
+      };
+    },
+  };
+  watch(document);
+})();
+"""
+
+
+def shadow_index_script(next_selector: str = FORM_NEXT_HOST_SELECTOR) -> str:
+    """Init script source for the given Nästa host selector."""
+    return _SHADOW_INDEX_TEMPLATE % {"next_sel": json.dumps(next_selector)}
+
+
+SHADOW_INDEX_JS = shadow_index_script()
+
+
+def benchmark_page_html(depth: int = 6, breadth: int = 4, filler: int = 20, next_selector: str = FORM_NEXT_HOST_SELECTOR) -> str:
+    """Synthetic wizard: nested custom elements, each with its own shadow root.
+
+    depth levels of <bench-node>, breadth children each, filler plain divs per
+    shadow root; the form, wizard step and Nästa host sit in the deepest leaf.
+    """
+    host_tag = next_selector.split("[", 1)[0].split(".", 1)[0] or "skv-button-10-0-7"
+    return """<!doctype html>
+<html><head><title>shadow bench</title></head><body>
+<bench-node data-depth="0"></bench-node>
+<script>
+const DEPTH = %(depth)d, BREADTH = %(breadth)d, FILLER = %(filler)d;
+customElements.define('bench-node', class extends HTMLElement {
+  connectedCallback() {
+    if (this.shadowRoot) return;
+    const d = Number(this.dataset.depth || 0);
+    const root = this.attachShadow({ mode: 'open' });
+    for (let i = 0; i < FILLER; i++) {
+      const div = document.createElement('div');
+      div.className = 'filler';
+      div.textContent = 'x' + i;
+      root.appendChild(div);
+    }
+    if (d + 1 < DEPTH) {
+      for (let b = 0; b < BREADTH; b++) {
+        const child = document.createElement('bench-node');
+        child.dataset.depth = String(d + 1);
+        // only one branch carries the real form at the bottom
+        child.dataset.leaf = (this.dataset.leaf !== '0' && b === BREADTH - 1) ? '1' : '0';
+        root.appendChild(child);
+      }
+    } else if (this.dataset.leaf === '1') {
+      root.innerHTML = '<form id="fbfFlyttanmalanForm"><flytt-skv-wizard-step class="flytt-skv-wizard-step--active"></flytt-skv-wizard-step>'
+        + '<%(host_tag)s button-type="primary" class="flytt-skv-wizard-step-button"></%(host_tag)s></form>';
+      const host = root.querySelector('%(host_tag)s');
+      host.textContent = 'Nästa';
+      host.attachShadow({ mode: 'open' }).innerHTML = '<button><slot></slot></button>';
+    }
+  }
+});
+</script>
+</body></html>
+""" % {"depth": depth, "breadth": breadth, "filler": filler, "host_tag": host_tag}
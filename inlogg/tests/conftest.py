@@ -0,0 +1,63 @@
+import pytest
+
+import skv_selector_stats
+from skv_selector_stats import SelectorStats
+
+
+@pytest.fixture(scope="session")
+def browser():
+    """Headless Chromium, or skip when Playwright's browser cannot start here."""
+    try:
+        from playwright.sync_api import sync_playwright
+        pw = sync_playwright().start()
+    except Exception as e:
+        pytest.skip(f"playwright unavailable: {e}")
+    try:
+        b = pw.chromium.launch(headless=True)
+    except Exception as e:
+        pw.stop()
+        pytest.skip(f"chromium unavailable: {(str(e).splitlines() or [''])[0]}")
+    yield b
+    b.close()
+    pw.stop()
+
+
+@pytest.fixture
+def page(browser):
+    context = browser.new_context()
+    yield context.new_page()
+    context.close()
+
+
+@pytest.fixture
+def selector_stats(tmp_path, monkeypatch):
+    """Fresh process-wide SelectorStats backed by tmp_path."""
+    stats = SelectorStats(str(tmp_path / "selector_stats.json"))
+    monkeypatch.setattr(skv_selector_stats, "_stats", stats)
+    return stats
+
+
+class FakeJob:
+    def __init__(self, job_id="job1"):
+        self.job_id = job_id
+        self.state = "running"
+        self.message = ""
+        self.details = {}
+
+
+class FakeSession:
+    def __init__(self):
+        self.logged = []
+
+    def log(self, message, kind="", data=None):
+        self.logged.append((kind, message, data))
+
+
+@pytest.fixture
+def job():
+    return FakeJob()
+
+
+@pytest.fixture
+def session():
+    return FakeSession()
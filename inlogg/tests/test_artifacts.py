@@ -0,0 +1,115 @@
+import gzip
+import os
+import shutil
+import threading
+
+import pytest
+
+from skv_artifacts import GZIP_SUFFIX, HTML_NAME, ArtifactPipeline
+
+
+@pytest.fixture
+def pipeline():
+    p = ArtifactPipeline()
+    yield p
+    p.shutdown()
+
+
+def _store(pipeline, path, data, compress=False):
+    pipeline.submit(path, data, compress=compress)
+    target = path + GZIP_SUFFIX if compress else path
+    assert pipeline.wait_for(target, 5)
+    return target
+
+
+def test_identical_artifacts_are_hard_linked(pipeline, tmp_path):
+    first = _store(pipeline, str(tmp_path / "job1" / "shot.jpg"), b"same bytes")
+    second = _store(pipeline, str(tmp_path / "job2" / "shot.jpg"), b"same bytes")
+    other = _store(pipeline, str(tmp_path / "job3" / "shot.jpg"), b"other bytes")
+
+    assert os.stat(first).st_ino == os.stat(second).st_ino
+    assert os.stat(second).st_nlink == 2
+    assert os.stat(other).st_ino != os.stat(first).st_ino
+    stats = pipeline.stats()
+    assert (stats["written"], stats["deduplicated"], stats["pending"]) == (2, 1, 0)
+
+    # Cleaning up one job must not take the other job's file with it.
+    shutil.rmtree(tmp_path / "job1")
+    with open(second, "rb") as f:
+        assert f.read() == b"same bytes"
+
+
+def test_deleted_original_is_written_again(pipeline, tmp_path):
+    first = _store(pipeline, str(tmp_path / "job1" / "shot.jpg"), b"same bytes")
+    os.remove(first)
+    second = _store(pipeline, str(tmp_path / "job2" / "shot.jpg"), b"same bytes")
+    assert os.stat(second).st_nlink == 1
+    assert pipeline.stats()["written"] == 2 and pipeline.stats()["deduplicated"] == 0
+
+
+def test_compressed_and_plain_copies_are_kept_apart(pipeline, tmp_path):
+    html = b"<html>" + b"x" * 5000 + b"</html>"
+    stored = _store(pipeline, str(tmp_path / "job1" / HTML_NAME), html, compress=True)
+    assert stored.endswith(GZIP_SUFFIX)
+    assert not os.path.exists(str(tmp_path / "job1" / HTML_NAME))
+    with gzip.open(stored, "rb") as f:
+        assert f.read() == html
+
+    # Same bytes uncompressed hash differently and are not linked to the .gz file.
+    plain = _store(pipeline, str(tmp_path / "job2" / HTML_NAME), html)
+    with open(plain, "rb") as f:
+        assert f.read() == html
+    stats = pipeline.stats()
+    assert stats["written"] == 2 and stats["bytes_out"] < stats["bytes_in"]
+
+
+def test_reserved_path_waits_for_submit(pipeline, tmp_path):
+    path = str(tmp_path / "job1" / "shot.jpg")
+    pipeline.reserve(path)
+    assert pipeline.is_pending(path)
+    assert not pipeline.wait_for(path, 0.05)
+
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(pipeline.wait_for(path, 5)))
+    waiter.start()
+    pipeline.submit(path, b"late")
+    waiter.join(5)
+    assert results == [True]
+    assert not pipeline.is_pending(path)
+
+
+def test_abandon_resolves_waiters(pipeline, tmp_path):
+    path = str(tmp_path / "job1" / HTML_NAME) + GZIP_SUFFIX
+    pipeline.reserve(path)
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(pipeline.wait_for(path, 5)))
+    waiter.start()
+    pipeline.abandon(path)
+    waiter.join(5)
+    assert results == [False]
+    assert pipeline.stats()["abandoned"] == 1 and not pipeline.is_pending(path)
+
+
+@pytest.fixture
+def results_app(pipeline, tmp_path, monkeypatch):
+    import skv6
+
+    monkeypatch.setattr(skv6, "RESULT_DIR", str(tmp_path))
+    monkeypatch.setattr(skv6, "get_artifact_pipeline", lambda: pipeline)
+    return skv6.app.test_client()
+
+
+def test_results_serves_gzip_or_inflates(pipeline, tmp_path, results_app):
+    html = b"<html><body>formular</body></html>"
+    _store(pipeline, str(tmp_path / "job1" / HTML_NAME), html, compress=True)
+
+    resp = results_app.get(f"/results/job1/{HTML_NAME}", headers={"Accept-Encoding": "gzip"})
+    assert resp.status_code == 200
+    assert resp.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(resp.get_data()) == html
+    resp.close()
+
+    resp = results_app.get(f"/results/job1/{HTML_NAME}", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in resp.headers
+    assert resp.get_data() == html
+    assert "Accept-Encoding" in resp.headers["Vary"]
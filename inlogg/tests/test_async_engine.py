@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+import pytest
+
+from skv_async_engine import AsyncEngine
+
+
+@pytest.fixture
+def engine():
+    eng = AsyncEngine(max_sessions=2)
+    yield eng
+    eng.shutdown()
+
+
+def test_submit_job_runs_on_done_off_the_loop(engine, monkeypatch):
+    async def fake_run(factory):
+        raise RuntimeError("no browser")
+
+    monkeypatch.setattr(engine, "_run_in_context", fake_run)
+    done = []
+    fut = engine.submit_job(None, None, on_done=lambda error: done.append((error, threading.current_thread().name)))
+    assert fut.result(timeout=5) is None
+    (error, thread), = done
+    assert str(error) == "no browser"
+    assert thread != "skv-async-engine"
+
+
+def test_run_job_raises_without_on_done(engine, monkeypatch):
+    async def fake_run(factory):
+        raise RuntimeError("no browser")
+
+    monkeypatch.setattr(engine, "_run_in_context", fake_run)
+    with pytest.raises(RuntimeError, match="no browser"):
+        engine.run_job(None, None)
+
+
+def test_done_callbacks_run_off_the_loop(engine, monkeypatch):
+    async def fake_run(factory):
+        await asyncio.sleep(0.1)  # callback below is registered before the job ends
+
+    monkeypatch.setattr(engine, "_run_in_context", fake_run)
+    threads = []
+    fut = engine.submit_job(None, None, on_done=lambda error: None)
+    fut.add_done_callback(lambda f: threads.append(threading.current_thread().name))
+    fut.result(timeout=5)
+    assert threads and threads[0] not in ("skv-async-engine", threading.main_thread().name)
@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+import skv_browser_pool
+from skv_browser_pool import BrowserPool, LeaseCancelled, PoolClosed, get_browser_pool
+
+
+@pytest.fixture
+def pool():
+    # Not the session `browser` fixture: sync Playwright on the main thread would
+    # leave a running event loop behind for later asyncio tests.
+    p = BrowserPool(size=1, max_jobs_per_browser=3, headless=True).start()
+    try:
+        p.run(lambda lease: None)
+    except Exception as e:
+        p.shutdown()
+        pytest.skip(f"chromium unavailable: {(str(e).splitlines() or [''])[0]}")
+    yield p
+    p.shutdown()
+
+
+def test_each_job_gets_a_fresh_context_and_browsers_recycle(pool):
+    def job(lease):
+        seen = lease.context.cookies()
+        lease.context.add_cookies([{"name": "sid", "value": "x", "url": "https://skv.test/"}])
+        return lease.browser_job_number, id(lease.browser), seen, len(lease.browser.contexts)
+
+    runs = [pool.run(job) for _ in range(3)]
+
+    assert [r[0] for r in runs] == [2, 3, 1]  # after the fixture's probe job
+    assert runs[0][1] == runs[1][1]  # warm browser reused...
+    assert all(r[2] == [] for r in runs)  # ...but no cookies leak between jobs
+    assert all(r[3] == 1 for r in runs)
+    stats = pool.stats()
+    assert (stats["launches"], stats["recycles"], stats["jobs_total"]) == (2, 1, 4)
+
+
+def test_failed_job_raises_and_dead_browser_is_replaced(pool):
+    def crash(lease):
+        lease.browser.close()
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        pool.run(crash)
+    assert pool.run(lambda lease: lease.browser.is_connected())
+    stats = pool.stats()
+    assert stats["jobs_failed"] == 1 and stats["launches"] == 2
+
+
+def test_cancel_while_waiting_for_a_browser(pool):
+    release = threading.Event()
+    started = threading.Event()
+    blocker = pool.submit(lambda lease: (started.set(), release.wait(5)))
+    assert started.wait(10)
+
+    ran = []
+    with pytest.raises(LeaseCancelled):
+        pool.run(ran.append, cancel_check=lambda: True, poll_seconds=0.05)
+    release.set()
+    blocker.result(5)
+    assert pool.run(lambda lease: lease.slot) == 0
+    assert ran == []
+
+
+def test_shut_down_pool_rejects_jobs_and_is_replaced(monkeypatch):
+    monkeypatch.setattr(skv_browser_pool, "_pool", None)
+    monkeypatch.setenv("SKV_BROWSER_POOL_SIZE", "3")
+    monkeypatch.setenv("SKV_BROWSER_MAX_JOBS", "5")
+    monkeypatch.setenv("SKV_BROWSER_HEADLESS", "y")
+
+    pool = get_browser_pool()
+    assert get_browser_pool() is pool
+    assert (pool.size, pool.max_jobs_per_browser, pool.headless) == (3, 5, True)
+    pool.shutdown()  # never started: no browser is launched
+    with pytest.raises(PoolClosed):
+        pool.submit(lambda lease: None)
+    assert get_browser_pool() is not pool
@@ -0,0 +1,174 @@
+import asyncio
+import re
+
+import pytest
+
+from skv_capture import QR_PAGE_URL_TEMPLATE, ResponseCapture
+
+
+class FakeRequest:
+    def __init__(self, resource_type):
+        self.resource_type = resource_type
+
+
+class FakeResponse:
+    def __init__(self, url, resource_type="document", status=200, body=None):
+        self.url = url
+        self.status = status
+        self.request = FakeRequest(resource_type)
+        self.headers = {"content-type": "application/json"}
+        self._body = body
+
+    def text(self):
+        if self._body is None:
+            raise AssertionError("body fetched for " + self.url)
+        return self._body
+
+
+class AsyncFakeResponse(FakeResponse):
+    async def text(self):
+        return FakeResponse.text(self)
+
+
+class FakeSession:
+    def __init__(self):
+        self.captured = {}
+        self.qr_log = []
+        self.api_ready = []
+
+    def update_capture(self, **kwargs):
+        self.captured.update(kwargs)
+
+    def capture(self):
+        return dict(self.captured)
+
+    def mark_flytt_api_ready(self, url):
+        self.api_ready.append(url)
+        return len(self.api_ready) == 1
+
+    def log_qr(self, event, data):
+        self.qr_log.append(event)
+
+
+class FakeReadiness:
+    def __init__(self):
+        self.signals = []
+
+    def signal(self, name, detail):
+        self.signals.append(name)
+
+
+@pytest.fixture
+def capture(monkeypatch):
+    monkeypatch.delenv("SKV_CAPTURE_LOG_BODIES", raising=False)
+    return ResponseCapture(FakeSession(), FakeReadiness())
+
+
+@pytest.mark.parametrize("url, counter", [
+    ("https://www.skatteverket.se/logo.png", "skipped_gate"),
+    ("https://cdn.example.com/app.js?aid=x", "skipped_gate"),
+    ("https://www.skatteverket.se/privat/index.html?said=1", "skipped_gate"),
+    ("https://www.skatteverket.se/api/v1/news", "skipped_no_hit"),
+])
+def test_rejected_without_side_effects(capture, url, counter):
+    capture.on_response(FakeResponse(url, "document"))
+    assert capture.counters[counter] == 1
+    assert capture.counters["matched"] == 0
+    assert capture.session.captured == {}
+
+
+def test_aid_and_auth_spa_url(capture):
+    url = "https://auth.funktionstjanster.se/web/app/start?foo=1&aid=abc123"
+    capture.on_response(FakeResponse(url, "document"))
+    assert capture.session.captured == {
+        "aid": "abc123",
+        "qr_page_url": QR_PAGE_URL_TEMPLATE.format(aid="abc123"),
+        "auth_spa_url": url,
+    }
+    assert capture.counters["body_fetches"] == 0
+
+
+def test_flytt_api_ready_only_on_200(capture):
+    url = "https://www7.skatteverket.se:443/secure/folkbokforing/flyttanmalan/api/v1/status"
+    capture.on_response(FakeResponse(url, "fetch", status=302))
+    assert capture.session.api_ready == []
+
+    capture.on_response(FakeResponse(url, "fetch"))
+    capture.on_response(FakeResponse(url, "fetch"))
+    assert capture.session.api_ready == [url, url]
+    assert capture.session.qr_log == ["FORM_API_READY"]
+    assert capture.readiness.signals == ["flytt_api", "flytt_api"]
+
+
+def test_autostart_token_fetches_body(capture):
+    capture.session.update_capture(aid="abc")
+    url = "https://auth.funktionstjanster.se/api/getAutostartToken"
+    capture.on_response(FakeResponse(url, "xhr", body='"tok-123"'))
+    assert capture.session.captured["autostart_token"] == "tok-123"
+    assert capture.session.captured["bankid_url"] == "bankid:///?autostarttoken=tok-123&redirect=null"
+    assert capture.counters["body_fetches"] == 1
+
+    capture.on_response(FakeResponse(url, "xhr", status=500))  # no body fetch on errors
+    assert capture.counters["body_fetches"] == 1
+
+
+def test_async_handler(capture):
+    url = "https://auth.funktionstjanster.se/api/getautostarttoken?aid=a1"
+    asyncio.run(capture.on_response_async(AsyncFakeResponse(url, "fetch", body="tok")))
+    assert capture.session.captured["autostart_token"] == "tok"
+    assert capture.session.captured["aid"] == "a1"
+
+
+def test_handler_errors_are_counted(capture):
+    def boom(**kwargs):
+        raise RuntimeError("session closed")
+
+    capture.session.update_capture = boom
+    capture.on_response(FakeResponse("https://auth.funktionstjanster.se/x?aid=1"))
+    stats = capture.finish()
+    assert (stats["errors"], stats["matched"], stats["seen"]) == (1, 1, 1)
+
+
+def _baseline(url, status):
+    """The pre-ResponseCapture on_response rules (skv6, baseline), minus logging."""
+    captured, api_ready = {}, False
+    keywords = ("bankid", "auth", "status", "poll", "collect", "sign", "qr", "session")
+    if any(k in url.lower() for k in keywords) or "api" in url.lower():
+        if "/secure/folkbokforing/flyttanmalan/" in url.lower() and status == 200:
+            api_ready = True
+        if "aid=" in url:
+            m = re.search(r"aid=([^&]+)", url)
+            if m:
+                captured["aid"] = m.group(1)
+                captured["qr_page_url"] = f"https://auth.funktionstjanster.se/id/bankid/qr?aid={m.group(1)}"
+                if "/web/app/" in url and "aid=" in url and not any(x in url.lower() for x in [".svg", ".png", ".jpg", ".ico"]):
+                    captured["auth_spa_url"] = url
+        if "getautostarttoken" in url.lower() and status == 200:
+            captured.update(autostart_token="tok", bankid_url="bankid:///?autostarttoken=tok&redirect=null")
+    return captured, api_ready
+
+
+BASELINE_URLS = [
+    ("https://auth.funktionstjanster.se/web/app/start?foo=1&aid=abc123#x", "document"),
+    ("https://auth.funktionstjanster.se/web/app/logo.svg?aid=abc123", "image"),
+    ("https://auth.funktionstjanster.se/id/bankid/qr?aid=q1", "image"),
+    ("https://auth.funktionstjanster.se/id/bankid/qr?paid=1&aid=q2", "xhr"),
+    ("https://idp.example.org/session/start?aid=ext1", "document"),
+    ("https://www.skatteverket.se/API/getAutostartToken?aid=t1", "fetch"),
+    ("https://auth.funktionstjanster.se/mg-local/auth/ccp11/grp/getautostarttoken", "xhr"),
+    ("https://www7.skatteverket.se/secure/folkbokforing/flyttanmalan/api/v1/status", "fetch"),
+    ("https://www7.skatteverket.se/SECURE/Folkbokforing/Flyttanmalan/api/person", "xhr"),
+    ("https://www7.skatteverket.se/secure/folkbokforing/flyttanmalan/", "document"),
+    ("https://www.skatteverket.se/WEB/APP/x?aid=u1&auth=1", "document"),
+    ("https://www.skatteverket.se/privat/folkbokforing.4.html", "document"),
+    ("https://fonts.example.com/signika.woff2", "font"),
+]
+
+
+@pytest.mark.parametrize("status", [200, 404])
+@pytest.mark.parametrize("url, resource_type", BASELINE_URLS)
+def test_matches_baseline_rules(capture, url, resource_type, status):
+    capture.on_response(FakeResponse(url, resource_type, status=status, body="tok"))
+    expected, api_ready = _baseline(url, status)
+    assert capture.session.captured == expected
+    assert bool(capture.session.api_ready) == api_ready
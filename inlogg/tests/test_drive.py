@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from skv_drive import Blocking, Sleep, call, run_async, run_sync
+
+
+def _inner(x):
+    doubled = yield lambda: x * 2
+    return doubled + 1
+
+
+def _body(log):
+    log.append((yield lambda: "page"))
+    yield Sleep(0)
+    log.append((yield Blocking(lambda a, b: a + b, 2, 3)))
+    try:
+        yield lambda: 1 / 0
+    except ZeroDivisionError:
+        log.append("caught")
+    log.append((yield from call(_inner, 10)))
+    log.append((yield from call(len, "abc")))
+    return "done"
+
+
+def test_run_sync():
+    log = []
+    assert run_sync(_body(log)) == "done"
+    assert log == ["page", 5, "caught", 21, 3]
+
+
+def test_run_async_matches_sync():
+    log = []
+    assert asyncio.run(run_async(_body(log))) == "done"
+    assert log == ["page", 5, "caught", 21, 3]
+
+
+def test_run_async_awaits_calls_and_coroutine_hooks():
+    async def hook(x):
+        return x + 1
+
+    async def page_call():
+        return "awaited"
+
+    def body():
+        a = yield page_call
+        b = yield from call(hook, 1)
+        return a, b
+
+    assert asyncio.run(run_async(body())) == ("awaited", 2)
+
+
+def test_uncaught_error_propagates_and_closes_body():
+    closed = []
+
+    def body():
+        try:
+            yield lambda: 1 / 0
+        finally:
+            closed.append(True)
+
+    with pytest.raises(ZeroDivisionError):
+        run_sync(body())
+    assert closed == [True]
@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+
+import pytest
+
+import skv_engine
+from skv_events import HISTORY_PER_JOB, JobEventBus, parse_last_event_id
+from skv_jobstore import JobStore, SqliteJobHistory
+
+
+def _ids(events):
+    return [seq for seq, _ in events]
+
+
+def test_replay_after_last_event_id():
+    bus = JobEventBus()
+    for i in range(5):
+        bus.publish("j", {"state": "running", "n": i})
+
+    events, final = bus.wait("j", 2, timeout=0)
+    assert _ids(events) == [3, 4, 5]
+    assert json.loads(events[0][1])["n"] == 2
+    assert not final
+    assert bus.wait("j", 5, timeout=0) == ([], False)
+
+
+def test_too_far_behind_or_ahead_gets_latest_snapshot():
+    bus = JobEventBus()
+    for i in range(HISTORY_PER_JOB + 10):
+        bus.publish("j", {"n": i})
+    assert _ids(bus.wait("j", 1, timeout=0)[0]) == [HISTORY_PER_JOB + 10]
+    # Id from an earlier process (higher than anything published here).
+    assert _ids(bus.wait("j", 10_000, timeout=0)[0]) == [HISTORY_PER_JOB + 10]
+
+
+def test_terminal_state_is_not_final():
+    bus = JobEventBus()
+    bus.publish("j", {"state": "matched"})
+    events, final = bus.wait("j", 0, timeout=0)
+    assert _ids(events) == [1] and not final
+    assert not bus.is_final("j")
+
+    bus.publish("j", {"state": "matched", "screenshot_path": "x.png"})
+    bus.publish("j", {"state": "matched", "details": {"capture": {}}}, final=True)
+    events, final = bus.wait("j", 1, timeout=0)
+    assert _ids(events) == [2, 3] and final
+    assert bus.wait("j", 3, timeout=0) == ([], True)
+    assert bus.is_final("j") and bus.is_final("unknown")
+
+
+def test_waiter_wakes_on_publish_and_forget():
+    bus = JobEventBus()
+    bus.publish("j", {"n": 0})
+    results = []
+
+    def waiter():
+        results.append(bus.wait("j", bus.wait("j", 0, timeout=0)[0][-1][0], timeout=5))
+
+    t = threading.Thread(target=waiter)
+    t.start()
+    time.sleep(0.05)
+    bus.publish("j", {"n": 1})
+    t.join(2)
+    assert _ids(results[0][0]) == [2]
+
+    t = threading.Thread(target=waiter)
+    t.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    bus.forget("j")
+    t.join(2)
+    assert time.monotonic() - started < 1
+    assert results[1] == ([], True)
+
+
+def test_parse_last_event_id():
+    assert parse_last_event_id(" 7 ") == 7
+    assert parse_last_event_id("x") == 0
+    assert parse_last_event_id(None) == 0
+    assert parse_last_event_id("-3") == 0
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    import skv6
+
+    history = SqliteJobHistory(str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(skv_engine, "_jobs", JobStore(history=history))
+    yield skv6.app.test_client()
+    history.close()
+
+
+def _sse(body):
+    out = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+        if "event" in fields:
+            out.append((fields.get("id"), fields["event"]))
+    return out
+
+
+def test_stream_resumes_and_ends_after_final_event(app):
+    job = skv_engine.JobStatus(job_id="sse1", state="running")
+    skv_engine._set_job(job)
+    job.state, job.ended_at = "matched", time.time()
+    skv_engine._set_job(job)
+    job.screenshot_path = "sse1/shot.png"
+    skv_engine._set_job(job, final=True)
+
+    resp = app.get("/api/events/sse1", headers={"Last-Event-ID": "1"})
+    assert resp.status_code == 200
+    assert _sse(resp.get_data(as_text=True)) == [("2", "status"), ("3", "status"), (None, "end")]
+
+    # Reconnect after the final event: nothing to replay, just end.
+    resp = app.get("/api/events/sse1", headers={"Last-Event-ID": "3"})
+    assert _sse(resp.get_data(as_text=True)) == [(None, "end")]
+    assert app.get("/api/status/sse1").get_json()["final"] is True
+
+
+def test_stream_of_evicted_job_and_unknown_job(app):
+    job = skv_engine.JobStatus(job_id="sse2", state="error", ended_at=time.time())
+    skv_engine._set_job(job, final=True)
+    skv_engine._drop_job("sse2")  # gone from memory and the bus, still in history
+
+    resp = app.get("/api/events/sse2")
+    assert _sse(resp.get_data(as_text=True)) == [(None, "status"), (None, "end")]
+    assert app.get("/api/status/sse2").get_json()["final"] is True
+
+    assert app.get("/api/events/nope").status_code == 404
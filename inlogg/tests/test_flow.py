@@ -0,0 +1,134 @@
+import pytest
+
+from skv_flow import (
+    ClickStep,
+    describe_flow,
+    flow_from_sequences,
+    is_catch_all,
+    parse_flow,
+    run_click_flow,
+)
+from skv_gates import StepGate
+
+
+def test_parse_flow_defaults_and_learning():
+    flow = parse_flow([
+        {"name": "cookie", "selectors": "#necessary\n#accept"},
+        {"name": "login", "selectors": ["#login", " "], "wait": "#login", "timeout_ms": 800},
+        {"selectors": ["#qr", "svg path"], "wait_seconds": 0, "expect_popup": True},
+        {"selectors": ["svg path"], "learn_order": True},
+    ])
+    assert [s.index for s in flow] == [0, 1, 2, 3]
+    assert flow[0].selectors == ("#necessary", "#accept") and flow[0].wait_seconds == 3.0
+    assert flow[1].gate == StepGate(selector="#login") and flow[1].timeout_ms == 800
+    assert flow[2].expect_popup and flow[2].key == "2" and flow[2].title == "Klicksekvens 2"
+    # Consent order and catch-all selectors are not learned unless asked for.
+    assert [s.learn_order for s in flow] == [False, True, False, True]
+
+
+@pytest.mark.parametrize("value, message", [
+    ([], "icke-tom lista"),
+    ({"selectors": ["#a"]}, "icke-tom lista"),
+    (["#a"], "Steg 0: måste vara ett objekt"),
+    ([{"selectors": ["#a"]}, {"selectors": ["#b"], "click": True}], "Steg 1: okända fält: click"),
+    ([{"selectors": " \n "}], "Steg 0: selectors saknas"),
+    ([{"selectors": ["#a"], "wait_seconds": "snart"}], "Steg 0:"),
+    ([{"selectors": ["#a"], "timeout_ms": 0}], "utanför intervall"),
+    ([{"selectors": ["#a"], "wait": {"load_state": "ready"}}], "Steg 0: Okänt load_state"),
+])
+def test_parse_flow_rejects(value, message):
+    with pytest.raises(ValueError, match=message):
+        parse_flow(value)
+
+
+def test_flow_from_sequences_keeps_legacy_defaults():
+    flow = flow_from_sequences([
+        (2.0, ["#cookie"], None),
+        (None, ["#skipped"], None),
+        (1.0, [], None),
+        (4.0, "svg path\n#qr", StepGate(sleep=True)),
+    ])
+    assert [(s.index, s.name) for s in flow] == [(0, "cookie"), (3, "qr")]
+    assert flow[0].timeout_ms == 3000 and not flow[0].learn_order
+    qr = flow[1]
+    assert qr.expect_popup and qr.selectors == ("svg path", "#qr") and qr.title == "Klicksekvens 3 (QR-kod)"
+    assert not qr.learn_order  # catch-all selector
+
+    assert describe_flow(flow)[1] == {
+        "index": 3,
+        "name": "qr",
+        "selectors": ["svg path", "#qr"],
+        "wait_seconds": 4.0,
+        "wait": "sleep",
+        "timeout_ms": 5000,
+        "expect_popup": True,
+        "learn_order": False,
+    }
+
+
+def test_is_catch_all():
+    assert is_catch_all("svg path") and is_catch_all("slot.fin-skv-button-label")
+    assert not is_catch_all("#qr")
+    assert not is_catch_all("button[type=submit]")
+    assert not is_catch_all("text=Logga in")
+
+
+# Both buttons are visible at once, so the selector order decides the click.
+TWO_BUTTONS = """
+<button id="a">A</button> <button id="b">B</button>
+<a id="open" href="#" onclick="window.open('about:blank'); return false">Öppna</a>
+<script>
+window.clicks = [];
+for (const el of document.querySelectorAll("button, a")) el.addEventListener("click", () => clicks.push(el.id));
+</script>
+"""
+
+
+def test_flow_runs_steps_with_hooks_and_timings(page, job, session, selector_stats):
+    page.set_content(TWO_BUTTONS)
+    flow = [
+        ClickStep(index=0, selectors=("#missing", "#a"), wait_seconds=1.0, name="t_first", timeout_ms=1000),
+        ClickStep(index=1, selectors=("#open",), wait_seconds=1.0, name="t_popup", timeout_ms=1000, expect_popup=True),
+    ]
+    published, hooks = [], []
+    result = run_click_flow(
+        page, job, session, flow, published.append, lambda: False,
+        before_click=lambda step: hooks.append(("before", step.key)),
+        after_click=lambda outcome: hooks.append(("after", outcome.race.selector)),
+    )
+
+    assert page.evaluate("clicks") == ["a", "open"]
+    assert hooks == [("before", "t_first"), ("after", "#a"), ("before", "t_popup"), ("after", "#open")]
+    assert result.popup is not None and result.outcomes[1].popup is result.popup
+    assert len(published) == 4  # before the gate and after the click, per step
+    assert job.details["click_winners"]["0"]["selector"] == "#a"
+
+    detail = job.details["flow"]
+    assert not detail["cancelled"]
+    assert [s["name"] for s in detail["steps"]] == ["t_first", "t_popup"]
+    assert [s["popup"] for s in detail["steps"]] == [False, True]
+    assert all(s["gate_met"] and s["total_ms"] >= s["race_ms"] for s in detail["steps"])
+    assert detail["total_ms"] >= sum(s["total_ms"] for s in detail["steps"])
+    assert [m for k, m, _ in session.logged if k == "CLICKS"][-1] == "Click sequences done"
+
+
+def test_cancel_stops_before_clicking(page, job, session, selector_stats):
+    page.set_content(TWO_BUTTONS)
+    flow = [ClickStep(index=1, selectors=("#a",), wait_seconds=1.0, name="t_cancel")]
+    result = run_click_flow(page, job, session, flow, lambda j: None, lambda: True)
+
+    assert result.cancelled and job.details["flow"]["cancelled"]
+    assert page.evaluate("clicks") == []
+    assert result.outcomes[0].race.selector is None
+
+
+@pytest.mark.parametrize("learn_order, clicked", [(True, "b"), (False, "a")])
+def test_learned_selector_order(page, job, session, selector_stats, learn_order, clicked):
+    for _ in range(5):
+        selector_stats.record("t_learn", ["#a", "#b"], "#b", 50)
+    page.set_content(TWO_BUTTONS)
+    flow = [ClickStep(index=1, selectors=("#a", "#b"), wait_seconds=1.0, name="t_learn", learn_order=learn_order)]
+    run_click_flow(page, job, session, flow, lambda j: None, lambda: False)
+
+    assert page.evaluate("clicks") == [clicked]
+    assert ("selector_order" in job.details) == learn_order
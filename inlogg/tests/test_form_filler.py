@@ -0,0 +1,142 @@
+import pytest
+
+from bench_filler import standin_html
+from formulär.flytt_form_filler import (
+    DEFAULT_MOCKUP_DATA,
+    FIELD_SNAPSHOT_JS,
+    _run_options,
+    _snapshot_args,
+    _visible_fields,
+    run_flytt_form_filler,
+)
+from skv_settings import SkvSettings
+
+
+def _snapshot(page):
+    return page.evaluate(FIELD_SNAPSHOT_JS, _snapshot_args())
+
+
+@pytest.fixture
+def standin(page):
+    page.set_content(standin_html(latency_ms=50, busy_ms=20))
+    return page
+
+
+def _goto_step(page, index):
+    page.evaluate(f"current = {index}; render()")
+
+
+def test_snapshot_sees_fields_inside_shadow_roots(standin):
+    _goto_step(standin, 2)
+    snap = _snapshot(standin)
+    assert snap["step"] == {
+        "index": 2,
+        "count": 6,
+        "name": "adress",
+        "inputs": ["fastighetsagare", "fastighetsbeteckning", "gatuadress", "lagenhetsnummer", "postnummer", "postort"],
+    }
+    assert _visible_fields(snap) == set(snap["step"]["inputs"])
+    assert snap["fields"]["email"] == {"count": 0, "visible": False, "value": "", "disabled": False}
+    assert snap["next"] == {"count": 1, "visible": True, "busy": None}
+    assert snap["confirm"] == {"count": 0, "visible": 0, "unchecked": 0}
+
+
+def test_snapshot_reports_values_disabled_hidden_and_busy(standin):
+    _goto_step(standin, 4)
+    standin.evaluate("""() => {
+        const input = (name) => document.querySelector(`skv-input-bench[name=${name}]`).shadowRoot.querySelector('input');
+        input('telefonnummer').value = '0701234567';
+        input('email').disabled = true;
+        document.querySelector('skv-input-bench[name=email]').style.display = 'none';
+        document.querySelector('skv-button-10-0-7').setAttribute('busy', 'true');
+    }""")
+    snap = _snapshot(standin)
+    assert snap["fields"]["telefonnummer"]["value"] == "0701234567"
+    assert snap["fields"]["email"]["disabled"] is True
+    assert snap["fields"]["email"]["visible"] is False
+    assert snap["next"]["busy"] == "true"
+
+
+def test_snapshot_counts_unchecked_confirmation(standin):
+    _goto_step(standin, 2)
+    standin.evaluate("""() => {
+        const c = document.createElement('skv-selection-control-10-0-12');
+        c.setAttribute('type', 'checkbox');
+        c.textContent = 'Jag bekräftar';
+        document.querySelector('.flytt-skv-wizard-step--active').appendChild(c);
+    }""")
+    assert _snapshot(standin)["confirm"] == {"count": 1, "visible": 1, "unchecked": 1}
+
+
+def _fill(page, **kwargs):
+    logged = []
+    summary = run_flytt_form_filler(page, lambda: False, logged.append, form_data=dict(DEFAULT_MOCKUP_DATA), **kwargs)
+    bench = page.evaluate("() => ({ model: window.__bench.model, stats: window.__bench.stats, step: window.__bench.step() })")
+    return summary, bench, logged
+
+
+def test_fill_waits_for_each_transition(page):
+    # Slow enough that a fixed short sleep would click Nästa on a step still rendering.
+    page.set_content(standin_html(latency_ms=400, busy_ms=150))
+    summary, bench, _ = _fill(page)
+
+    assert bench["model"] == DEFAULT_MOCKUP_DATA
+    assert bench["step"] == 5  # granska, where the filler stops
+    assert bench["stats"]["rejected"] == 0
+    assert summary["transition_timeouts"] == 0
+    # Every Nästa was answered: a new step, or the address confirmation to check.
+    assert summary["transitions"] == bench["stats"]["nextClicks"]
+    # Waiting is polling in short slices, not a fixed sleep per step.
+    assert summary["sleep_s"] < summary["total_s"]
+
+
+def test_fast_fill_one_blur_per_field(page):
+    page.set_content(standin_html(latency_ms=50, busy_ms=20))
+    summary, bench, _ = _fill(page, fast_fill=True)
+
+    assert bench["model"] == DEFAULT_MOCKUP_DATA
+    stats = bench["stats"]
+    assert stats["rejected"] == 0
+    assert stats["inputEvents"] == stats["changeEvents"] == stats["blurEvents"] == len(DEFAULT_MOCKUP_DATA)
+    assert summary["fill"]["fast"]["fields"] == len(DEFAULT_MOCKUP_DATA)
+    assert summary["fill"]["fast"]["fallbacks"] == 0
+    assert summary["fill"]["per_field"]["fields"] == 0
+
+
+def test_fast_fill_falls_back_per_field(page):
+    page.set_content(standin_html(latency_ms=50, busy_ms=20))
+    # A framework that rewrites the value on input: fast-fill cannot verify it.
+    page.evaluate("""() => document.addEventListener('input', (e) => {
+        const el = e.composedPath()[0];
+        if (el.name === 'postort' && !window.__rewritten) { window.__rewritten = true; el.value = el.value.toUpperCase(); }
+    }, true)""")
+    summary, bench, logged = _fill(page, fast_fill=True)
+
+    assert bench["model"]["postort"] == DEFAULT_MOCKUP_DATA["postort"]
+    assert summary["fill"]["fast"]["fallbacks"] == 1
+    assert summary["fill"]["per_field"]["fields"] == 1
+    assert any(line.startswith("OK: postort = ") and "(fast)" not in line for line in logged)
+
+
+def test_run_options_precedence():
+    settings = SkvSettings(payload_file="/tmp/job.json", allow_mockup_data=True, fast_fill=True)
+    assert _run_options(None, None, None, None) == (None, False, False)
+    assert _run_options(settings, None, None, None) == ("/tmp/job.json", True, True)
+    # Explicit arguments win, including explicit "off".
+    assert _run_options(settings, "/tmp/arg.json", False, False) == ("/tmp/arg.json", False, False)
+    assert _run_options(SkvSettings(payload_file=""), "", None, None) == (None, True, False)
+
+
+def test_settings_reach_the_filler(page, tmp_path):
+    payload = tmp_path / "payload.json"
+    payload.write_text('{"moveDate": "2026-03-01", "toStreet": "Lillgatan 1", "toPostal": "222 33", "toCity": "Lund"}', encoding="utf-8")
+    page.set_content(standin_html(latency_ms=50, busy_ms=20))
+    logged = []
+    summary = run_flytt_form_filler(
+        page, lambda: False, logged.append,
+        settings=SkvSettings(payload_file=str(payload), allow_mockup_data=False, fast_fill=True),
+    )
+    model = page.evaluate("window.__bench.model")
+    assert model == {"inflyttningsdatum": "2026-03-01", "gatuadress": "Lillgatan 1", "postnummer": "22233", "postort": "Lund"}
+    assert summary["fill"]["fast"]["fields"] == 4
+    assert any(f"payload file: {payload}" in line for line in logged)
@@ -0,0 +1,107 @@
+import pytest
+
+from skv_flow import ClickStep, run_click_flow
+from skv_gates import StepGate, default_gate, parse_gate
+
+
+@pytest.mark.parametrize("value", [None, "", {}])
+def test_empty_means_no_gate(value):
+    assert parse_gate(value) is None
+
+
+def test_strings():
+    assert parse_gate(" #next ") == StepGate(selector="#next")
+    assert parse_gate("SLEEP") == StepGate(sleep=True)
+
+
+def test_gate_passes_through():
+    gate = StepGate(response="/api/")
+    assert parse_gate(gate) is gate
+
+
+def test_dict():
+    gate = parse_gate({"selector": " form ", "response": r"/qr\?aid=", "load_state": "load", "sleep": 0})
+    assert gate == StepGate(selector="form", response=r"/qr\?aid=", load_state="load")
+    assert gate.describe() == r"load_state=load & response~/qr\?aid= & selector=form"
+    assert parse_gate({"selector": "", "response": None}) == StepGate()
+
+
+@pytest.mark.parametrize("value, message", [
+    ({"selectr": "x"}, "Okända villkor: selectr"),
+    ({"load_state": "ready"}, "Okänt load_state: ready"),
+    ({"response": "(unclosed"}, "Ogiltigt response-mönster"),
+    (["#a"], "selector-sträng eller ett objekt"),
+    (3, "selector-sträng eller ett objekt"),
+])
+def test_invalid(value, message):
+    with pytest.raises(ValueError, match=message):
+        parse_gate(value)
+
+
+def test_default_gate():
+    first = default_gate(["#a", " ", "", " #b "], first_step=True)
+    assert first.any_of == ("#a", "#b")
+    assert first.describe() == "selector=#a | #b"
+    later = default_gate([" ", "#a", "svg path"])
+    assert later == StepGate(selector="#a")
+    assert default_gate(None).describe() == "none"
+    assert StepGate(sleep=True, selector="x").describe() == "sleep"
+
+
+# #start shows the next page's primary button after 400 ms. The fallback
+# span is on the page all along, like "svg path" on the page before the QR.
+STALE_PAGE = """
+<button id="start">Start</button>
+<span class="fallback">gammal sida</span>
+<script>
+window.clicks = [];
+document.querySelector(".fallback").onclick = () => clicks.push("fallback");
+document.querySelector("#start").onclick = () => {
+  clicks.push("start");
+  if (location.hash === "#noprimary") return;
+  setTimeout(() => {
+    const b = document.createElement("button");
+    b.id = "primary";
+    b.textContent = "Nästa";
+    b.onclick = () => clicks.push("primary");
+    document.body.appendChild(b);
+  }, 400);
+};
+</script>
+"""
+
+
+def _stale_flow(bound_s):
+    return [
+        ClickStep(index=0, selectors=("#start",), wait_seconds=2.0, name="t_start", timeout_ms=2000),
+        ClickStep(index=1, selectors=("#primary", "span.fallback"), wait_seconds=bound_s, name="t_next", timeout_ms=2000),
+    ]
+
+
+def test_later_step_ignores_fallback_on_stale_page(page, job, session, selector_stats):
+    page.set_content(STALE_PAGE)
+    result = run_click_flow(page, job, session, _stale_flow(3.0), lambda j: None, lambda: False)
+
+    assert page.evaluate("clicks") == ["start", "primary"]
+    wait = result.outcomes[1].wait
+    assert wait.met and wait.condition == "selector=#primary"
+    assert wait.waited_ms >= 300
+
+
+def test_missing_primary_waits_the_bound_then_races(page, job, session, selector_stats):
+    page.set_content(STALE_PAGE)
+    page.evaluate("location.hash = 'noprimary'")
+    result = run_click_flow(page, job, session, _stale_flow(0.6), lambda j: None, lambda: False)
+
+    assert page.evaluate("clicks") == ["start", "fallback"]
+    wait = result.outcomes[1].wait
+    assert not wait.met and wait.waited_ms >= 550
+
+
+def test_first_step_takes_any_visible_selector(page, job, session, selector_stats):
+    page.set_content(STALE_PAGE)
+    flow = [ClickStep(index=0, selectors=("#missing", "span.fallback"), wait_seconds=3.0, name="t_first", timeout_ms=2000)]
+    result = run_click_flow(page, job, session, flow, lambda j: None, lambda: False)
+
+    assert page.evaluate("clicks") == ["fallback"]
+    assert result.outcomes[0].wait.waited_ms < 1500
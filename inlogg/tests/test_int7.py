@@ -0,0 +1,81 @@
+import json
+import os
+import socket
+
+import pytest
+
+import skv_engine
+import skv_int7
+from skv_jobstore import JobStore, SqliteJobHistory
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, job_id, fn):
+        self.jobs.append((job_id, fn))
+        return 1, 0.0
+
+    def stats(self):
+        return {}
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    history = SqliteJobHistory(str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(skv_engine, "_jobs", JobStore(history=history))
+    monkeypatch.setattr(skv_int7, "DAEMON_SESSIONS_DIR", str(tmp_path / "int7_sessions"))
+    scheduler = FakeScheduler()
+    monkeypatch.setattr(skv_engine, "_get_scheduler", lambda: scheduler)
+
+    def fake_start(job_id, url, timeout_seconds, flow=None, settings=None):
+        job = skv_engine._get_job(job_id)
+        job.state, job.message = "matched", f"payload {settings.payload_file}"
+        skv_engine._set_job(job, final=True)
+
+    monkeypatch.setattr(skv_engine, "_start_playwright_job", fake_start)
+    yield scheduler
+    history.close()
+
+
+@pytest.mark.parametrize("body, message", [
+    ({}, "payload måste vara ett objekt"),
+    ({"payload": {}, "url": "ftp://x"}, "URL måste börja med"),
+    ({"payload": {}, "timeout_seconds": "snart"}, "timeout_seconds måste vara ett tal"),
+])
+def test_start_rejects_bad_bodies(daemon, body, message):
+    status, response = skv_int7.start_daemon_flow(body)
+    assert status == 400 and message in response["error"]
+    assert daemon.jobs == []
+
+
+def test_each_run_has_its_own_payload_and_log(daemon):
+    ids = []
+    for name in ("Anna", "Bo"):
+        status, response = skv_int7.start_daemon_flow({"payload": {"namn": name}})
+        assert status == 202 and response["job"]["state"] == "queued"
+        ids.append(response["job"]["job_id"])
+    for job_id, run in daemon.jobs:
+        assert run() is None
+
+    for job_id, name in zip(ids, ("Anna", "Bo")):
+        details = skv_engine._get_job(job_id).details["int7"]
+        with open(os.path.join(details["session_dir"], "payload.json"), encoding="utf-8") as f:
+            assert json.load(f) == {"namn": name}
+        with open(details["log_file"], encoding="utf-8") as f:
+            log = f.read()
+        assert f"SKV INT7 SESSION {job_id}" in log
+        assert "daemon flow queued" in log and "daemon flow finished" in log
+        assert [other for other in ids if other != job_id][0] not in log
+        assert skv_engine._get_job(job_id).message == f"payload {os.path.join(details['session_dir'], 'payload.json')}"
+
+
+def test_second_daemon_on_a_taken_port_exits_before_warming(monkeypatch):
+    warmed = []
+    monkeypatch.setattr(skv_engine, "warm_engine", lambda: warmed.append(True))
+    with socket.socket() as taken:
+        taken.bind((skv_int7.DAEMON_HOST, 0))
+        taken.listen()
+        assert skv_int7.run_daemon(taken.getsockname()[1]) == 1
+    assert warmed == []
@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+
+from skv_joblog import JobLogWriter, get_job_log_writer, truncate_body
+
+
+def _records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_truncate_body():
+    assert truncate_body({"a": 1}, -1) == {"a": 1}
+    assert truncate_body("x" * 10, 0) == {"_dropped": True}
+    assert truncate_body("short", 10) == "short"
+    assert truncate_body("x" * 12, 5) == {"_truncated": True, "chars": 12, "preview": "xxxxx"}
+
+
+def test_records_are_written_as_jsonl(tmp_path):
+    writer = JobLogWriter(str(tmp_path), body_max_chars=4)
+    data = {"status": 200, "body": "abcdefgh"}
+    assert writer.emit("j1", "Response", "NET", data)
+    data["status"] = 500  # changed after emit: the record keeps the old value
+    writer.emit("j2", "Other job")
+    assert writer.flush()
+
+    (rec,) = _records(writer.path_for("j1"))
+    assert (rec["job_id"], rec["section"], rec["msg"]) == ("j1", "NET", "Response")
+    assert rec["data"] == {"status": 200, "body": {"_truncated": True, "chars": 8, "preview": "abcd"}}
+    assert _records(writer.path_for("j2"))[0]["msg"] == "Other job"
+    assert writer.stats()["written"] == 2
+
+
+def test_rotation_keeps_backups(tmp_path):
+    writer = JobLogWriter(str(tmp_path), max_bytes=1024, backups=2)
+    for i in range(60):
+        writer.emit("j", f"line {i}", data={"pad": "x" * 60})
+    assert writer.flush()
+
+    base = writer.path_for("j")
+    assert os.path.exists(base + ".1") and os.path.exists(base + ".2")
+    assert not os.path.exists(base + ".3")
+    assert writer.stats()["rotations"] >= 3
+    assert max(os.path.getsize(p) for p in (base + ".1", base + ".2")) < 1024 + 200
+
+
+class _BlockedWriter(JobLogWriter):
+    """Writer thread stalls on its first record until released."""
+
+    def __init__(self, *args, **kwargs):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        super().__init__(*args, **kwargs)
+
+    def _prepare(self, record):
+        self.started.set()
+        self.release.wait(5)
+        return super()._prepare(record)
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    writer = _BlockedWriter(str(tmp_path), queue_size=1)
+    assert writer.emit("j", "taken by the writer")
+    assert writer.started.wait(2)
+    assert writer.emit("j", "queued")
+    assert not writer.emit("j", "dropped")
+    assert writer.dropped_for("j") == 1 and writer.stats()["dropped"] == 1
+
+    writer.release.set()
+    assert writer.flush()
+    assert [r["msg"] for r in _records(writer.path_for("j"))] == ["taken by the writer", "queued"]
+    writer.close_job("j")
+    assert writer.dropped_for("j") == 0
+
+
+def test_one_writer_per_directory(tmp_path):
+    a = get_job_log_writer(str(tmp_path / "a"))
+    assert get_job_log_writer(str(tmp_path / "a" / ".." / "a")) is a
+    assert get_job_log_writer(str(tmp_path / "b")) is not a
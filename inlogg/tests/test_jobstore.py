@@ -0,0 +1,138 @@
+import os
+import time
+
+import pytest
+
+from skv_engine import JobStatus
+from skv_jobstore import JobStore, SqliteJobHistory, prune_artifacts
+
+
+def _done(job_id, ended_at=None, state="matched"):
+    return JobStatus(job_id=job_id, state=state, ended_at=ended_at or time.time())
+
+
+@pytest.fixture
+def history(tmp_path):
+    h = SqliteJobHistory(str(tmp_path / "runtime" / "jobs.db"))
+    yield h
+    h.close()
+
+
+def test_cap_evicts_least_recently_updated_finished(history):
+    evicted = []
+    store = JobStore(max_in_memory=2, history=history, on_evict=evicted.append)
+    store.put(_done("a"))
+    store.put(_done("b"))
+    store.put(_done("a"))  # refresh: b is now the oldest
+    store.put(_done("c"))
+
+    assert evicted == ["b"]
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+    assert store.stats()["evicted"] == 1
+
+
+def test_active_jobs_are_never_evicted():
+    store = JobStore(max_in_memory=1)
+    store.put(JobStatus(job_id="run", state="running"))
+    store.put(JobStatus(job_id="q", state="queued"))
+    store.put(_done("d"))
+
+    assert store.active_ids() == ["run", "q"]
+    assert store.get("d") is None
+
+
+def test_ttl_sweep():
+    store = JobStore(ttl_seconds=10)
+    store.put(_done("old", ended_at=time.time() - 60))
+    store.put(_done("new"))
+    store.put(JobStatus(job_id="run", state="running"))
+
+    assert store.sweep() == 1
+    assert store.get("old") is None
+    assert store.get("new") is not None
+
+
+def test_lookup_falls_back_to_history(history):
+    store = JobStore(max_in_memory=1, history=history)
+    store.put(JobStatus(job_id="run", state="running", message="pågår"))
+    assert history.count() == 0  # only terminal states are persisted
+
+    store.put(JobStatus(job_id="run", state="matched", message="klar", ended_at=time.time()))
+    store.remove("run")
+    assert store.get("run") is None
+
+    snapshot = store.lookup("run")
+    assert (snapshot["state"], snapshot["message"]) == ("matched", "klar")
+    assert store.lookup("missing") is None
+    stats = store.stats()
+    assert (stats["history_writes"], stats["history_hits"]) == (1, 1)
+
+
+def test_history_survives_reopen_and_prunes(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    h = SqliteJobHistory(path)
+    h.save("old", "error", time.time() - 3600, {"job_id": "old"})
+    h.save("new", "matched", None, {"job_id": "new"})
+    h.close()
+
+    h = SqliteJobHistory(path)
+    assert h.count() == 2
+    assert h.prune(600) == 1
+    assert h.load("old") is None
+    assert h.load("new") == {"job_id": "new"}
+    h.close()
+
+
+def test_cancel_flags():
+    store = JobStore()
+    assert store.request_cancel("nope") is False
+    store.put(JobStatus(job_id="j", state="running"))
+    assert store.request_cancel("j") is True
+    assert store.is_cancelled("j") is True
+    store.remove("j")
+    assert store.is_cancelled("j") is False
+
+
+def _entry(root, name, age_s, size=10, is_dir=False):
+    path = root / name
+    if is_dir:
+        path.mkdir()
+        (path / "shot.png").write_bytes(b"x" * size)
+        targets = [path / "shot.png", path]
+    else:
+        path.write_bytes(b"x" * size)
+        targets = [path]
+    mtime = time.time() - age_s
+    for t in targets:
+        os.utime(t, (mtime, mtime))
+    return path
+
+
+def test_prune_by_age_keeps_active_jobs(tmp_path):
+    old_dir = _entry(tmp_path, "job1", 3600, is_dir=True)
+    active_dir = _entry(tmp_path, "job2", 3600, is_dir=True)
+    active_log = _entry(tmp_path, "job2_session.log.1", 3600)
+    hidden = _entry(tmp_path, ".keep", 3600)
+    fresh = _entry(tmp_path, "job3", 0, is_dir=True)
+
+    out = prune_artifacts(str(tmp_path), max_age_seconds=600, keep=["job2"])
+
+    assert out["removed"] == 1 and out["freed_bytes"] == 10
+    assert not old_dir.exists()
+    assert active_dir.exists() and active_log.exists() and hidden.exists() and fresh.exists()
+
+
+def test_prune_by_size_removes_oldest_first(tmp_path):
+    a = _entry(tmp_path, "a.log", 300, size=100)
+    b = _entry(tmp_path, "b.log", 200, size=100)
+    c = _entry(tmp_path, "c.log", 100, size=100)
+
+    out = prune_artifacts(str(tmp_path), max_total_bytes=150)
+
+    assert (out["removed"], out["total_bytes"]) == (2, 100)
+    assert not a.exists() and not b.exists() and c.exists()
+
+
+def test_prune_missing_root(tmp_path):
+    assert prune_artifacts(str(tmp_path / "nope"), max_age_seconds=1)["removed"] == 0
@@ -0,0 +1,63 @@
+import pytest
+
+from skv_readiness import FormReadinessWatcher
+
+START_URL = "https://skv.test/start"
+FLYTT_URL = "https://skv.test/folkbokforing/flyttanmalan"
+
+# The form sits two shadow roots down, like the skv-* components render it.
+SHADOW_FORM_JS = """() => {
+  const outer = document.createElement('skv-outer');
+  document.body.appendChild(outer);
+  const inner = document.createElement('skv-inner');
+  outer.attachShadow({ mode: 'open' }).appendChild(inner);
+  inner.attachShadow({ mode: 'closed' }).innerHTML =
+    '<form id="fbfFlyttanmalanForm"><flytt-skv-wizard-step class="flytt-skv-wizard-step--active"></flytt-skv-wizard-step></form>';
+}"""
+
+
+@pytest.fixture
+def watched(page):
+    page.context.route("https://skv.test/**", lambda route: route.fulfill(
+        content_type="text/html", body="<html><body><p>Skatteverket</p></body></html>",
+    ))
+    watcher = FormReadinessWatcher(page.context).attach()
+    return page, watcher
+
+
+def _dom_signal(watcher, page, seconds=2.0):
+    for _ in range(int(seconds / 0.1)):
+        if watcher.counts.get("dom"):
+            break
+        watcher.wait(page, 0.1)
+    return bool(watcher.counts.get("dom"))
+
+
+def test_form_inside_shadow_roots_signals(watched):
+    page, watcher = watched
+    page.goto(FLYTT_URL)
+    assert not watcher.counts.get("dom")
+
+    page.evaluate(SHADOW_FORM_JS)
+    assert _dom_signal(watcher, page)
+    assert watcher.first_signal_kind == "dom"
+
+
+def test_client_side_navigation_to_flytt_arms_observer(watched):
+    page, watcher = watched
+    page.goto(START_URL)
+    page.evaluate(SHADOW_FORM_JS)
+    watcher.wait(page, 0.3)
+    assert not watcher.counts.get("dom")  # not a flytt URL
+
+    page.evaluate("history.pushState({}, '', '/folkbokforing/flyttanmalan')")
+    assert _dom_signal(watcher, page)
+
+
+def test_light_dom_fallback_without_index(watched):
+    page, watcher = watched
+    page.goto(START_URL)
+    # Index missing (e.g. the init script failed): the observer uses the light DOM.
+    page.evaluate("() => { window.__skvIndex = undefined; history.replaceState({}, '', '/flytt'); }")
+    page.evaluate("document.body.innerHTML = '<form id=\"fbfFlyttanmalanForm\"></form>'")
+    assert _dom_signal(watcher, page)
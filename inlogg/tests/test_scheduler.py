@@ -0,0 +1,99 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from skv_scheduler import JobScheduler, QueueFull
+
+
+def _wait_until(pred, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not pred():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def gate():
+    release = threading.Event()
+    yield release
+    release.set()
+
+
+def test_full_queue_raises_queue_full(gate):
+    sched = JobScheduler(workers=1, queue_depth=1)
+    sched.submit("a", gate.wait)
+    _wait_until(lambda: sched.stats()["running"] == 1)
+
+    pos, eta = sched.submit("b", gate.wait)
+    assert pos == 1
+    assert eta >= time.time() - 1
+
+    with pytest.raises(QueueFull) as info:
+        sched.submit("c", gate.wait)
+    assert info.value.retry_after >= 1
+    stats = sched.stats()
+    assert (stats["admitted"], stats["rejected"], stats["queued"]) == (2, 1, 1)
+
+
+def test_zero_depth_admits_only_when_a_worker_is_free(gate):
+    sched = JobScheduler(workers=1, queue_depth=0)
+    sched.submit("a", gate.wait)
+    _wait_until(lambda: sched.stats()["running"] == 1)
+    with pytest.raises(QueueFull):
+        sched.submit("b", gate.wait)
+
+    gate.set()
+    _wait_until(lambda: sched.stats()["running"] == 0)
+    sched.submit("c", lambda: None)
+    _wait_until(lambda: sched.stats()["completed"] == 2)
+
+
+def test_cancel_queued_frees_a_slot(gate):
+    sched = JobScheduler(workers=1, queue_depth=1)
+    sched.submit("a", gate.wait)
+    _wait_until(lambda: sched.stats()["running"] == 1)
+    sched.submit("b", gate.wait)
+
+    assert sched.cancel_queued("b") is True
+    assert sched.cancel_queued("b") is False
+    assert sched.cancel_queued("a") is False  # already running
+    assert sched.submit("c", gate.wait)[0] == 1
+    assert sched.stats()["cancelled_queued"] == 1
+
+
+def test_positions_callback_and_failed_jobs(gate):
+    seen = []
+    sched = JobScheduler(workers=1, queue_depth=5, on_positions=seen.append)
+    sched.submit("a", gate.wait)
+    _wait_until(lambda: sched.stats()["running"] == 1)
+    sched.submit("b", gate.wait)
+    sched.submit("c", lambda: 1 / 0)
+
+    assert [(jid, pos) for jid, pos, _ in seen[-1]] == [("b", 1), ("c", 2)]
+    etas = [eta for _, _, eta in seen[-1]]
+    assert etas == sorted(etas)
+
+    gate.set()
+    _wait_until(lambda: sched.stats()["completed"] + sched.stats()["failed"] == 3)
+    assert sched.stats()["failed"] == 1
+
+
+def test_future_jobs_hold_a_slot_not_a_thread():
+    sched = JobScheduler(workers=2, queue_depth=5)
+    futures = [Future(), Future()]
+    sched.submit("a", lambda: futures[0])
+    sched.submit("b", lambda: futures[1])
+    _wait_until(lambda: sched.stats()["running"] == 2)
+    ran = []
+    sched.submit("c", lambda: ran.append("c"))
+    time.sleep(0.05)
+    assert ran == [] and sched.stats()["queued"] == 1  # both slots taken, no thread blocked
+
+    futures[0].set_exception(RuntimeError("boom"))
+    _wait_until(lambda: ran == ["c"])
+    futures[1].set_result(None)
+    _wait_until(lambda: sched.stats()["running"] == 0)
+    stats = sched.stats()
+    assert (stats["completed"], stats["failed"]) == (2, 1)
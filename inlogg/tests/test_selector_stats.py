@@ -0,0 +1,108 @@
+import pytest
+
+from skv_flow import _begin_step, flow_from_sequences, is_catch_all, parse_flow
+from skv_selector_stats import DECAY, SelectorStats
+
+
+@pytest.fixture
+def stats(tmp_path):
+    return SelectorStats(str(tmp_path / "runtime" / "selector_stats.json"))
+
+
+def test_no_data_keeps_configured_order(stats):
+    assert stats.order("s1", ["#a", "#b", "#c"]) == ["#a", "#b", "#c"]
+    assert stats.order("s1", None) == []
+    assert stats.reorders == 0
+
+
+def test_winner_moves_ahead_of_misses(stats):
+    stats.record("s1", ["#a", "#b"], "#b", 400)
+    assert stats.order("s1", ["#a", "#b"]) == ["#b", "#a"]
+    assert stats.reorders == 1
+    # Other steps are unaffected.
+    assert stats.order("s2", ["#a", "#b"]) == ["#a", "#b"]
+
+
+def test_selectors_after_winner_are_not_recorded(stats):
+    stats.record("s1", ["#a", "#b", "#c"], "#b", 400)
+    assert set(stats.snapshot()["steps"]["s1"]) == {"#a", "#b"}
+
+
+def test_no_winner_is_a_miss_for_all(stats):
+    stats.record("s1", ["#a", "#b"], None, 9000)
+    steps = stats.snapshot()["steps"]["s1"]
+    assert steps["#a"]["hit_rate"] == 0.0
+    assert steps["#b"]["hit_rate"] == 0.0
+
+
+def test_decay(stats):
+    stats.record("s1", ["#a"], "#a", 1000)
+    stats.record("s1", ["#a"], None, 0)
+    entry = stats._data["s1"]["#a"]
+    assert entry["attempts"] == pytest.approx(1 * DECAY + 1)
+    assert entry["hits"] == pytest.approx(DECAY)
+    assert entry["ms"] == 1000  # misses leave the hit time alone
+
+    stats.record("s1", ["#a"], "#a", 2000)
+    assert entry["ms"] == pytest.approx(1000 * DECAY + 2000 * (1 - DECAY))
+    assert entry["runs"] == 3
+
+
+def test_recent_outcomes_outweigh_old_ones(stats):
+    for _ in range(5):
+        stats.record("s1", ["#a", "#b"], "#a", 300)
+    assert stats.order("s1", ["#a", "#b"]) == ["#a", "#b"]
+    # #a stops appearing; a few runs later #b is preferred.
+    for _ in range(3):
+        stats.record("s1", ["#a", "#b"], "#b", 300)
+    assert stats.order("s1", ["#a", "#b"]) == ["#b", "#a"]
+
+
+def test_expected_ms_prefers_fast_hits():
+    fast = {"attempts": 1.0, "hits": 1.0, "ms": 200.0, "last_hit_at": 1.0, "runs": 1}
+    slow = {"attempts": 1.0, "hits": 1.0, "ms": 3000.0, "last_hit_at": 1.0, "runs": 1}
+    miss = {"attempts": 1.0, "hits": 0.0, "ms": 0.0, "last_hit_at": 0.0, "runs": 1}
+    assert SelectorStats.expected_ms(fast) < SelectorStats.expected_ms(slow)
+    assert SelectorStats.expected_ms(fast) < SelectorStats.expected_ms(None) < SelectorStats.expected_ms(miss)
+
+
+def test_disabled_keeps_order_and_learns_nothing(tmp_path):
+    stats = SelectorStats(str(tmp_path / "s.json"), enabled=False)
+    stats.record("s1", ["#a", "#b"], "#b", 400)
+    assert stats.order("s1", ["#a", "#b"]) == ["#a", "#b"]
+    assert stats.snapshot()["steps"] == {}
+
+
+def test_flush_persists_and_reloads(stats):
+    stats.record("s1", ["#a", "#b"], "#b", 400)
+    stats.flush()
+    again = SelectorStats(stats.path)
+    assert again.order("s1", ["#a", "#b"]) == ["#b", "#a"]
+
+
+def test_corrupt_file_starts_empty(tmp_path):
+    path = tmp_path / "s.json"
+    path.write_text("[1, 2", encoding="utf-8")
+    assert SelectorStats(str(path)).snapshot()["steps"] == {}
+
+
+def test_overlapping_steps_keep_configured_order(selector_stats, job):
+    assert is_catch_all("svg path") and is_catch_all("slot.fin-skv-button-label")
+    assert not is_catch_all("path[fill='#FFFFFF']") and not is_catch_all("#bankid-standard")
+
+    qr_sels = ["path[fill='#FFFFFF']", "path[fill='#000000']", "svg path"]
+    (qr,) = flow_from_sequences([(0, None, None)] * 3 + [(3.0, qr_sels, None)])
+    assert qr.learn_order is False
+    # "svg path" won before (on the wrong page); the order must not follow it.
+    for _ in range(5):
+        selector_stats.record(qr.key, qr_sels, "svg path", 50)
+    assert _begin_step(job, qr) == qr_sels
+    assert "selector_order" not in job.details
+
+    steps = parse_flow([
+        {"name": "bankid", "selectors": ["button#bankid-standard", "#bankid-standard"]},
+        {"name": "qr", "selectors": qr_sels},
+        {"name": "qr2", "selectors": qr_sels, "learn_order": True},
+        {"name": "cookie", "selectors": ["#deny-all", "#accept-all"]},
+    ])
+    assert [s.learn_order for s in steps] == [True, False, True, False]
@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+import skv_settings
+from skv_settings import SettingsStore, SkvSettings
+
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for _cfg_key, env_key in skv_settings._SOURCES.values():
+        if env_key:
+            monkeypatch.delenv(env_key, raising=False)
+    monkeypatch.setattr(skv_settings, "CONFIG_CHECK_SECONDS", 0.0)
+
+
+def _write(path, text, mtime=None):
+    path.write_text(text, encoding="utf-8")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_defaults_without_config(tmp_path):
+    store = SettingsStore(str(tmp_path / "missing.txt"))
+    assert store.get() == SkvSettings()
+    assert set(store.describe()["sources"].values()) == {"default"}
+
+
+def test_precedence_default_config_env_override(tmp_path, monkeypatch):
+    cfg = tmp_path / "config.txt"
+    _write(cfg, "FAST_FILL=y\nCLONE_TAB_FALLBACK=yes\n")
+    store = SettingsStore(str(cfg), defaults={"allow_mockup_data": False})
+
+    settings = store.get()
+    assert settings.fast_fill is True
+    assert settings.clone_tab_fallback is True
+    assert settings.allow_mockup_data is False
+
+    monkeypatch.setenv("SKV_FAST_FILL", "n")
+    settings = store.get()
+    assert settings.fast_fill is False
+    sources = store.describe()["sources"]
+    assert (sources["fast_fill"], sources["clone_tab_fallback"], sources["synligt_skv"]) == ("env", "config", "default")
+
+    assert settings.with_overrides({"fast_fill": "1"}).fast_fill is True
+    assert settings.with_overrides(None) is settings
+
+
+def test_empty_env_value_is_explicit(tmp_path, monkeypatch):
+    cfg = tmp_path / "config.txt"
+    _write(cfg, "FAST_FILL=y\n")
+    store = SettingsStore(str(cfg))
+    monkeypatch.setenv("SKV_FAST_FILL", "")
+    monkeypatch.setenv("SKV_ALLOW_MOCKUP_DATA", "")
+    monkeypatch.setenv("SKV_PAYLOAD_FILE", "")
+
+    settings = store.get()
+    assert settings.fast_fill is False
+    assert settings.allow_mockup_data is False
+    assert settings.payload_file == ""
+    assert store.describe()["sources"]["fast_fill"] == "env"
+
+    monkeypatch.delenv("SKV_FAST_FILL")
+    assert store.get().fast_fill is True
+
+
+def test_coercion():
+    base = SkvSettings()
+    s = base.with_overrides({"synligt_skv": "Yes", "allow_mockup_data": "nej", "payload_file": None, "fast_fill": True})
+    assert s.synligt_skv is True
+    assert s.allow_mockup_data is False
+    assert s.payload_file == ""
+    assert s.fast_fill is True
+    assert base.with_overrides({"payload_file": 5}).payload_file == "5"
+
+
+def test_unknown_override_raises():
+    with pytest.raises(ValueError, match="Okända inställningar: nope"):
+        SkvSettings().with_overrides({"nope": 1})
+
+
+def test_config_reparsed_on_mtime_change(tmp_path):
+    cfg = tmp_path / "config.txt"
+    _write(cfg, "FAST_FILL=n\n", mtime=1_000_000)
+    store = SettingsStore(str(cfg))
+    assert store.get().fast_fill is False
+    reloads = store.reloads
+
+    assert store.get().fast_fill is False
+    assert store.reloads == reloads  # unchanged file is not re-parsed
+
+    _write(cfg, "FAST_FILL=y\n", mtime=1_000_100)
+    assert store.get().fast_fill is True
+    assert store.reloads == reloads + 1
+
+
+def test_derived_flags():
+    s = SkvSettings(popup_browser_normal_window=True, disable_normal_browser_window=True, force_clone_tab_fallback=True)
+    assert s.open_normal_browser_window is False
+    assert s.clone_enabled is True
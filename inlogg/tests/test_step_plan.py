@@ -0,0 +1,104 @@
+import pytest
+
+from formulär import flytt_form_filler
+from formulär.flytt_form_filler import FIELD_SELECTORS, _plan_fills, _transitioned
+from formulär.flytt_step_plan import STEP_PLANS, fingerprint, lookup_plan
+
+
+def _step(name, *inputs):
+    return {"name": name, "inputs": list(inputs)}
+
+
+def test_fingerprint():
+    assert fingerprint(_step("adress", "postort", "gatuadress")) == "adress[gatuadress,postort]"
+    assert fingerprint(_step("adress", "postort", "gatuadress")) == fingerprint(_step("adress", "gatuadress", "postort"))
+    assert fingerprint(None) == "?[]"
+    assert fingerprint({"name": "", "inputs": None}) == "?[]"
+
+
+def test_plans_only_name_known_fields():
+    for plan in STEP_PLANS.values():
+        assert set(plan.fields) <= set(FIELD_SELECTORS), plan.name
+        assert set(plan.requires) <= set(plan.fields), plan.name
+
+
+def test_lookup_match():
+    plan = lookup_plan(_step("adress", "gatuadress", "postnummer", "postort", "lagenhetsnummer", "ovrigt"), FIELD_SELECTORS)
+    assert plan is STEP_PLANS["adress"]
+    assert plan.confirm is True
+    assert lookup_plan(_step("granska"), FIELD_SELECTORS).terminal is True
+    assert lookup_plan(_step("nuvarandeuppgifter", "radio1"), FIELD_SELECTORS).fields == ()
+
+
+@pytest.mark.parametrize("step", [
+    None,
+    _step("okand", "gatuadress"),
+    _step("adress", "gatuadress", "postnummer"),              # required postort missing
+    _step("kontakt", "telefonnummer", "email", "postnummer"),  # known field outside the plan
+    _step("nuvarandeuppgifter", "inflyttningsdatum"),
+])
+def test_lookup_falls_back_to_scan(step):
+    assert lookup_plan(step, FIELD_SELECTORS) is None
+
+
+def _snap(index=0, fields=(), unchecked=0, busy=None, error=""):
+    return {
+        "fields": {n: {"count": 1, "visible": True, "value": "", "disabled": False} for n in fields},
+        "step": {"index": index, "count": 6, "name": "", "inputs": []},
+        "next": {"count": 1, "visible": True, "busy": busy},
+        "confirm": {"count": unchecked, "visible": unchecked, "unchecked": unchecked},
+        "error": error,
+    }
+
+
+def test_transitioned():
+    before = _snap(index=1, fields=("inflyttningsdatum",))
+    assert not _transitioned(before, _snap(index=1, fields=("inflyttningsdatum",)))
+    assert _transitioned(before, _snap(index=2))
+    assert _transitioned(before, _snap(index=1, fields=("inflyttningsdatum", "gatuadress")))
+    assert _transitioned(before, _snap(index=1, fields=("inflyttningsdatum",), unchecked=1))
+    # Still busy, or the snapshot failed: not yet.
+    assert not _transitioned(before, _snap(index=2, busy="true"))
+    assert not _transitioned(before, _snap(index=2, error="Target closed"))
+    assert _transitioned(before, _snap(index=2, busy="false"))
+
+
+def test_plan_fills():
+    snap = _snap(fields=("gatuadress", "postnummer", "postort", "email"))
+    snap["fields"]["postnummer"]["value"] = "11122"
+    snap["fields"]["postort"]["disabled"] = True
+    snap["fields"]["email"]["visible"] = False
+    data = {"gatuadress": "Storgatan 12", "postnummer": "11122", "postort": "Stockholm", "email": "a@b.se"}
+    logged = []
+
+    todo = _plan_fills(snap, data, set(data), set(), logged.append)
+    assert todo == [("gatuadress", "Storgatan 12", True), ("postnummer", "11122", False)]
+    assert logged == ["SKIP: postort is disabled"]
+
+    assert _plan_fills(snap, data, set(data), {"gatuadress"}, logged.append, only=("postnummer",)) == [("postnummer", "11122", False)]
+    assert _plan_fills(snap, data, {"postnummer"}, set(), logged.append) == [("postnummer", "11122", False)]
+
+
+# A known step ("personer", no fields) whose Nästa does nothing.
+STUCK_PAGE = """
+<flytt-skv-wizard-step name="personer" class="flytt-skv-wizard-step--active" style="display:block">
+  <p>Personer som flyttar</p>
+  <skv-button-10-0-7 button-type="primary" class="flytt-skv-wizard-step-button"
+      style="display:inline-block" onclick="window.clicks = (window.clicks || 0) + 1">Nästa</skv-button-10-0-7>
+</flytt-skv-wizard-step>
+"""
+
+
+def test_stuck_plan_step_stops_after_idle_rounds(page, monkeypatch):
+    monkeypatch.setattr(flytt_form_filler, "WAIT_AFTER_NEXT", 0.05)
+    page.set_content(STUCK_PAGE)
+    logged = []
+
+    stats = flytt_form_filler.run_flytt_form_filler(
+        page, lambda: False, logged.append, form_data={"inflyttningsdatum": "2026-01-15"},
+    )
+    assert stats["rounds"] == flytt_form_filler.MAX_IDLE_ROUNDS < flytt_form_filler.MAX_ROUNDS
+    assert stats["plan_rounds"] == stats["rounds"]
+    assert stats["transitions"] == 0
+    assert page.evaluate("window.clicks") == flytt_form_filler.MAX_IDLE_ROUNDS
+    assert any("No progress for" in line for line in logged)